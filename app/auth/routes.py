@@ -28,7 +28,6 @@ router = APIRouter(
             "description": "Usuário registrado com sucesso.",
             "content": {
                 "application/json": {
-                    "schema": schemas.UserResponse.model_json_schema(ref_template="#/components/schemas/{model}"),
                     "example": schemas.UserResponse.model_config['json_schema_extra']['example'] if schemas.UserResponse.model_config.get('json_schema_extra') else {}
                 }
             }
@@ -73,7 +72,6 @@ def register_user_route(user_data: schemas.UserCreate, db: Session = Depends(get
             "description": "Login bem-sucedido, token de acesso retornado.",
             "content": {
                 "application/json": {
-                    "schema": schemas.Token.model_json_schema(ref_template="#/components/schemas/{model}"),
                     "example": schemas.Token.model_config['json_schema_extra']['example'] if schemas.Token.model_config.get('json_schema_extra') else {}
                 }
             }
@@ -114,7 +112,6 @@ def login_for_access_token(
             "description": "Novo token de acesso gerado com sucesso.",
             "content": {
                 "application/json": {
-                    "schema": schemas.Token.model_json_schema(ref_template="#/components/schemas/{model}"),
                     "example": schemas.Token.model_config['json_schema_extra']['example'] if schemas.Token.model_config.get('json_schema_extra') else {}
                 }
             }
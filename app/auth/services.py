@@ -3,18 +3,18 @@ from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
-from app.core.config import get_settings
 from app.database import models
 from app.auth import schemas
+from app.core.metrics import PASSWORD_VERIFY_DURATION
 from typing import Optional
 import uuid
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-settings = get_settings()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    with PASSWORD_VERIFY_DURATION.time():
+        return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Annotated
 
@@ -7,6 +7,7 @@ from app.category import schemas, services
 from app.database import models
 from app.category.schemas import MessageResponse as CategoryMessageResponse
 from app.core.dependencies import get_current_active_user, get_current_admin_user
+from app.core.etag import check_etag
 
 router = APIRouter(
     prefix="/categories",
@@ -29,7 +30,6 @@ router = APIRouter(
             "description": "Categoria criada com sucesso.",
             "content": {
                 "application/json": {
-                    "schema": schemas.CategoryResponse.model_json_schema(ref_template="#/components/schemas/{model}"),
                     "example": schemas.CategoryResponse.model_config['json_schema_extra']['example'] if schemas.CategoryResponse.model_config.get('json_schema_extra') else {}
                 }
             }
@@ -63,7 +63,6 @@ def create_category_route(
             "description": "Lista de categorias retornada com sucesso.",
             "content": {
                 "application/json": {
-                    "schema": {"type": "array", "items": schemas.CategoryResponse.model_json_schema(ref_template="#/components/schemas/{model}")},
                     "example": [
                         schemas.CategoryResponse.model_config['json_schema_extra']['example'] if schemas.CategoryResponse.model_config.get('json_schema_extra') else {},
                         {"id": 2, "name": "Calçados", "created_at": "2024-05-23T10:00:00Z", "updated_at": "2024-05-23T10:00:00Z"}
@@ -74,6 +73,8 @@ def create_category_route(
     }
 )
 def read_categories_route(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0, description="Número de registros a pular para paginação."),
     limit: int = Query(100, ge=1, le=100, description="Número máximo de registros a retornar."),
     db: Session = Depends(get_db),
@@ -86,6 +87,9 @@ def read_categories_route(
     - **Casos de uso**:
         - Exibir filtros de categoria. Painel administrativo.
     """
+    not_modified = check_etag(request, response, services.get_categories_etag(db, skip=skip, limit=limit))
+    if not_modified:
+        return not_modified
     categories = services.get_categories(db, skip=skip, limit=limit)
     return categories
 
@@ -98,7 +102,6 @@ def read_categories_route(
             "description": "Categoria encontrada e retornada.",
             "content": {
                 "application/json": {
-                    "schema": schemas.CategoryResponse.model_json_schema(ref_template="#/components/schemas/{model}"),
                     "example": schemas.CategoryResponse.model_config['json_schema_extra']['example'] if schemas.CategoryResponse.model_config.get('json_schema_extra') else {}
                 }
             }
@@ -108,6 +111,8 @@ def read_categories_route(
 )
 def read_category_route(
     category_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: Annotated[models.User, Depends(get_current_active_user)] = None
 ):
@@ -118,7 +123,13 @@ def read_category_route(
     - **Casos de uso**:
         - Detalhes em painel admin. Carregar info ao selecionar filtro.
     """
-    db_category = services.get_category(db, category_id)
+    etag = services.get_category_etag(db, category_id)
+    if etag is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Categoria não encontrada")
+    not_modified = check_etag(request, response, etag)
+    if not_modified:
+        return not_modified
+    db_category = services.get_cached_category(db, category_id)
     if db_category is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Categoria não encontrada")
     return db_category
@@ -132,7 +143,6 @@ def read_category_route(
             "description": "Categoria atualizada com sucesso.",
             "content": {
                 "application/json": {
-                    "schema": schemas.CategoryResponse.model_json_schema(ref_template="#/components/schemas/{model}"),
                     "example": {**(schemas.CategoryResponse.model_config.get('json_schema_extra', {}).get('example', {})), "name": "Camisetas Atualizadas"}
                 }
             }
@@ -170,7 +180,6 @@ def update_category_route(
             "description": "Categoria deletada com sucesso.",
             "content": {
                 "application/json": {
-                    "schema": CategoryMessageResponse.model_json_schema(ref_template="#/components/schemas/{model}"),
                     "example": CategoryMessageResponse.model_config.get('json_schema_extra', {}).get('example', {"message": "Categoria deletada com sucesso."})
                 }
             }
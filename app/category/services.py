@@ -2,7 +2,9 @@ from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from app.database import models
 from app.category import schemas
-from typing import List, Optional
+from typing import Any, Optional, Tuple
+from app.core.etag import make_etag
+from app.core import reference
 
 def get_category_by_name(db: Session, name: str) -> Optional[models.Category]:
     return db.query(models.Category).filter(models.Category.name == name).first()
@@ -19,6 +21,7 @@ def create_category(db: Session, category_data: schemas.CategoryCreate) -> model
     )
     db.add(db_category)
     db.commit()
+    reference.categories.invalidate()
     db.refresh(db_category)
     return db_category
 
@@ -26,12 +29,24 @@ def get_categories(
     db: Session,
     skip: int = 0,
     limit: int = 100
-) -> List[models.Category]:
-    return db.query(models.Category).offset(skip).limit(limit).all()
+) -> Tuple[Any, ...]:
+    return reference.categories.all(db)[skip:skip + limit]
 
 def get_category(db: Session, category_id: int) -> Optional[models.Category]:
     return db.query(models.Category).filter(models.Category.id == category_id).first()
 
+def get_cached_category(db: Session, category_id: int) -> Optional[Any]:
+    return reference.categories.get(db, category_id)
+
+def get_categories_etag(db: Session, skip: int = 0, limit: int = 100) -> str:
+    return make_etag("categories", reference.categories.snapshot(db).version, skip, limit)
+
+def get_category_etag(db: Session, category_id: int) -> Optional[str]:
+    row = reference.categories.get(db, category_id)
+    if row is None:
+        return None
+    return make_etag("category", category_id, row.updated_at)
+
 def update_category(db: Session, category_id: int, category_data: schemas.CategoryUpdate) -> Optional[models.Category]:
     db_category = get_category(db, category_id)
     if not db_category:
@@ -51,6 +66,7 @@ def update_category(db: Session, category_id: int, category_data: schemas.Catego
 
     db.add(db_category)
     db.commit()
+    reference.categories.invalidate()
     db.refresh(db_category)
     return db_category
 
@@ -60,5 +76,6 @@ def delete_category(db: Session, category_id: int) -> bool:
         return False
     db.delete(db_category)
     db.commit()
+    reference.categories.invalidate()
     return True
 
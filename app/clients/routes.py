@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional, Annotated
+from datetime import datetime
+from decimal import Decimal
 import uuid
 
 from app.database.connection import get_db
@@ -30,7 +32,6 @@ router = APIRouter(
             "description": "Cliente criado com sucesso. Retorna os dados do cliente e um token de acesso para ele.",
             "content": {
                 "application/json": {
-                    "schema": schemas.ClientCreateResponse.model_json_schema(ref_template="#/components/schemas/{model}"),
                     "example": schemas.ClientCreateResponse.model_config['json_schema_extra']['example'] if schemas.ClientCreateResponse.model_config.get('json_schema_extra') else {}
                 }
             }
@@ -55,7 +56,7 @@ def create_client_route(
         - Novo cliente se cadastrando. Formulário "Cadastre-se".
     """
     db_client = services.create_client(db, client_data)
-    client_response_data = {"id": db_client.id, "name": db_client.name, "email": db_client.email, "cpf": db_client.cpf, "created_at": db_client.created_at, "updated_at": db_client.updated_at}
+    client_response_data = {"id": db_client.id, "name": db_client.name, "email": db_client.email, "cpf": db_client.cpf, "order_count": db_client.order_count, "lifetime_value": db_client.lifetime_value, "last_order_at": db_client.last_order_at, "created_at": db_client.created_at, "updated_at": db_client.updated_at}
     return schemas.ClientCreateResponse(client=schemas.ClientResponse(**client_response_data), token=create_token_response(subject_id=db_client.id, is_client=True))
 
 @router.get(
@@ -67,7 +68,6 @@ def create_client_route(
             "description": "Lista de clientes retornada com sucesso.",
             "content": {
                 "application/json": {
-                    "schema": {"type": "array", "items": schemas.ClientResponse.model_json_schema(ref_template="#/components/schemas/{model}")},
                     "example": [
                         schemas.ClientResponse.model_config['json_schema_extra']['example'] if schemas.ClientResponse.model_config.get('json_schema_extra') else {},
                         {**(schemas.ClientResponse.model_config.get('json_schema_extra', {}).get('example', {})), "id": "d290f1ee-6c54-4b01-90e6-d701748f0851", "name": "Carlos Pereira", "email": "carlos.pereira@example.com", "cpf":"11223344556"}
@@ -82,6 +82,12 @@ def read_clients_route(
     limit: int = Query(100, ge=1, le=100, description="Número máximo de registros."),
     name: Optional[str] = Query(None, description="Filtrar por nome (case-insensitive, parcial)."),
     email: Optional[str] = Query(None, description="Filtrar por email (case-insensitive, parcial)."),
+    min_order_count: Optional[int] = Query(None, ge=0, description="Filtrar por quantidade mínima de pedidos."),
+    min_lifetime_value: Optional[Decimal] = Query(None, ge=0, description="Filtrar por valor mínimo gasto pelo cliente."),
+    last_order_after: Optional[datetime] = Query(None, description="Último pedido a partir desta data/hora (ISO)."),
+    last_order_before: Optional[datetime] = Query(None, description="Último pedido até esta data/hora (ISO)."),
+    sort_by: Optional[str] = Query(None, pattern="^(name|created_at|order_count|lifetime_value|last_order_at)$", description="Campo de ordenação."),
+    sort_desc: bool = Query(False, description="Ordenar em ordem decrescente."),
     db: Session = Depends(get_db),
     current_user: Annotated[models.User, Depends(get_current_active_user)] = None
 ):
@@ -89,10 +95,17 @@ def read_clients_route(
     Retorna lista de clientes, com paginação e filtros. Requer auth de usuário (não cliente).
     - **Regras de negócio**:
         - Apenas usuários autenticados (não clientes). Filtros opcionais.
+        - Os agregados (`order_count`, `lifetime_value`, `last_order_at`) consideram apenas pedidos não cancelados.
     - **Casos de uso**:
         - Admin visualizando clientes. CRM. Suporte ao cliente.
+        - Listar os clientes que mais compram (`sort_by=lifetime_value&sort_desc=true`).
     """
-    clients = services.get_clients(db, skip=skip, limit=limit, name=name, email=email)
+    clients = services.get_clients(
+        db, skip=skip, limit=limit, name=name, email=email,
+        min_order_count=min_order_count, min_lifetime_value=min_lifetime_value,
+        last_order_after=last_order_after, last_order_before=last_order_before,
+        sort_by=sort_by, sort_desc=sort_desc
+    )
     return clients
 
 @router.get(
@@ -104,7 +117,6 @@ def read_clients_route(
             "description": "Cliente encontrado e retornado.",
             "content": {
                 "application/json": {
-                    "schema": schemas.ClientResponse.model_json_schema(ref_template="#/components/schemas/{model}"),
                     "example": schemas.ClientResponse.model_config['json_schema_extra']['example'] if schemas.ClientResponse.model_config.get('json_schema_extra') else {}
                 }
             }
@@ -137,7 +149,6 @@ def read_client_route(
             "description": "Cliente atualizado com sucesso.",
             "content": {
                 "application/json": {
-                    "schema": schemas.ClientResponse.model_json_schema(ref_template="#/components/schemas/{model}"),
                     "example": {**(schemas.ClientResponse.model_config.get('json_schema_extra', {}).get('example', {})), "name": "Maria Oliveira Souza"}
                 }
             }
@@ -172,7 +183,6 @@ def update_client_route(
             "description": "Cliente excluído com sucesso.",
             "content": {
                 "application/json": {
-                    "schema": ClientMessageResponse.model_json_schema(ref_template="#/components/schemas/{model}"),
                     "example": ClientMessageResponse.model_config.get('json_schema_extra', {}).get('example', {"message": "Cliente deletado com sucesso."})
                 }
             }
@@ -2,6 +2,7 @@ from pydantic import BaseModel, EmailStr, Field, ConfigDict
 from typing import Optional
 from datetime import datetime
 import uuid
+from decimal import Decimal
 from app.auth.schemas import Token
 
 class ClientCreate(BaseModel):
@@ -42,6 +43,9 @@ class ClientResponse(BaseModel):
     name: str = Field(description="Nome completo do cliente.")
     email: EmailStr = Field(description="Endereço de e-mail do cliente.")
     cpf: str = Field(description="CPF do cliente.")
+    order_count: int = Field(0, description="Quantidade de pedidos não cancelados do cliente.")
+    lifetime_value: Decimal = Field(Decimal("0.00"), description="Soma dos subtotais dos pedidos não cancelados do cliente.")
+    last_order_at: Optional[datetime] = Field(None, description="Data e hora do pedido não cancelado mais recente do cliente.")
     created_at: datetime = Field(description="Data e hora de criação do registro do cliente.")
     updated_at: datetime = Field(description="Data e hora da última atualização do registro do cliente.")
 
@@ -53,6 +57,9 @@ class ClientResponse(BaseModel):
                 "name": "Maria Souza",
                 "email": "maria.souza@example.com",
                 "cpf": "09876543211",
+                "order_count": 3,
+                "lifetime_value": "542.70",
+                "last_order_at": "2024-06-02T18:30:00Z",
                 "created_at": "2024-05-25T14:00:00Z",
                 "updated_at": "2024-05-25T14:05:00Z"
             }
@@ -4,6 +4,8 @@ from fastapi import HTTPException, status
 from app.database import models
 from app.clients import schemas
 from typing import List, Optional
+from datetime import datetime
+from decimal import Decimal
 import uuid
 from app.auth.services import get_password_hash
 
@@ -38,18 +40,41 @@ def create_client(db: Session, client_data: schemas.ClientCreate) -> models.Clie
     db.refresh(db_client)
     return db_client
 
+CLIENT_SORT_FIELDS = ("name", "created_at", "order_count", "lifetime_value", "last_order_at")
+
 def get_clients(
     db: Session,
     skip: int = 0,
     limit: int = 100,
     name: Optional[str] = None,
-    email: Optional[str] = None
+    email: Optional[str] = None,
+    min_order_count: Optional[int] = None,
+    min_lifetime_value: Optional[Decimal] = None,
+    last_order_after: Optional[datetime] = None,
+    last_order_before: Optional[datetime] = None,
+    sort_by: Optional[str] = None,
+    sort_desc: bool = False
 ) -> List[models.Client]:
     query = db.query(models.Client)
     if name:
         query = query.filter(models.Client.name.ilike(f"%{name}%"))
     if email:
         query = query.filter(models.Client.email.ilike(f"%{email}%"))
+    if min_order_count is not None:
+        query = query.filter(models.Client.order_count >= min_order_count)
+    if min_lifetime_value is not None:
+        query = query.filter(models.Client.lifetime_value >= min_lifetime_value)
+    if last_order_after:
+        query = query.filter(models.Client.last_order_at >= last_order_after)
+    if last_order_before:
+        query = query.filter(models.Client.last_order_at <= last_order_before)
+    if sort_by:
+        sort_column = getattr(models.Client, sort_by)
+        # O ID desempata a ordenação para que a paginação seja estável.
+        query = query.order_by(
+            sort_column.desc().nulls_last() if sort_desc else sort_column.asc().nulls_last(),
+            models.Client.id
+        )
     return query.offset(skip).limit(limit).all()
 
 def get_client(db: Session, client_id: uuid.UUID) -> Optional[models.Client]:
@@ -0,0 +1,171 @@
+import zlib
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Em ordem de preferência quando o cliente aceita as duas com o mesmo peso.
+ENCODINGS = ("br", "gzip")
+SKIPPED_STATUS = {204, 206, 304}
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Escolhe a codificação a partir do `Accept-Encoding`, respeitando `q=0` e o curinga `*`."""
+    weights = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.partition(";")
+        name = name.strip()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+    wildcard = weights.get("*", 0.0)
+    best = max(ENCODINGS, key=lambda encoding: weights.get(encoding, wildcard))
+    return best if weights.get(best, wildcard) > 0 else None
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality, mode=brotli.MODE_TEXT)
+            self._zlib = None
+        else:
+            # wbits=31: fluxo deflate com cabeçalho e rodapé gzip.
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._brotli = None
+
+    def compress(self, data: bytes) -> bytes:
+        return self._brotli.process(data) if self._brotli else self._zlib.compress(data)
+
+    def finish(self) -> bytes:
+        return self._brotli.finish() if self._brotli else self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """
+    Comprime com brotli ou gzip as respostas cujo `Content-Type` está em `media_types` e cujo corpo
+    tem pelo menos `minimum_size` bytes. Respostas já codificadas, parciais (206), sem corpo
+    e com `Cache-Control: no-transform` passam intactas; respostas em streaming são comprimidas
+    bloco a bloco.
+
+    O `ETag` das respostas comprimidas vira fraco (`W/`), já que os bytes mudam com a codificação;
+    `etag_matches` aceita as duas formas. Respostas com `ETag` guardam o corpo comprimido em um
+    cache LRU de `cache_entries` itens, pois o mesmo conteúdo (ex.: `/reference`) costuma ser
+    servido muitas vezes.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        media_types: Iterable[str] = ("application/json",),
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        cache_entries: int = 128
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.media_types = frozenset(media_type.lower() for media_type in media_types)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_entries = cache_entries
+        self._cache: "OrderedDict[Tuple, bytes]" = OrderedDict()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressionResponder(self, scope, encoding, send).send)
+
+    def compressible(self, status_code: int, headers: Headers) -> bool:
+        media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return (
+            status_code not in SKIPPED_STATUS
+            and media_type in self.media_types
+            and "content-encoding" not in headers
+            and "no-transform" not in headers.get("cache-control", "").lower()
+        )
+
+    def compress(self, encoding: str, body: bytes, cache_key: Optional[Tuple]) -> bytes:
+        if cache_key is not None and self.cache_entries > 0:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+                return cached
+        compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+        compressed = compressor.compress(body) + compressor.finish()
+        if cache_key is not None and self.cache_entries > 0:
+            self._cache[cache_key] = compressed
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return compressed
+
+
+class _CompressionResponder:
+    """Intercepta as mensagens de uma resposta e decide, no primeiro bloco do corpo, se comprime."""
+
+    def __init__(self, middleware: CompressionMiddleware, scope: Scope, encoding: str, send: Send):
+        self.middleware = middleware
+        self.scope = scope
+        self.encoding = encoding
+        self._send = send
+        self.start_message: Optional[Message] = None
+        self.started = False
+        self.compressor: Optional[_Compressor] = None
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if self.started:
+            if self.compressor is not None and message["type"] == "http.response.body":
+                more_body = message.get("more_body", False)
+                body = self.compressor.compress(message.get("body", b""))
+                if not more_body:
+                    body += self.compressor.finish()
+                message = {"type": "http.response.body", "body": body, "more_body": more_body}
+            await self._send(message)
+            return
+
+        self.started = True
+        start = self.start_message
+        headers = MutableHeaders(raw=start["headers"])
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if (
+            message["type"] != "http.response.body"
+            or not self.middleware.compressible(start["status"], headers)
+            or (not more_body and len(body) < self.middleware.minimum_size)
+        ):
+            await self._send(start)
+            await self._send(message)
+            return
+
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+
+        if more_body:
+            del headers["Content-Length"]
+            self.compressor = _Compressor(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+            body = self.compressor.compress(body)
+        else:
+            cache_key = (self.encoding, etag, self.scope["path"], self.scope.get("query_string", b"")) if etag else None
+            body = self.middleware.compress(self.encoding, body, cache_key)
+            headers["Content-Length"] = str(len(body))
+        await self._send(start)
+        await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
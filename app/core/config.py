@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
+from typing import List
 from dotenv import load_dotenv
 import os
 
@@ -7,6 +8,9 @@ load_dotenv()
 
 class Settings(BaseSettings):
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE_SECONDS: int = 0
     
     SECRET_KEY: str = os.getenv("SECRET_KEY")
     ALGORITHM: str = "HS256"
@@ -14,6 +18,61 @@ class Settings(BaseSettings):
 
     SENTRY_DSN: str = ""
 
+    PRODUCT_BULK_MAX_ITEMS: int = 5000
+    PRODUCT_BULK_CHUNK_SIZE: int = 500
+    PRODUCT_IMPORT_CHUNK_SIZE: int = 5000
+
+    PURCHASE_INTAKE_WORKERS: int = 2
+    PURCHASE_INTAKE_BATCH_SIZE: int = 10
+    PURCHASE_INTAKE_POLL_INTERVAL_SECONDS: float = 0.5
+    PURCHASE_INTAKE_MAX_ATTEMPTS: int = 5
+    PURCHASE_INTAKE_RETRY_BACKOFF_SECONDS: float = 2.0
+    PURCHASE_INTAKE_LEASE_SECONDS: int = 300
+    PURCHASE_INTAKE_RETENTION_DAYS: int = 7
+    PURCHASE_INTAKE_PURGE_INTERVAL_SECONDS: float = 3600.0
+    PURCHASE_INTAKE_METRICS_WINDOW_SECONDS: int = 3600
+
+    SALES_ROLLUP_REFRESH_SECONDS: float = 5.0
+
+    REFERENCE_CACHE_TTL_SECONDS: float = 60.0
+
+    LOG_LEVEL: str = "INFO"
+    ACCESS_LOG_ENABLED: bool = True
+    ACCESS_LOG_SAMPLED_ROUTES: List[str] = ["/products/read", "/products/cards", "/reference", "/product-images/files/{content_hash}/{name}"]
+    ACCESS_LOG_2XX_SAMPLE_RATE: float = 0.1
+    ACCESS_LOG_SLOW_MS: float = 500.0
+
+    METRICS_ENABLED: bool = True
+
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATE: float = 0.1
+    TRACING_EXPORTER: str = "file"
+    TRACING_FILE_PATH: str = "traces.jsonl"
+    TRACING_SERVICE_NAME: str = "infog2-api"
+
+    PROFILING_ENABLED: bool = False
+    PROFILING_HEADER: str = "X-Profile"
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_INTERVAL_MS: float = 1.0
+    PROFILING_DIR: str = "profiles"
+    PROFILING_MAX_PROFILES: int = 50
+    PROFILING_MAX_BYTES: int = 100 * 1024 * 1024
+
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_MEDIA_TYPES: List[str] = ["application/json", "text/html", "text/plain", "text/css", "application/javascript"]
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_CACHE_ENTRIES: int = 128
+
+    MEDIA_ROOT: str = "media"
+    MEDIA_ACCEL_REDIRECT_PREFIX: str = ""
+    IMAGE_MAX_UPLOAD_BYTES: int = 10 * 1024 * 1024
+    IMAGE_THUMBNAIL_SIZES: List[int] = [160, 480, 1024]
+    IMAGE_WEBP_QUALITY: int = 80
+    IMAGE_WORKERS: int = 2
+    IMAGE_BULK_MAX_ITEMS: int = 1000
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 @lru_cache()
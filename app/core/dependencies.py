@@ -7,15 +7,17 @@ from datetime import datetime, timedelta, timezone
 import uuid
 
 from app.core.config import get_settings
+from app.core import tracing
+from app.core.metrics import JWT_DECODE_DURATION
 from app.database.connection import get_db
 from app.auth import schemas
 from app.database import models
 
-settings = get_settings()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Cria um token JWT de acesso."""
+    settings = get_settings()
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
@@ -30,7 +32,7 @@ def create_token_response(subject_id: Union[str, uuid.UUID], is_admin: bool = Fa
     Cria a resposta do token JWT para um sujeito (usuário ou cliente).
     Recebe o ID do sujeito e suas permissões para gerar o token.
     """
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token_expires = timedelta(minutes=get_settings().ACCESS_TOKEN_EXPIRE_MINUTES)
     
     token_data = {"sub": str(subject_id)}
     if is_admin:
@@ -53,19 +55,22 @@ async def get_current_user(
         detail="Não foi possível validar as credenciais",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
+    with tracing.span("get_current_user"):
+        try:
+            settings = get_settings()
+            with JWT_DECODE_DURATION.time(), tracing.span("jwt_decode"):
+                payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            user_id: str = payload.get("sub")
+            if user_id is None:
+                raise credentials_exception
+            token_data = schemas.TokenData(user_id=uuid.UUID(user_id))
+        except JWTError:
             raise credentials_exception
-        token_data = schemas.TokenData(user_id=uuid.UUID(user_id))
-    except JWTError:
-        raise credentials_exception
 
-    user = db.query(models.User).filter(models.User.id == token_data.user_id).first()
-    if user is None:
-        raise credentials_exception
-    return user
+        user = db.query(models.User).filter(models.User.id == token_data.user_id).first()
+        if user is None:
+            raise credentials_exception
+        return user
 
 async def get_current_active_user(
     current_user: Annotated[models.User, Depends(get_current_user)]
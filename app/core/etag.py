@@ -0,0 +1,49 @@
+import datetime
+import hashlib
+from typing import Any, Optional
+
+from fastapi import Request, Response, status
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Gera um ETag forte a partir de partes baratas de calcular (ids, `updated_at`, contagens).
+    O mesmo conjunto de partes sempre gera o mesmo ETag.
+    """
+    normalized = []
+    for part in parts:
+        if part is None:
+            normalized.append("")
+        elif isinstance(part, datetime.datetime):
+            normalized.append(part.isoformat())
+        else:
+            normalized.append(str(part))
+    digest = hashlib.sha1("|".join(normalized).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Verifica se o cabeçalho `If-None-Match` da requisição corresponde ao ETag atual."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def check_etag(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Define o cabeçalho `ETag` na resposta e, se o cliente já possui a versão atual,
+    retorna uma resposta 304 vazia que deve ser devolvida pela rota sem serializar o corpo.
+    """
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
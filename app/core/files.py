@@ -0,0 +1,94 @@
+import os
+import re
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+from fastapi import Request, Response, status
+from fastapi.responses import FileResponse, StreamingResponse
+
+from app.core.etag import etag_matches, make_etag
+
+CHUNK_SIZE = 64 * 1024
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Interpreta um único intervalo `bytes=início-fim`, `bytes=início-` ou `bytes=-sufixo`.
+    Retorna `(início, fim)` inclusivos, `None` se o cabeçalho deve ser ignorado (vários intervalos
+    ou sintaxe desconhecida) e `(-1, -1)` se o intervalo não pode ser atendido.
+    """
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        suffix = int(last)
+        if suffix == 0:
+            return -1, -1
+        return max(size - suffix, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return -1, -1
+    return start, end
+
+
+def _iter_file(path: str, start: int, length: int) -> Iterator[bytes]:
+    with open(path, "rb") as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def file_response(
+    request: Request,
+    path: str,
+    media_type: str,
+    etag_parts: Sequence[Any] = (),
+    headers: Optional[Dict[str, str]] = None,
+    accel_redirect: Optional[str] = None
+) -> Response:
+    """
+    Serve um arquivo do disco com `ETag` (respondendo 304 para `If-None-Match`) e suporte a
+    um único intervalo de `Range` (206/416), respeitando `If-Range`. O ETag combina `etag_parts`
+    com o tamanho e a data de modificação do arquivo.
+
+    Com `accel_redirect`, devolve só o cabeçalho `X-Accel-Redirect`: o nginx na frente da API
+    envia o arquivo com `sendfile` e trata os intervalos sozinho. Sem ele, respostas completas
+    usam `FileResponse`, que repassa o caminho ao servidor quando este suporta a extensão ASGI
+    `http.response.pathsend` (envio sem cópia).
+    """
+    stat_result = os.stat(path)
+    etag = make_etag(*etag_parts, stat_result.st_size, stat_result.st_mtime_ns)
+    headers = {**(headers or {}), "ETag": etag, "Accept-Ranges": "bytes"}
+
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if accel_redirect:
+        return Response(headers={**headers, "X-Accel-Redirect": accel_redirect}, media_type=media_type)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, stat_result.st_size)
+        if byte_range == (-1, -1):
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "Content-Range": f"bytes */{stat_result.st_size}"}
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            return StreamingResponse(
+                _iter_file(path, start, length),
+                status_code=status.HTTP_206_PARTIAL_CONTENT,
+                media_type=media_type,
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{stat_result.st_size}", "Content-Length": str(length)}
+            )
+
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat_result)
@@ -0,0 +1,175 @@
+import copy
+import datetime
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Iterable, Optional
+
+import orjson
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import Settings
+from app.core.request_stats import current_stats, route_template, track_request
+
+access_logger = logging.getLogger("app.access")
+
+# Atributos que todo LogRecord possui; o restante (passado em `extra=`) vai para o JSON.
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+REQUEST_ID_HEADER = "x-request-id"
+MAX_REQUEST_ID_LENGTH = 64
+
+_handler: Optional[QueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro: horário, nível, logger, mensagem, ID da requisição e campos extras."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        return orjson.dumps(entry, default=str).decode()
+
+
+class _RequestQueueHandler(QueueHandler):
+    """
+    Enfileira os registros sem formatá-los: a serialização e a escrita ficam com a thread do
+    `QueueListener`. Só o ID da requisição é lido aqui, porque ele vive no contexto de quem logou.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        stats = current_stats()
+        if stats is not None:
+            record.request_id = stats.request_id
+        # Resolve a mensagem e a exceção agora: args e tracebacks nem sempre podem ser lidos
+        # depois, em outra thread.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if record.exc_text:
+            record.msg = f"{record.msg}\n{record.exc_text}"
+            record.exc_text = None
+        return record
+
+
+def _start_listener() -> None:
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _handler.queue = log_queue
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+    _listener = QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+
+
+def configure_logging(settings: Settings) -> None:
+    """
+    Envia todos os logs (da aplicação e o de acesso) em JSON para a saída padrão, através de uma
+    fila: quem loga só faz um `put`, e a escrita acontece na thread do `QueueListener`.
+    Chamar de novo substitui a configuração anterior.
+    """
+    global _handler
+    shutdown_logging()
+    root = logging.getLogger()
+    _handler = _RequestQueueHandler(queue.SimpleQueue())
+    root.addHandler(_handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+    _start_listener()
+
+
+def shutdown_logging() -> None:
+    """Escreve o que ainda está na fila e remove o handler."""
+    global _handler, _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+
+
+def _restart_after_fork() -> None:
+    # A thread do listener não existe no processo filho (ex.: worker do gunicorn com --preload):
+    # cada processo passa a ter sua própria fila e sua própria thread de escrita.
+    if _handler is not None:
+        _start_listener()
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+class AccessLogMiddleware:
+    """
+    Registra uma linha por requisição em `app.access`: ID da requisição (recebido em `X-Request-ID`
+    ou gerado, e devolvido no mesmo cabeçalho), método, rota declarada, status, latência e comandos
+    SQL. Respostas 2xx das rotas em `sampled_routes` são registradas só na fração `sample_rate`,
+    exceto as mais lentas que `slow_ms`.
+    """
+
+    def __init__(self, app: ASGIApp, sampled_routes: Iterable[str] = (), sample_rate: float = 1.0, slow_ms: float = 500.0):
+        self.app = app
+        self.sampled_routes = frozenset(sampled_routes)
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+        with track_request() as stats:
+            incoming_id = Headers(scope=scope).get(REQUEST_ID_HEADER)
+            if incoming_id and len(incoming_id) <= MAX_REQUEST_ID_LENGTH and incoming_id.isprintable():
+                stats.request_id = incoming_id
+            request_id_header = (REQUEST_ID_HEADER.encode(), stats.request_id.encode("latin-1", "replace"))
+
+            async def send_with_request_id(message: Message) -> None:
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    message["headers"] = [*message.get("headers", ()), request_id_header]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_request_id)
+            finally:
+                duration_ms = (time.perf_counter() - started) * 1000
+                route = route_template(scope)
+                if self._should_log(route, status_code, duration_ms):
+                    access_logger.info(
+                        "%s %s %s", scope["method"], scope["path"], status_code,
+                        extra={
+                            "method": scope["method"],
+                            "route": route,
+                            "path": scope["path"],
+                            "status": status_code,
+                            "duration_ms": round(duration_ms, 2),
+                            "db_statements": stats.db_statements,
+                            "db_ms": round(stats.db_seconds * 1000, 2),
+                        }
+                    )
+
+    def _should_log(self, route: str, status_code: int, duration_ms: float) -> bool:
+        if not 200 <= status_code < 300 or route not in self.sampled_routes or duration_ms >= self.slow_ms:
+            return True
+        return random.random() < self.sample_rate
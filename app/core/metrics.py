@@ -0,0 +1,99 @@
+import os
+import time
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.request_stats import route_template, track_request
+
+# Com vários workers (gunicorn), defina PROMETHEUS_MULTIPROC_DIR com um diretório vazio: cada
+# processo grava seus valores em arquivos mmap e o /metrics de qualquer worker soma todos eles.
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+HTTP_REQUESTS = Counter("http_requests", "Requisições atendidas.", ["method", "route", "status"])
+HTTP_REQUEST_DURATION = Histogram("http_request_duration_seconds", "Duração das requisições.", ["method", "route"])
+DB_STATEMENTS = Counter("db_statements", "Comandos SQL executados durante requisições.", ["route"])
+DB_STATEMENT_DURATION = Counter("db_statement_duration_seconds", "Tempo gasto em comandos SQL durante requisições.", ["route"])
+REQUEST_DB_STATEMENTS = Histogram(
+    "http_request_db_statements", "Comandos SQL por requisição (valores altos indicam consultas N+1).",
+    ["route"], buckets=STATEMENT_BUCKETS
+)
+PASSWORD_VERIFY_DURATION = Histogram("auth_password_verify_seconds", "Duração da verificação de senha (bcrypt).")
+JWT_DECODE_DURATION = Histogram("auth_jwt_decode_seconds", "Duração da decodificação do token JWT.", buckets=FAST_BUCKETS)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections", "Conexões abertas pelos pools, por estado.", ["state"], multiprocess_mode="livesum"
+)
+
+_pool_open = DB_POOL_CONNECTIONS.labels("open")
+_pool_checked_out = DB_POOL_CONNECTIONS.labels("checked_out")
+
+
+@event.listens_for(Pool, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    _pool_open.inc()
+
+
+@event.listens_for(Pool, "close")
+def _on_close(dbapi_connection, connection_record):
+    _pool_open.dec()
+
+
+@event.listens_for(Pool, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    _pool_checked_out.inc()
+
+
+@event.listens_for(Pool, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    _pool_checked_out.dec()
+
+
+class MetricsMiddleware:
+    """Registra contagem e duração de cada requisição e os comandos SQL executados nela, por rota."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        with track_request() as stats:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = route_template(scope)
+                method = scope["method"]
+                HTTP_REQUEST_DURATION.labels(method, route).observe(time.perf_counter() - started)
+                HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+                REQUEST_DB_STATEMENTS.labels(route).observe(stats.db_statements)
+                if stats.db_statements:
+                    DB_STATEMENTS.labels(route).inc(stats.db_statements)
+                    DB_STATEMENT_DURATION.labels(route).inc(stats.db_seconds)
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def read_metrics():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
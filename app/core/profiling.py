@@ -0,0 +1,299 @@
+import datetime
+import functools
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import anyio
+from jose import JWTError, jwt
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import Settings
+from app.core.request_stats import current_stats, route_template
+
+PROFILE_ID_HEADER = b"x-profile-id"
+MAX_STACK_DEPTH = 128
+MAX_SAMPLES = 50_000
+
+FuncKey = Tuple[str, int, str]
+Stack = Tuple[FuncKey, ...]
+
+
+def _is_idle(frame) -> bool:
+    # O loop de eventos parado no `select` está esperando (por exemplo, pelo threadpool): não é
+    # tempo gasto pela requisição.
+    code = frame.f_code
+    return code.co_name == "select" and code.co_filename.endswith("selectors.py")
+
+
+def _stack(frame) -> Stack:
+    """Pilha da raiz até `frame`, com as `MAX_STACK_DEPTH` chamadas mais internas."""
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+class ProfileSession:
+    """
+    Amostras de pilha de uma requisição. Uma thread lê `sys._current_frames()` a cada `interval`
+    segundos e guarda a pilha da thread do loop de eventos e das threads do threadpool que estão
+    executando rotas e dependências síncronas desta requisição; cada amostra pesa o tempo desde a
+    anterior. Não se usa o cProfile: a partir do Python 3.12 só um profiler pode estar ativo no
+    interpretador, e o do loop impediria o de cada thread do threadpool.
+    """
+
+    def __init__(self, loop_thread: int, interval: float):
+        self.interval = interval
+        self.threads: Set[int] = {loop_thread}
+        self.samples: List[Tuple[Stack, float]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def wrap(self, func: Callable) -> Callable:
+        @functools.wraps(func)
+        def sampled(*args, **kwargs):
+            ident = threading.get_ident()
+            with self._lock:
+                self.threads.add(ident)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.threads.discard(ident)
+        return sampled
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval) and len(self.samples) < MAX_SAMPLES:
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            frames = sys._current_frames()
+            with self._lock:
+                threads = list(self.threads)
+            for ident in threads:
+                frame = frames.get(ident)
+                if frame is not None and not _is_idle(frame):
+                    self.samples.append((_stack(frame), elapsed))
+
+    def stats(self) -> Optional[pstats.Stats]:
+        if not self.samples:
+            return None
+        return pstats.Stats(_SampledStats(self.samples))
+
+
+class _SampledStats:
+    """
+    Converte amostras para o formato do `pstats` (`{função: (cc, nc, tt, ct, chamadores)}`), para
+    que o `.prof` abra no `python -m pstats` e no snakeviz. As contagens de chamadas são contagens
+    de amostras; os tempos são estimados pelo peso das amostras.
+    """
+
+    def __init__(self, samples: List[Tuple[Stack, float]]):
+        self.stats: Dict[FuncKey, tuple] = {}
+        totals: Dict[FuncKey, list] = {}
+        edges: Dict[FuncKey, Dict[FuncKey, list]] = {}
+        for stack, weight in samples:
+            for func in set(stack):
+                entry = totals.setdefault(func, [0, 0.0, 0.0])
+                entry[0] += 1
+                entry[2] += weight
+            totals[stack[-1]][1] += weight
+            for caller, callee in set(zip(stack, stack[1:])):
+                edge = edges.setdefault(callee, {}).setdefault(caller, [0, 0.0, 0.0])
+                edge[0] += 1
+                edge[2] += weight
+                if callee == stack[-1]:
+                    edge[1] += weight
+        for func, (count, own, cumulative) in totals.items():
+            callers = {caller: (n, n, tt, ct) for caller, (n, tt, ct) in edges.get(func, {}).items()}
+            self.stats[func] = (count, count, own, cumulative, callers)
+
+    def create_stats(self) -> None:
+        pass
+
+
+_session: ContextVar[Optional[ProfileSession]] = ContextVar("profile_session", default=None)
+_original_run_in_threadpool = None
+
+
+def _install_threadpool_hook() -> None:
+    # O FastAPI executa rotas e dependências síncronas com `run_in_threadpool`, fora da thread do
+    # loop de eventos. Com o profiling ligado, a função é substituída nos dois módulos que a usam
+    # por uma que registra a thread da chamada na sessão, para que ela também seja amostrada,
+    # quando a requisição está sendo perfilada; nas demais, só há uma leitura de ContextVar a mais.
+    global _original_run_in_threadpool
+    import fastapi.dependencies.utils
+    import fastapi.routing
+    if _original_run_in_threadpool is not None:
+        return
+    _original_run_in_threadpool = original = fastapi.routing.run_in_threadpool
+
+    async def run_in_threadpool(func, *args, **kwargs):
+        session = _session.get()
+        if session is not None:
+            func = session.wrap(func)
+        return await original(func, *args, **kwargs)
+
+    fastapi.routing.run_in_threadpool = run_in_threadpool
+    fastapi.dependencies.utils.run_in_threadpool = run_in_threadpool
+
+
+def uninstall_threadpool_hook() -> None:
+    global _original_run_in_threadpool
+    if _original_run_in_threadpool is None:
+        return
+    import fastapi.dependencies.utils
+    import fastapi.routing
+    fastapi.routing.run_in_threadpool = _original_run_in_threadpool
+    fastapi.dependencies.utils.run_in_threadpool = _original_run_in_threadpool
+    _original_run_in_threadpool = None
+
+
+def to_speedscope(samples: List[Tuple[Stack, float]], name: str) -> dict:
+    """Converte as amostras para o formato "sampled" do speedscope, com os pesos em microssegundos."""
+    frames: List[dict] = []
+    frame_index: Dict[FuncKey, int] = {}
+
+    def frame(func: FuncKey) -> int:
+        if func not in frame_index:
+            filename, line, function = func
+            frame_index[func] = len(frames)
+            frames.append({"name": function, "file": filename, "line": line})
+        return frame_index[func]
+
+    stacks = [[frame(func) for func in stack] for stack, _ in samples]
+    weights = [round(weight * 1_000_000, 1) for _, weight in samples]
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "exporter": "infog2",
+        "name": name,
+        "activeProfileIndex": 0,
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "microseconds",
+            "startValue": 0,
+            "endValue": round(sum(weights), 1),
+            "samples": stacks,
+            "weights": weights,
+        }],
+    }
+
+
+def _enforce_limits(directory: str, max_profiles: int, max_bytes: int) -> None:
+    """Apaga os perfis mais antigos (os dois arquivos de cada um) até caber nos limites."""
+    groups: Dict[str, List[os.DirEntry]] = {}
+    for entry in os.scandir(directory):
+        if entry.is_file() and (entry.name.endswith(".prof") or entry.name.endswith(".speedscope.json")):
+            groups.setdefault(entry.name.split(".", 1)[0], []).append(entry)
+    ordered = sorted(groups.items(), key=lambda item: item[0])
+    total = sum(entry.stat().st_size for _, entries in ordered for entry in entries)
+    while ordered and (len(ordered) > max_profiles or total > max_bytes):
+        _, entries = ordered.pop(0)
+        for entry in entries:
+            total -= entry.stat().st_size
+            os.unlink(entry.path)
+
+
+def write_profile(directory: str, profile_id: str, session: ProfileSession, max_profiles: int, max_bytes: int) -> None:
+    os.makedirs(directory, exist_ok=True)
+    session.stats().dump_stats(os.path.join(directory, f"{profile_id}.prof"))
+    with open(os.path.join(directory, f"{profile_id}.speedscope.json"), "w", encoding="utf-8") as file:
+        json.dump(to_speedscope(session.samples, profile_id), file, separators=(",", ":"))
+    _enforce_limits(directory, max_profiles, max_bytes)
+
+
+class ProfilingMiddleware:
+    """
+    Perfila uma requisição, por amostragem de pilhas a cada `PROFILING_INTERVAL_MS`, quando ela traz
+    o cabeçalho `PROFILING_HEADER` com um token de administrador, ou para uma fração das requisições
+    (`PROFILING_SAMPLE_RATE`). O perfil é gravado em `PROFILING_DIR` como `.prof` (pstats) e
+    `.speedscope.json`, depois de a resposta ter sido enviada; o nome vai no cabeçalho
+    `X-Profile-Id`. Só uma requisição é perfilada por vez no processo: as amostras do loop de
+    eventos também pegam o que outras requisições executam enquanto esta espera, então os perfis
+    são mais fiéis com o processo pouco carregado.
+    """
+
+    def __init__(self, app: ASGIApp, settings: Settings):
+        self.app = app
+        self.settings = settings
+        self.header = settings.PROFILING_HEADER.lower()
+        self.active = False
+        _install_threadpool_hook()
+
+    def _requested_by_admin(self, headers: Headers) -> bool:
+        if headers.get(self.header, "").lower() not in ("1", "true"):
+            return False
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return False
+        try:
+            payload = jwt.decode(token, self.settings.SECRET_KEY, algorithms=[self.settings.ALGORITHM])
+        except JWTError:
+            return False
+        return payload.get("is_admin") is True
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self.active:
+            await self.app(scope, receive, send)
+            return
+        sampled = self.settings.PROFILING_SAMPLE_RATE > 0 and random.random() < self.settings.PROFILING_SAMPLE_RATE
+        if not sampled and not self._requested_by_admin(Headers(scope=scope)):
+            await self.app(scope, receive, send)
+            return
+
+        stats = current_stats()
+        started_at = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        request_id = stats.request_id if stats is not None else os.urandom(8).hex()
+
+        def profile_id() -> str:
+            # Começa pelo horário, para que a ordem alfabética dos arquivos seja a cronológica.
+            name = f"{started_at}_{request_id}_{scope['method']}_{route_template(scope)}"
+            return re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_")[:150]
+
+        async def send_with_profile_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), (PROFILE_ID_HEADER, profile_id().encode())]
+            await send(message)
+
+        self.active = True
+        session = ProfileSession(threading.get_ident(), self.settings.PROFILING_INTERVAL_MS / 1000)
+        token = _session.set(session)
+        try:
+            session.start()
+            try:
+                await self.app(scope, receive, send_with_profile_id)
+            finally:
+                session.stop()
+        finally:
+            _session.reset(token)
+            self.active = False
+            if session.samples:
+                await anyio.to_thread.run_sync(
+                    write_profile, self.settings.PROFILING_DIR, profile_id(), session,
+                    self.settings.PROFILING_MAX_PROFILES, self.settings.PROFILING_MAX_BYTES
+                )
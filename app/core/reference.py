@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import namedtuple
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Iterable, Mapping, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.etag import make_etag
+from app.database import models
+
+
+@dataclass(frozen=True)
+class ReferenceSnapshot:
+    """Conteúdo de uma tabela de referência em um instante: linhas ordenadas por ID, índice e versão."""
+
+    rows: Tuple[Any, ...]
+    by_id: Mapping[int, Any]
+    version: str
+    loaded_at: float
+
+
+class ReferenceRepository:
+    """
+    Cache em memória de uma tabela pequena e quase imutável (tamanhos, categorias, gêneros).
+
+    A tabela inteira é lida de uma vez e guardada como tuplas nomeadas imutáveis. O snapshot é
+    trocado por inteiro a cada recarga, então leitores concorrentes nunca veem um estado parcial.
+    Os `services.py` de cada módulo chamam `invalidate()` após escrever; nos demais processos a
+    cópia expira após `REFERENCE_CACHE_TTL_SECONDS`, e `existing_ids` recarrega ao encontrar um ID
+    desconhecido, para não rejeitar registros criados por outro processo. Um registro apagado por
+    outro processo continua no cache até o TTL: quem grava com base nele recebe a violação de chave
+    estrangeira do banco (`is_foreign_key_violation`), invalida o cache e refaz a validação.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.columns = tuple(column.key for column in model.__table__.columns)
+        self.row_type = namedtuple(f"{model.__name__}Row", self.columns)
+        self._snapshot: Optional[ReferenceSnapshot] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def load(self, db: Session) -> ReferenceSnapshot:
+        # Uma invalidação durante a leitura indica que o resultado pode já estar desatualizado:
+        # ele é retornado a quem pediu, mas não fica guardado.
+        generation = self._generation
+        table_columns = [getattr(self.model, column) for column in self.columns]
+        rows = tuple(self.row_type(*row) for row in db.execute(select(*table_columns).order_by(self.model.id)))
+        snapshot = ReferenceSnapshot(
+            rows=rows,
+            by_id=MappingProxyType({row.id: row for row in rows}),
+            version=make_etag(self.model.__tablename__, *(part for row in rows for part in (row.id, row.updated_at))),
+            loaded_at=time.monotonic()
+        )
+        if generation == self._generation:
+            self._snapshot = snapshot
+        return snapshot
+
+    def _expired(self, snapshot: ReferenceSnapshot) -> bool:
+        ttl = get_settings().REFERENCE_CACHE_TTL_SECONDS
+        return ttl > 0 and time.monotonic() - snapshot.loaded_at > ttl
+
+    def snapshot(self, db: Session) -> ReferenceSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and not self._expired(snapshot):
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or self._expired(snapshot):
+                snapshot = self.load(db)
+            return snapshot
+
+    def all(self, db: Session) -> Tuple[Any, ...]:
+        return self.snapshot(db).rows
+
+    def get(self, db: Session, item_id: int) -> Optional[Any]:
+        return self.snapshot(db).by_id.get(item_id)
+
+    def existing_ids(self, db: Session, ids: Iterable[int]) -> Set[int]:
+        """Retorna os IDs de `ids` que existem, recarregando a tabela uma vez se algum for desconhecido."""
+        ids = set(ids)
+        by_id = self.snapshot(db).by_id
+        if not ids.issubset(by_id.keys()):
+            with self._lock:
+                by_id = self.load(db).by_id
+        return {item_id for item_id in ids if item_id in by_id}
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._snapshot = None
+
+
+FOREIGN_KEY_VIOLATION = "23503"
+
+
+def is_foreign_key_violation(exc: IntegrityError) -> bool:
+    return getattr(exc.orig, "pgcode", None) == FOREIGN_KEY_VIOLATION
+
+
+sizes = ReferenceRepository(models.Size)
+categories = ReferenceRepository(models.Category)
+genders = ReferenceRepository(models.Gender)
+REPOSITORIES = (sizes, categories, genders)
+
+
+def preload(db: Session) -> None:
+    """Carrega todas as tabelas de referência; chamado na inicialização da aplicação."""
+    for repository in REPOSITORIES:
+        repository.load(db)
+
+
+def invalidate_all() -> None:
+    for repository in REPOSITORIES:
+        repository.invalidate()
@@ -0,0 +1,66 @@
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import Scope
+
+
+@dataclass
+class RequestStats:
+    """Contadores de uma requisição, preenchidos pelos eventos do SQLAlchemy enquanto ela é atendida."""
+
+    request_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    db_statements: int = 0
+    db_seconds: float = 0.0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+@contextmanager
+def track_request() -> Iterator[RequestStats]:
+    """
+    Associa um `RequestStats` ao contexto da requisição, reaproveitando o já criado por um
+    middleware mais externo. As rotas síncronas rodam no threadpool com uma cópia do contexto,
+    que aponta para o mesmo objeto, então as consultas feitas lá também contam.
+    """
+    stats = _current.get()
+    if stats is not None:
+        yield stats
+        return
+    token = _current.set(RequestStats())
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+
+def route_template(scope: Scope) -> str:
+    """Caminho declarado da rota atendida (ex.: `/products/read/{product_id}`), para não multiplicar rótulos."""
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or "<unmatched>"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info["request_stats_started"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = conn.info.pop("request_stats_started", None)
+    if stats is None or started is None:
+        return
+    stats.db_statements += 1
+    stats.db_seconds += time.perf_counter() - started
@@ -0,0 +1,35 @@
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional, Type
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+from app.core import tracing
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def model_list_response(
+    model: Type[BaseModel],
+    items: Iterable[Any],
+    response: Optional[Response] = None,
+    status_code: int = 200
+) -> Response:
+    """
+    Serializa uma lista de objetos ORM direto para bytes JSON com o núcleo do Pydantic:
+    uma validação `from_attributes` e um `dump_json`, sem o `serialize` para objetos Python
+    nem o `json.dumps` que o FastAPI faria em seguida. A rota continua declarando `response_model`
+    para a documentação. Os cabeçalhos já definidos em `response` (ex.: `ETag`) são mantidos.
+    """
+    adapter = _list_adapter(model)
+    with tracing.span("serialize_response", model=model.__name__):
+        body = adapter.dump_json(adapter.validate_python(items, from_attributes=True), by_alias=True)
+    fast_response = Response(content=body, status_code=status_code, media_type="application/json")
+    if response is not None:
+        fast_response.raw_headers.extend(
+            (key, value) for key, value in response.raw_headers if key != b"content-length"
+        )
+    return fast_response
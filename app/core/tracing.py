@@ -0,0 +1,218 @@
+import os
+import threading
+from contextlib import nullcontext
+from typing import Any, ContextManager, Optional, TextIO
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import Settings
+from app.core.request_stats import route_template
+
+# O OpenTelemetry só é importado por `setup_tracing` (~60 ms): com o tracing desligado, nada dele
+# é carregado na inicialização e `span()` não faz nada.
+MAX_STATEMENT_LENGTH = 2000
+
+_provider = None
+_tracer = None
+_original_serialize_response = None
+_trace_file = None
+
+
+class _TraceFile:
+    """
+    Arquivo de `TRACING_EXPORTER=file`, aberto na primeira escrita e reaberto se o processo mudou:
+    um descritor herdado do mestre do gunicorn seria compartilhado pelos workers, que intercalariam
+    as linhas. Fechado por `shutdown_tracing`.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file: Optional[TextIO] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _current(self) -> TextIO:
+        if self._file is None or self._pid != os.getpid():
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._pid = os.getpid()
+        return self._file
+
+    def write(self, text: str) -> None:
+        with self._lock:
+            self._current().write(text)
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid():
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid():
+                self._file.close()
+            self._file = None
+
+
+def span(name: str, **attributes) -> ContextManager:
+    """Abre um span filho do span atual. Sem `TRACING_ENABLED`, não faz nada."""
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def _build_exporter(settings: Settings) -> Any:
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    if settings.TRACING_EXPORTER == "memory":
+        return InMemorySpanExporter()
+    if settings.TRACING_EXPORTER == "console":
+        return ConsoleSpanExporter()
+    if settings.TRACING_EXPORTER == "otlp":
+        # Pacote opcional: pip install opentelemetry-exporter-otlp-proto-http.
+        # O destino vem de OTEL_EXPORTER_OTLP_ENDPOINT.
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    # "file": um span por linha, em JSON, no arquivo local (sem coletor).
+    global _trace_file
+    _trace_file = _TraceFile(settings.TRACING_FILE_PATH)
+    return ConsoleSpanExporter(
+        out=_trace_file,
+        formatter=lambda finished: finished.to_json(indent=None) + "\n"
+    )
+
+
+def setup_tracing(settings: Settings) -> Any:
+    """
+    Liga o tracing: cria o provider com amostragem `TRACING_SAMPLE_RATE` (respeitando a decisão
+    de um `traceparent` recebido), registra os spans de SQL e o span de serialização da resposta.
+    Retorna o exportador configurado.
+    """
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    global _provider, _tracer, _original_serialize_response
+    shutdown_tracing()
+
+    exporter = _build_exporter(settings)
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.TRACING_SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATE))
+    )
+    processor = SimpleSpanProcessor(exporter) if settings.TRACING_EXPORTER == "memory" else BatchSpanProcessor(exporter)
+    provider.add_span_processor(processor)
+    if not isinstance(trace.get_tracer_provider(), TracerProvider):
+        trace.set_tracer_provider(provider)
+    _provider = provider
+    _tracer = provider.get_tracer(__name__)
+
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+
+    # O FastAPI não oferece um gancho para a validação/serialização do `response_model`;
+    # a função do módulo é substituída por uma que abre um span em volta da original.
+    import fastapi.routing
+    _original_serialize_response = fastapi.routing.serialize_response
+
+    async def traced_serialize_response(**kwargs):
+        with span("serialize_response"):
+            return await _original_serialize_response(**kwargs)
+
+    fastapi.routing.serialize_response = traced_serialize_response
+    return exporter
+
+
+def shutdown_tracing() -> None:
+    """Envia os spans pendentes e desfaz o que `setup_tracing` registrou."""
+    global _provider, _tracer, _original_serialize_response, _trace_file
+    if _provider is None:
+        return
+    import fastapi.routing
+    fastapi.routing.serialize_response = _original_serialize_response
+    event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.remove(Engine, "handle_error", _handle_error)
+    provider, _provider, _tracer, _original_serialize_response = _provider, None, None, None
+    provider.shutdown()
+    if _trace_file is not None:
+        _trace_file.close()
+        _trace_file = None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    from opentelemetry.trace import SpanKind, get_current_span
+
+    if _tracer is None or not get_current_span().is_recording():
+        return
+    conn.info["tracing_span"] = _tracer.start_span(
+        statement.split(None, 1)[0].upper() if statement.strip() else "SQL",
+        kind=SpanKind.CLIENT,
+        attributes={"db.system": "postgresql", "db.statement": statement[:MAX_STATEMENT_LENGTH]}
+    )
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    sql_span = conn.info.pop("tracing_span", None)
+    if sql_span is not None:
+        sql_span.end()
+
+
+def _handle_error(exception_context):
+    from opentelemetry.trace import Status, StatusCode
+
+    connection = exception_context.connection
+    sql_span = connection.info.pop("tracing_span", None) if connection is not None else None
+    if sql_span is not None:
+        sql_span.record_exception(exception_context.original_exception)
+        sql_span.set_status(Status(StatusCode.ERROR))
+        sql_span.end()
+
+
+class TracingMiddleware:
+    """
+    Abre o span de servidor de cada requisição, continuando o trace recebido nos cabeçalhos
+    (`traceparent`/`tracestate`, W3C). O nome final do span usa a rota declarada.
+    """
+
+    def __init__(self, app: ASGIApp):
+        from opentelemetry import propagate
+        from opentelemetry.trace import SpanKind, Status, StatusCode
+
+        self.app = app
+        self.extract = propagate.extract
+        self.server_kind = SpanKind.SERVER
+        self.error_status = Status(StatusCode.ERROR)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or _tracer is None:
+            await self.app(scope, receive, send)
+            return
+
+        carrier = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        method = scope["method"]
+        with _tracer.start_as_current_span(
+            method,
+            context=self.extract(carrier),
+            kind=self.server_kind,
+            attributes={"http.request.method": method, "url.path": scope["path"]}
+        ) as server_span:
+
+            async def send_with_status(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    server_span.set_attribute("http.response.status_code", message["status"])
+                    if message["status"] >= 500:
+                        server_span.set_status(self.error_status)
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = route_template(scope)
+                server_span.update_name(f"{method} {route}")
+                server_span.set_attribute("http.route", route)
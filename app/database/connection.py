@@ -1,16 +1,79 @@
+import logging
+import os
+import threading
 import time
+from typing import Optional
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
 from sqlalchemy.exc import OperationalError
-from app.core.config import get_settings 
+from app.core.config import Settings, get_settings
 
-settings = get_settings()
+logger = logging.getLogger(__name__)
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+Base = declarative_base()
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+_settings: Optional[Settings] = None
+_engine: Optional[Engine] = None
+_lock = threading.Lock()
+
+
+class _LazySessionMaker(sessionmaker):
+    """`sessionmaker` que cria o engine do processo na primeira sessão aberta."""
+
+    def __call__(self, **local_kw) -> Session:
+        get_engine()
+        return super().__call__(**local_kw)
+
+
+SessionLocal = _LazySessionMaker(autocommit=False, autoflush=False)
+
+
+def configure_database(settings: Settings) -> None:
+    """
+    Define as configurações usadas para criar o engine. Nenhuma conexão é aberta aqui: o engine
+    só é criado no primeiro uso, dentro do processo que vai usá-lo. Um engine já existente
+    (de uma configuração anterior) é descartado.
+    """
+    global _settings, _engine
+    with _lock:
+        engine, _engine = _engine, None
+        _settings = settings
+    if engine is not None:
+        engine.dispose()
+
+
+def get_engine() -> Engine:
+    global _engine
+    engine = _engine
+    if engine is not None:
+        return engine
+    with _lock:
+        if _engine is None:
+            settings = _settings or get_settings()
+            _engine = create_engine(
+                settings.DATABASE_URL,
+                pool_pre_ping=True,
+                pool_size=settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_MAX_OVERFLOW,
+                pool_recycle=settings.DB_POOL_RECYCLE_SECONDS or -1
+            )
+            SessionLocal.configure(bind=_engine)
+        return _engine
+
+
+def _dispose_after_fork() -> None:
+    # O processo filho (ex.: worker do gunicorn com --preload) herda o pool do pai. As conexões
+    # herdadas são abandonadas sem fechar, para não encerrar os sockets que o pai ainda usa;
+    # o filho abre as suas sob demanda.
+    global _lock
+    _lock = threading.Lock()
+    if _engine is not None:
+        _engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_dispose_after_fork)
 
-Base = declarative_base()
 
 def get_db():
     db = SessionLocal()
@@ -20,19 +83,18 @@ def get_db():
         db.close()
 
 def connect_to_db(max_retries: int = 10, delay: int = 5):
-    print("Tentando conectar ao banco de dados...")
+    logger.info("Tentando conectar ao banco de dados...")
     for attempt in range(max_retries):
         try:
-            with engine.connect() as connection:
+            with get_engine().connect() as connection:
                 connection.execute(text("SELECT 1"))
-            print("Conexão com o banco de dados estabelecida com sucesso!")
+            logger.info("Conexão com o banco de dados estabelecida com sucesso!")
             return True
         except OperationalError as e:
             if attempt < max_retries - 1:
-                print(f"Tentativa {attempt + 1}/{max_retries} falhou. Erro: {e}. Tentando novamente em {delay} segundos...")
+                logger.warning("Tentativa %s/%s falhou. Erro: %s. Tentando novamente em %s segundos...", attempt + 1, max_retries, e, delay)
                 time.sleep(delay)
             else:
-                print(f"Falha ao conectar ao banco de dados após {max_retries} tentativas. Erro final: {e}")
+                logger.error("Falha ao conectar ao banco de dados após %s tentativas. Erro final: %s", max_retries, e)
                 raise
     return False
-
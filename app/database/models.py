@@ -1,11 +1,15 @@
 import datetime
-from sqlalchemy import Column, String, Boolean, DateTime, Integer, Numeric, ForeignKey, Text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Boolean, DateTime, Date, Integer, BigInteger, Numeric, ForeignKey, Text, Index, Enum, case, func, select, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 import uuid
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, column_property
 import datetime
 
 from app.database.connection import Base
+from app.purchase.status import PurchaseStatus
+
+def utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
 
 class User(Base):
     __tablename__ = "users"
@@ -17,8 +21,8 @@ class User(Base):
     hashed_password = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
     is_admin = Column(Boolean, default=False, nullable=False)
-    created_at = Column(DateTime(timezone=True), default=datetime.datetime.now(datetime.timezone.utc), nullable=False)
-    updated_at = Column(DateTime(timezone=True), default=datetime.datetime.now(datetime.timezone.utc), onupdate=datetime.datetime.now(datetime.timezone.utc), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, nullable=False)
 
     def __repr__(self):
         return f"<User(id='{self.id}', email='{self.email}')>"
@@ -31,11 +35,21 @@ class Client(Base):
     email = Column(String(255), unique=True, nullable=False, index=True)
     cpf = Column(String(11), unique=True, nullable=False, index=True)
     hashed_password = Column(String(255), nullable=False)
-    created_at = Column(DateTime(timezone=True), default=datetime.datetime.now(datetime.timezone.utc), nullable=False)
-    updated_at = Column(DateTime(timezone=True), default=datetime.datetime.now(datetime.timezone.utc), onupdate=datetime.datetime.now(datetime.timezone.utc), nullable=False)
+    # Agregados dos pedidos não cancelados, mantidos por `app.purchase.services`.
+    order_count = Column(Integer, nullable=False, default=0, server_default="0")
+    lifetime_value = Column(Numeric(14, 2), nullable=False, default=0, server_default="0")
+    last_order_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, nullable=False)
 
     orders = relationship("Purchase", back_populates="client_rel")
 
+    __table_args__ = (
+        Index("ix_clients_lifetime_value", "lifetime_value"),
+        Index("ix_clients_order_count", "order_count"),
+        Index("ix_clients_last_order_at", "last_order_at"),
+    )
+
     def __repr__(self):
         return f"<Client(id='{self.id}', name='{self.name}', email='{self.email}')>"
 
@@ -45,8 +59,8 @@ class Size(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String(20), nullable=False, unique=True)
     long_name = Column(String(35), nullable=True)
-    created_at = Column(DateTime(timezone=True), default=datetime.datetime.now(datetime.timezone.utc), nullable=False)
-    updated_at = Column(DateTime(timezone=True), default=datetime.datetime.now(datetime.timezone.utc), onupdate=datetime.datetime.now(datetime.timezone.utc), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, nullable=False)
 
     products = relationship("Product", back_populates="size")
     purchase_items = relationship("PurchaseItem", back_populates="size_rel")
@@ -59,8 +73,8 @@ class Category(Base):
 
     id = Column(Integer, primary_key=True)
     name = Column(String(50), nullable=False, unique=True)
-    created_at = Column(DateTime(timezone=True), default=datetime.datetime.now(datetime.timezone.utc), nullable=False)
-    updated_at = Column(DateTime(timezone=True), default=datetime.datetime.now(datetime.timezone.utc), onupdate=datetime.datetime.now(datetime.timezone.utc), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, nullable=False)
     products = relationship("Product", back_populates="category")
 
     def __repr__(self):
@@ -72,8 +86,8 @@ class Gender(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String(20), nullable=False, unique=True)
     long_name = Column(String(50), nullable=True)
-    created_at = Column(DateTime(timezone=True), default=datetime.datetime.now(datetime.timezone.utc), nullable=False)
-    updated_at = Column(DateTime(timezone=True), default=datetime.datetime.now(datetime.timezone.utc), onupdate=datetime.datetime.now(datetime.timezone.utc), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, nullable=False)
     products = relationship("Product", back_populates="gender")
 
     def __repr__(self):
@@ -83,10 +97,11 @@ class Product(Base):
     __tablename__ = "products"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    name = Column(String(255), nullable=False)
+    name = Column(String(255), nullable=False, unique=True)
     description = Column(Text, nullable=False)
     price = Column(Numeric(10, 2), nullable=False)
     inventory = Column(Integer, nullable=False)
+    inventory_shard_count = Column(Integer, nullable=False, default=0, server_default="0")
     size_id = Column(Integer, ForeignKey('sizes.id'), nullable=False)
     category_id = Column(Integer, ForeignKey('categories.id'), nullable=False)
     gender_id = Column(Integer, ForeignKey('genders.id'), nullable=False)
@@ -95,12 +110,37 @@ class Product(Base):
     gender = relationship("Gender", back_populates="products")
     images = relationship("ProductImage", back_populates="product")
     order_items = relationship("PurchaseItem", back_populates="product_rel")
-    created_at = Column(DateTime(timezone=True), default=datetime.datetime.now(datetime.timezone.utc), nullable=False)
-    updated_at = Column(DateTime(timezone=True), default=datetime.datetime.now(datetime.timezone.utc), onupdate=datetime.datetime.now(datetime.timezone.utc), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, nullable=False)
 
     def __repr__(self):
         return f"<Product(id='{self.id}', name='{self.name}', price={self.price}, inventory={self.inventory})>"
 
+class ProductInventoryShard(Base):
+    __tablename__ = "product_inventory_shards"
+
+    product_id = Column(UUID(as_uuid=True), ForeignKey('products.id', ondelete="CASCADE"), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    inventory = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<ProductInventoryShard(product_id='{self.product_id}', shard={self.shard}, inventory={self.inventory})>"
+
+# Estoque efetivo: soma dos fragmentos para produtos fragmentados, a coluna `inventory` para os demais.
+Product.available_inventory = column_property(
+    case(
+        (
+            Product.inventory_shard_count > 0,
+            select(func.coalesce(func.sum(ProductInventoryShard.inventory), 0))
+            .where(ProductInventoryShard.product_id == Product.id)
+            .correlate_except(ProductInventoryShard)
+            .scalar_subquery()
+        ),
+        else_=Product.inventory
+    )
+)
+
 class ProductImage(Base):
     __tablename__ = "product_images"
 
@@ -109,9 +149,22 @@ class ProductImage(Base):
     url = Column(String(500), nullable=False)
     description = Column(String(255), nullable=True)
     is_main = Column(Boolean, default=False, nullable=False)
+    # Preenchidos apenas para imagens enviadas por upload e armazenadas pela própria API.
+    content_hash = Column(String(64), nullable=True, index=True)
+    content_type = Column(String(50), nullable=True)
+    byte_size = Column(Integer, nullable=True)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
     product = relationship("Product", back_populates="images")
-    created_at = Column(DateTime(timezone=True), default=datetime.datetime.now(datetime.timezone.utc), nullable=False)
-    updated_at = Column(DateTime(timezone=True), default=datetime.datetime.now(datetime.timezone.utc), onupdate=datetime.datetime.now(datetime.timezone.utc), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, nullable=False)
+
+    __table_args__ = (
+        # Imagem principal de cada produto, usada pela listagem de cards.
+        Index("ix_product_images_main", "product_id", postgresql_where=text("is_main")),
+        # Imagens de um produto (detalhe e versão do ETag).
+        Index("ix_product_images_product_id", "product_id"),
+    )
 
     def __repr__(self):
         return f"<ProductImage(id='{self.id}', product_id='{self.product_id}', url='{self.url[:30]}...')>"
@@ -122,13 +175,19 @@ class Purchase(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     client_id = Column(UUID(as_uuid=True), ForeignKey('clients.id'), nullable=False)
     subtotal = Column(Numeric(10, 2), nullable=False, default=0.0)
-    status = Column(String(50), nullable=False, default="pending")
-    created_at = Column(DateTime(timezone=True), default=datetime.datetime.now(datetime.timezone.utc), nullable=False)
-    updated_at = Column(DateTime(timezone=True), default=datetime.datetime.now(datetime.timezone.utc), onupdate=datetime.datetime.now(datetime.timezone.utc), nullable=False)
+    status = Column(Enum(PurchaseStatus, name="purchase_status"), nullable=False, default=PurchaseStatus.pending)
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, nullable=False)
 
     client_rel = relationship("Client", back_populates="orders")
     items = relationship("PurchaseItem", back_populates="purchase_rel", cascade="all, delete-orphan", lazy='select')
 
+    __table_args__ = (
+        Index("ix_purchases_client_id_created_at", "client_id", "created_at"),
+        Index("ix_purchases_created_at_id", "created_at", "id"),
+        Index("ix_purchases_status_created_at", "status", "created_at"),
+    )
+
     def __repr__(self):
         return f"<Purchase(id='{self.id}', client_id='{self.client_id}', status='{self.status}', subtotal={self.subtotal})>"
 
@@ -142,9 +201,78 @@ class PurchaseItem(Base):
     quantity = Column(Integer, nullable=False)
     unit_price_at_purchase = Column(Numeric(10, 2), nullable=False)
     total_price = Column(Numeric(10, 2), nullable=False)
-    created_at = Column(DateTime(timezone=True), default=datetime.datetime.now(datetime.timezone.utc), nullable=False)
-    updated_at = Column(DateTime(timezone=True), default=datetime.datetime.now(datetime.timezone.utc), onupdate=datetime.datetime.now(datetime.timezone.utc), nullable=False)
+    # Categoria e gênero do produto no momento da venda, sem chave estrangeira (como o preço):
+    # os agregados de vendas são estornados com eles, mesmo que o produto mude de seção depois.
+    category_id = Column(Integer, nullable=False)
+    gender_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, nullable=False)
 
     purchase_rel = relationship("Purchase", back_populates="items")
     product_rel = relationship("Product", back_populates="order_items")
-    size_rel = relationship("Size", back_populates="purchase_items") 
\ No newline at end of file
+    size_rel = relationship("Size", back_populates="purchase_items") 
+
+    __table_args__ = (
+        Index("ix_purchase_items_purchase_id_product_id", "purchase_id", "product_id"),
+        Index("ix_purchase_items_product_id", "product_id"),
+    )
+
+class PurchaseIntake(Base):
+    __tablename__ = "purchase_intake"
+
+    # O ID da entrada é também o ID do pedido criado a partir dela.
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    payload = Column(JSONB, nullable=False)
+    status = Column(String(20), nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    available_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_purchase_intake_queued", "available_at", postgresql_where=text("status = 'queued'")),
+        Index("ix_purchase_intake_processing", "locked_at", postgresql_where=text("status = 'processing'")),
+        Index("ix_purchase_intake_done", "processed_at", postgresql_where=text("status = 'done'")),
+        Index("ix_purchase_intake_rejected", "processed_at", postgresql_where=text("status = 'rejected'")),
+        Index("ix_purchase_intake_dead_letter", "processed_at", postgresql_where=text("status = 'dead_letter'")),
+    )
+
+    def __repr__(self):
+        return f"<PurchaseIntake(id='{self.id}', status='{self.status}', attempts={self.attempts})>"
+
+class SalesDaily(Base):
+    __tablename__ = "sales_daily"
+
+    # `dimension` é 'total', 'product', 'category' ou 'gender'; `dimension_key` é o ID correspondente ('all' para o total).
+    dimension = Column(String(10), primary_key=True)
+    day = Column(Date, primary_key=True)
+    dimension_key = Column(String(36), primary_key=True)
+    quantity = Column(BigInteger, nullable=False, default=0)
+    revenue = Column(Numeric(14, 2), nullable=False, default=0)
+    order_count = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<SalesDaily(dimension='{self.dimension}', day='{self.day}', key='{self.dimension_key}', revenue={self.revenue})>"
+
+class SalesDailyDelta(Base):
+    __tablename__ = "sales_daily_deltas"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    dimension = Column(String(10), nullable=False)
+    day = Column(Date, nullable=False)
+    dimension_key = Column(String(36), nullable=False)
+    quantity = Column(BigInteger, nullable=False)
+    revenue = Column(Numeric(14, 2), nullable=False)
+    order_count = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_sales_daily_deltas_dimension_day", "dimension", "day"),
+    )
+
+    def __repr__(self):
+        return f"<SalesDailyDelta(id={self.id}, dimension='{self.dimension}', day='{self.day}', key='{self.dimension_key}')>"
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional, Annotated
 
@@ -6,6 +6,7 @@ from app.database.connection import get_db
 from app.gender import schemas, services
 from app.database import models
 from app.core.dependencies import get_current_active_user, get_current_admin_user
+from app.core.etag import check_etag
 from app.gender.schemas import MessageResponse as GenderMessageResponse
 
 router = APIRouter(
@@ -61,6 +62,8 @@ def create_gender_route(
     }
 )
 def read_genders_route(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0, description="Número de registros a pular."),
     limit: int = Query(100, ge=1, le=100, description="Número máximo de registros."),
     db: Session = Depends(get_db),
@@ -72,6 +75,9 @@ def read_genders_route(
     - **Casos de uso**:
         - Preencher seleção de gênero em formulário. Listar em painel admin.
     """
+    not_modified = check_etag(request, response, services.get_genders_etag(db, skip=skip, limit=limit))
+    if not_modified:
+        return not_modified
     return services.get_genders(db, skip=skip, limit=limit)
 
 @router.get(
@@ -88,6 +94,8 @@ def read_genders_route(
 )
 def read_gender_route(
     gender_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: Annotated[models.User, Depends(get_current_active_user)] = None
 ):
@@ -96,7 +104,13 @@ def read_gender_route(
     - **Regras de negócio**: Gênero deve existir. Requer auth.
     - **Casos de uso**: Exibir detalhes ao editar produto.
     """
-    db_gender = services.get_gender(db, gender_id)
+    etag = services.get_gender_etag(db, gender_id)
+    if etag is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Gênero não encontrado")
+    not_modified = check_etag(request, response, etag)
+    if not_modified:
+        return not_modified
+    db_gender = services.get_cached_gender(db, gender_id)
     if db_gender is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Gênero não encontrado")
     return db_gender
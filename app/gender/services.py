@@ -2,7 +2,9 @@ from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from app.database import models
 from app.gender import schemas
-from typing import List, Optional
+from typing import Any, Optional, Tuple
+from app.core.etag import make_etag
+from app.core import reference
 
 def get_gender_by_name(db: Session, name: str) -> Optional[models.Gender]:
     return db.query(models.Gender).filter(models.Gender.name == name).first()
@@ -20,6 +22,7 @@ def create_gender(db: Session, gender_data: schemas.GenderCreate) -> models.Gend
     )
     db.add(db_gender)
     db.commit()
+    reference.genders.invalidate()
     db.refresh(db_gender)
     return db_gender
 
@@ -27,12 +30,24 @@ def get_genders(
     db: Session,
     skip: int = 0,
     limit: int = 100
-) -> List[models.Gender]:
-    return db.query(models.Gender).offset(skip).limit(limit).all()
+) -> Tuple[Any, ...]:
+    return reference.genders.all(db)[skip:skip + limit]
 
 def get_gender(db: Session, gender_id: int) -> Optional[models.Gender]:
     return db.query(models.Gender).filter(models.Gender.id == gender_id).first()
 
+def get_cached_gender(db: Session, gender_id: int) -> Optional[Any]:
+    return reference.genders.get(db, gender_id)
+
+def get_genders_etag(db: Session, skip: int = 0, limit: int = 100) -> str:
+    return make_etag("genders", reference.genders.snapshot(db).version, skip, limit)
+
+def get_gender_etag(db: Session, gender_id: int) -> Optional[str]:
+    row = reference.genders.get(db, gender_id)
+    if row is None:
+        return None
+    return make_etag("gender", gender_id, row.updated_at)
+
 def update_gender(db: Session, gender_id: int, gender_data: schemas.GenderUpdate) -> Optional[models.Gender]:
     db_gender = get_gender(db, gender_id)
     if not db_gender:
@@ -52,6 +67,7 @@ def update_gender(db: Session, gender_id: int, gender_data: schemas.GenderUpdate
 
     db.add(db_gender)
     db.commit()
+    reference.genders.invalidate()
     db.refresh(db_gender)
     return db_gender
 
@@ -61,5 +77,6 @@ def delete_gender(db: Session, gender_id: int) -> bool:
         return False
     db.delete(db_gender)
     db.commit()
+    reference.genders.invalidate()
     return True
 
@@ -1,4 +1,7 @@
+from contextlib import asynccontextmanager
+from typing import Optional
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from app.auth.routes import router as auth_router
 from app.clients.routes import router as clients_router
 from app.category.routes import router as categories_router
@@ -7,22 +10,92 @@ from app.product.routes import router as products_router
 from app.product_image.routes import router as product_images_router
 from app.purchase.routes import router as purchases_router
 from app.size.routes import router as sizes_router
+from app.reference.routes import router as reference_router
+from app.purchase import intake, rollups
+from app.product_image import storage as image_storage
+from app.core import reference
+from app.core import logs, metrics, profiling, tracing
+from app.core.compression import CompressionMiddleware
+from app.core.config import Settings, get_settings
+from app.database.connection import SessionLocal, configure_database
 
-app = FastAPI(
-    title="Infog2 API",
-    description="API RESTful para gerenciar clientes, produtos e pedidos da Lu Estilo.",
-    version="1.0.0"
-)
-
-app.include_router(auth_router)
-app.include_router(clients_router)
-app.include_router(categories_router)
-app.include_router(genders_router)
-app.include_router(products_router)
-app.include_router(product_images_router)
-app.include_router(purchases_router)
-app.include_router(sizes_router)
-
-@app.get("/")
-async def read_root():
-    return {"message": "Bem-vindo à Lu Estilo API!"}
\ No newline at end of file
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Configurado aqui, e não na fábrica, para que cada inicialização desfaça o `shutdown_logging`
+    # da anterior; com o gunicorn, cada worker monta o seu depois do fork.
+    logs.configure_logging(app.state.settings)
+    # Pelo mesmo motivo, o tracing é ligado aqui e desligado no encerramento: o exportador
+    # (e o arquivo de `TRACING_EXPORTER=file`) é de cada processo e de cada ciclo.
+    if app.state.settings.TRACING_ENABLED:
+        app.state.span_exporter = tracing.setup_tracing(app.state.settings)
+    with SessionLocal() as db:
+        reference.preload(db)
+    intake.start_workers()
+    rollups.start_refresher()
+    yield
+    rollups.stop_refresher()
+    intake.stop_workers()
+    image_storage.shutdown_pool()
+    tracing.shutdown_tracing()
+    logs.shutdown_logging()
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """
+    Monta a aplicação. Nenhuma conexão com o banco é aberta aqui: o engine é criado no primeiro
+    uso, em cada processo, com as configurações recebidas. Por isso a aplicação pode ser
+    carregada no processo mestre do gunicorn (`--preload`) e compartilhada com os workers.
+    """
+    settings = settings or get_settings()
+    configure_database(settings)
+
+    app = FastAPI(
+        title="Infog2 API",
+        description="API RESTful para gerenciar clientes, produtos e pedidos da Lu Estilo.",
+        version="1.0.0",
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse
+    )
+    app.state.settings = settings
+
+    if settings.COMPRESSION_ENABLED:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+            media_types=settings.COMPRESSION_MEDIA_TYPES,
+            gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+            brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+            cache_entries=settings.COMPRESSION_CACHE_ENTRIES
+        )
+    if settings.METRICS_ENABLED:
+        # Adicionado depois da compressão para envolvê-la e medir também o tempo gasto nela.
+        app.add_middleware(metrics.MetricsMiddleware)
+        app.include_router(metrics.router)
+    if settings.TRACING_ENABLED:
+        app.add_middleware(tracing.TracingMiddleware)
+    if settings.PROFILING_ENABLED:
+        app.add_middleware(profiling.ProfilingMiddleware, settings=settings)
+    if settings.ACCESS_LOG_ENABLED:
+        app.add_middleware(
+            logs.AccessLogMiddleware,
+            sampled_routes=settings.ACCESS_LOG_SAMPLED_ROUTES,
+            sample_rate=settings.ACCESS_LOG_2XX_SAMPLE_RATE,
+            slow_ms=settings.ACCESS_LOG_SLOW_MS
+        )
+
+    app.include_router(auth_router)
+    app.include_router(clients_router)
+    app.include_router(categories_router)
+    app.include_router(genders_router)
+    app.include_router(products_router)
+    app.include_router(product_images_router)
+    app.include_router(purchases_router)
+    app.include_router(sizes_router)
+    app.include_router(reference_router)
+
+    @app.get("/")
+    async def read_root():
+        return {"message": "Bem-vindo à Lu Estilo API!"}
+
+    return app
+
+app = create_app()
@@ -0,0 +1,263 @@
+import argparse
+import codecs
+import csv
+import io
+import json
+import logging
+import sys
+import time
+from typing import Callable, IO, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.database import models
+from app.product import schemas
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("csv", "ndjson")
+MAX_REPORTED_ERRORS = 100
+STAGING_TABLE = "product_import_staging"
+STAGING_COLUMNS = ("line", "name", "description", "price", "inventory", "size_id", "category_id", "gender_id", "image_urls")
+
+ProgressCallback = Callable[[dict], None]
+
+
+def detect_format(filename: Optional[str]) -> Optional[str]:
+    if not filename:
+        return None
+    extension = filename.rsplit(".", 1)[-1].lower()
+    if extension == "csv":
+        return "csv"
+    if extension in ("ndjson", "jsonl"):
+        return "ndjson"
+    return None
+
+
+def _iter_csv(fileobj: IO[bytes]) -> Iterator[Tuple[int, object]]:
+    reader = csv.DictReader(codecs.iterdecode(fileobj, "utf-8-sig"))
+    for row in reader:
+        image_urls = row.get("image_urls") or ""
+        row["image_urls"] = [url for url in image_urls.split("|") if url]
+        yield reader.line_num, row
+
+
+def _iter_ndjson(fileobj: IO[bytes]) -> Iterator[Tuple[int, object]]:
+    for line_number, line in enumerate(codecs.iterdecode(fileobj, "utf-8-sig"), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError:
+            yield line_number, None
+
+
+def _format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+    )
+
+
+def _validate_row(raw: object, reference_ids: dict) -> Tuple[Optional[schemas.ProductImportRow], Optional[str]]:
+    if not isinstance(raw, dict):
+        return None, "Linha não é um objeto JSON válido."
+    try:
+        row = schemas.ProductImportRow.model_validate(raw)
+    except ValidationError as exc:
+        return None, _format_validation_error(exc)
+    if row.size_id not in reference_ids["size_id"]:
+        return None, f"Tamanho com ID {row.size_id} não encontrado."
+    if row.category_id not in reference_ids["category_id"]:
+        return None, f"Categoria com ID {row.category_id} não encontrada."
+    if row.gender_id not in reference_ids["gender_id"]:
+        return None, f"Gênero com ID {row.gender_id} não encontrado."
+    return row, None
+
+
+def _copy_chunk(cursor, rows: List[Tuple[int, schemas.ProductImportRow]]) -> None:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for line_number, row in rows:
+        writer.writerow((
+            line_number, row.name, row.description, row.price, row.inventory,
+            row.size_id, row.category_id, row.gender_id,
+            "\n".join(str(url) for url in row.image_urls),
+        ))
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {STAGING_TABLE} ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer
+    )
+
+
+MERGE_PRODUCTS_SQL = f"""
+WITH latest AS (
+    SELECT DISTINCT ON (name) name, description, price, inventory, size_id, category_id, gender_id
+    FROM {STAGING_TABLE}
+    ORDER BY name, line DESC
+), upserted AS (
+    INSERT INTO products (id, name, description, price, inventory, size_id, category_id, gender_id, created_at, updated_at)
+    SELECT gen_random_uuid(), name, description, price, inventory, size_id, category_id, gender_id, now(), now()
+    FROM latest
+    ON CONFLICT (name) DO UPDATE SET
+        description = EXCLUDED.description,
+        price = EXCLUDED.price,
+        inventory = EXCLUDED.inventory,
+        size_id = EXCLUDED.size_id,
+        category_id = EXCLUDED.category_id,
+        gender_id = EXCLUDED.gender_id,
+        updated_at = EXCLUDED.updated_at
+    RETURNING xmax = 0 AS inserted
+)
+SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM upserted
+"""
+
+MERGE_IMAGES_SQL = f"""
+WITH latest AS (
+    SELECT DISTINCT ON (name) name, image_urls
+    FROM {STAGING_TABLE}
+    ORDER BY name, line DESC
+)
+INSERT INTO product_images (id, product_id, url, is_main, created_at, updated_at)
+SELECT gen_random_uuid(), p.id, u.url,
+       u.position = 1 AND NOT EXISTS (
+           SELECT 1 FROM product_images main WHERE main.product_id = p.id AND main.is_main
+       ),
+       now(), now()
+FROM latest
+JOIN products p ON p.name = latest.name
+CROSS JOIN LATERAL unnest(string_to_array(latest.image_urls, E'\\n')) WITH ORDINALITY AS u(url, position)
+WHERE NOT EXISTS (
+    SELECT 1 FROM product_images existing WHERE existing.product_id = p.id AND existing.url = u.url
+)
+"""
+
+REDISTRIBUTE_SHARDS_SQL = f"""
+WITH latest AS (
+    SELECT DISTINCT ON (name) name, inventory
+    FROM {STAGING_TABLE}
+    ORDER BY name, line DESC
+)
+UPDATE product_inventory_shards s
+SET inventory = latest.inventory / p.inventory_shard_count
+              + CASE WHEN s.shard < latest.inventory % p.inventory_shard_count THEN 1 ELSE 0 END,
+    updated_at = now()
+FROM latest
+JOIN products p ON p.name = latest.name
+WHERE s.product_id = p.id AND p.inventory_shard_count > 0
+"""
+
+
+def import_catalog(
+    db: Session,
+    fileobj: IO[bytes],
+    file_format: str,
+    progress: Optional[ProgressCallback] = None
+) -> dict:
+    """
+    Importa produtos de um arquivo CSV ou NDJSON em streaming.
+
+    As linhas são validadas em blocos com as regras de `ProductCreate`, copiadas com `COPY`
+    para uma tabela temporária e mescladas em `products`/`product_images` em uma única
+    transação. Apenas um bloco fica em memória por vez.
+    """
+    if file_format not in IMPORT_FORMATS:
+        raise ValueError(f"Formato de importação não suportado: {file_format}")
+
+    started_at = time.perf_counter()
+    chunk_size = get_settings().PRODUCT_IMPORT_CHUNK_SIZE
+    reference_ids = {
+        "size_id": set(db.scalars(select(models.Size.id))),
+        "category_id": set(db.scalars(select(models.Category.id))),
+        "gender_id": set(db.scalars(select(models.Gender.id))),
+    }
+
+    db.execute(text(f"DROP TABLE IF EXISTS {STAGING_TABLE}"))
+    db.execute(text(
+        f"CREATE TEMP TABLE {STAGING_TABLE} ("
+        "line integer NOT NULL, name varchar(255) NOT NULL, description text NOT NULL, "
+        "price numeric(10, 2) NOT NULL, inventory integer NOT NULL, size_id integer NOT NULL, "
+        "category_id integer NOT NULL, gender_id integer NOT NULL, image_urls text NOT NULL"
+        ") ON COMMIT DROP"
+    ))
+    cursor = db.connection().connection.cursor()
+
+    summary = {"rows": 0, "valid": 0, "invalid": 0, "errors": []}
+
+    def report() -> None:
+        snapshot = {key: summary[key] for key in ("rows", "valid", "invalid")}
+        logger.info("Importação de catálogo: %(rows)s linhas lidas, %(valid)s válidas, %(invalid)s inválidas.", snapshot)
+        if progress:
+            progress(snapshot)
+
+    rows_iter = _iter_csv(fileobj) if file_format == "csv" else _iter_ndjson(fileobj)
+    chunk: List[Tuple[int, schemas.ProductImportRow]] = []
+    try:
+        for line_number, raw in rows_iter:
+            summary["rows"] += 1
+            row, error = _validate_row(raw, reference_ids)
+            if error:
+                summary["invalid"] += 1
+                if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                    summary["errors"].append({"line": line_number, "detail": error})
+                continue
+            summary["valid"] += 1
+            chunk.append((line_number, row))
+            if len(chunk) >= chunk_size:
+                _copy_chunk(cursor, chunk)
+                chunk = []
+                report()
+        if chunk:
+            _copy_chunk(cursor, chunk)
+        report()
+
+        created, updated = db.execute(text(MERGE_PRODUCTS_SQL)).one()
+        db.execute(text(REDISTRIBUTE_SHARDS_SQL))
+        images_created = db.execute(text(MERGE_IMAGES_SQL)).rowcount
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    elapsed = time.perf_counter() - started_at
+    summary.update({
+        "created": created,
+        "updated": updated,
+        "images_created": images_created,
+        "elapsed_ms": round(elapsed * 1000, 3),
+        "rows_per_second": round(summary["rows"] / elapsed, 1) if elapsed > 0 else float(summary["rows"]),
+    })
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Importa um catálogo de produtos a partir de um arquivo CSV ou NDJSON.")
+    parser.add_argument("path", help="Caminho do arquivo a importar.")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="Formato do arquivo. Padrão: detectado pela extensão.")
+    args = parser.parse_args(argv)
+
+    file_format = args.format or detect_format(args.path)
+    if file_format is None:
+        parser.error("Não foi possível detectar o formato do arquivo. Use --format.")
+
+    from app.database.connection import SessionLocal
+
+    def print_progress(snapshot: dict) -> None:
+        print(f"{snapshot['rows']} linhas lidas ({snapshot['valid']} válidas, {snapshot['invalid']} inválidas)", file=sys.stderr)
+
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as fileobj:
+            summary = import_catalog(db, fileobj, file_format, progress=print_progress)
+    finally:
+        db.close()
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0 if summary["invalid"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, update, delete, values, column, case, func, Integer
+from sqlalchemy.dialects.postgresql import UUID
+from typing import Dict, Optional
+import uuid
+
+from app.database import models
+
+Shard = models.ProductInventoryShard
+
+
+def _split(total: int, shard_count: int, shard: int) -> int:
+    return total // shard_count + (1 if shard < total % shard_count else 0)
+
+
+def set_inventory_shards(db: Session, product_id: uuid.UUID, shard_count: int) -> Optional[models.Product]:
+    """
+    Ativa, altera ou desativa (`shard_count=0`) a fragmentação do estoque de um produto.
+    O estoque atual é redistribuído igualmente entre os novos fragmentos.
+    Deve ser usado fora de picos: compras concorrentes do produto podem falhar durante a troca.
+    """
+    db_product = db.query(models.Product).filter(models.Product.id == product_id).with_for_update().first()
+    if not db_product:
+        return None
+
+    shard_inventories = db.scalars(
+        select(Shard.inventory).where(Shard.product_id == product_id).order_by(Shard.shard).with_for_update()
+    ).all()
+    total = sum(shard_inventories) if db_product.inventory_shard_count > 0 else db_product.inventory
+
+    db.execute(delete(Shard).where(Shard.product_id == product_id))
+    if shard_count > 0:
+        db.execute(insert(Shard), [
+            {"product_id": product_id, "shard": shard, "inventory": _split(total, shard_count, shard)}
+            for shard in range(shard_count)
+        ])
+        db_product.inventory = 0
+    else:
+        db_product.inventory = total
+    db_product.inventory_shard_count = shard_count
+
+    db.add(db_product)
+    db.commit()
+    db.refresh(db_product)
+    return db_product
+
+
+def redistribute_inventory(db: Session, totals: Dict[uuid.UUID, int]) -> None:
+    """
+    Define o estoque total de produtos fragmentados, dividindo-o igualmente entre os fragmentos
+    com um único `UPDATE`. Produtos não fragmentados em `totals` são ignorados.
+    """
+    if not totals:
+        return
+    product_ids = sorted(totals)
+    db.execute(
+        select(Shard.product_id)
+        .where(Shard.product_id.in_(product_ids))
+        .order_by(Shard.product_id, Shard.shard)
+        .with_for_update()
+    )
+    target = values(
+        column("product_id", UUID(as_uuid=True)), column("total", Integer), name="target"
+    ).data([(product_id, totals[product_id]) for product_id in product_ids])
+    db.execute(
+        update(Shard)
+        .where(Shard.product_id == target.c.product_id, models.Product.id == Shard.product_id)
+        .values(inventory=(
+            target.c.total // models.Product.inventory_shard_count
+            + case((Shard.shard < target.c.total % models.Product.inventory_shard_count, 1), else_=0)
+        ))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def reserve_from_shards(db: Session, product_id: uuid.UUID, quantity: int) -> Optional[int]:
+    """
+    Debita `quantity` do estoque de um produto fragmentado.
+
+    Primeiro tenta um fragmento aleatório com estoque suficiente que não esteja bloqueado por
+    outra compra (`SKIP LOCKED`), sem esperar. Se não houver, bloqueia todos os fragmentos em
+    ordem e debita de vários deles. Retorna `None` em caso de sucesso ou o estoque disponível
+    quando ele é insuficiente (nada é debitado).
+    """
+    pick = (
+        select(Shard.product_id, Shard.shard)
+        .where(Shard.product_id == product_id, Shard.inventory >= quantity)
+        .order_by(func.random())
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .subquery("pick")
+    )
+    reserved = db.execute(
+        update(Shard)
+        .where(Shard.product_id == pick.c.product_id, Shard.shard == pick.c.shard)
+        .values(inventory=Shard.inventory - quantity)
+        .returning(Shard.shard)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if reserved is not None:
+        return None
+
+    shards = db.execute(
+        select(Shard.shard, Shard.inventory)
+        .where(Shard.product_id == product_id)
+        .order_by(Shard.shard)
+        .with_for_update()
+    ).all()
+    available = sum(row.inventory for row in shards)
+    if available < quantity:
+        return available
+
+    takes = []
+    remaining = quantity
+    for row in sorted(shards, key=lambda row: row.inventory, reverse=True):
+        if remaining == 0:
+            break
+        take = min(row.inventory, remaining)
+        if take > 0:
+            takes.append((row.shard, take))
+            remaining -= take
+    taken = values(column("shard", Integer), column("quantity", Integer), name="taken").data(takes)
+    db.execute(
+        update(Shard)
+        .where(Shard.product_id == product_id, Shard.shard == taken.c.shard)
+        .values(inventory=Shard.inventory - taken.c.quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return None
+
+
+def restock_shards(db: Session, quantities: Dict[uuid.UUID, int]) -> None:
+    """Devolve estoque a produtos fragmentados, sempre no fragmento com menos estoque, em um único `UPDATE`."""
+    if not quantities:
+        return
+    restocked = values(
+        column("product_id", UUID(as_uuid=True)), column("quantity", Integer), name="restocked"
+    ).data([(product_id, quantities[product_id]) for product_id in sorted(quantities)])
+    emptiest = (
+        select(Shard.shard)
+        .where(Shard.product_id == restocked.c.product_id)
+        .order_by(Shard.inventory, Shard.shard)
+        .limit(1)
+        .correlate(restocked)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(Shard)
+        .where(Shard.product_id == restocked.c.product_id, Shard.shard == emptiest)
+        .values(inventory=Shard.inventory + restocked.c.quantity)
+        .execution_options(synchronize_session=False)
+    )
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import List, Optional, Annotated
 import uuid
 
 from app.database.connection import get_db
-from app.product import schemas, services
+from app.product import schemas, services, importer
 from app.database import models
 from app.core.dependencies import get_current_active_user, get_current_admin_user
+from app.core.etag import check_etag
+from app.core.responses import model_list_response
+from app.core.config import get_settings
 from app.product.schemas import MessageResponse as ProductMessageResponse
 
 router = APIRouter(
@@ -61,6 +64,99 @@ def create_product_route(
     """
     return services.create_product(db, product_data)
 
+@router.post(
+    "/bulk",
+    response_model=schemas.ProductBulkResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Cria ou atualiza produtos em lote.",
+    responses={
+        status.HTTP_200_OK: {
+            "description": "Lote processado. O resultado de cada item é retornado individualmente.",
+            "content": {"application/json": {"example": schemas.ProductBulkResponse.model_config['json_schema_extra']['example']}}
+        },
+        status.HTTP_400_BAD_REQUEST: {
+            "content": {"application/json": {"example": {"detail": "O lote excede o limite de 5000 produtos."}}}
+        }
+    }
+)
+def bulk_upsert_products_route(
+    bulk_data: schemas.ProductBulkRequest,
+    db: Session = Depends(get_db),
+    current_user: Annotated[models.User, Depends(get_current_active_user)] = None
+):
+    """
+    Cria ou atualiza vários produtos em uma única chamada, usando o nome do produto como chave.
+
+    Os IDs de tamanho, categoria e gênero são validados uma única vez para todo o lote, e os
+    produtos são gravados em blocos com `INSERT ... ON CONFLICT (name) DO UPDATE`.
+
+    - **Regras de negócio**:
+        - Produtos inexistentes exigem todos os campos de `ProductCreate` (exceto imagens).
+        - Produtos existentes são atualizados apenas nos campos enviados.
+        - Itens inválidos são rejeitados individualmente, sem interromper o restante do lote.
+        - O lote não pode exceder `PRODUCT_BULK_MAX_ITEMS` itens.
+        - Requer autenticação de usuário.
+
+    - **Casos de uso**:
+        - Atualização de catálogo enviada pela equipe de merchandising.
+        - Reajuste de preços e estoque de muitos produtos de uma vez.
+    """
+    max_items = get_settings().PRODUCT_BULK_MAX_ITEMS
+    if len(bulk_data.items) > max_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"O lote excede o limite de {max_items} produtos."
+        )
+    return services.bulk_upsert_products(db, bulk_data.items)
+
+@router.post(
+    "/import",
+    response_model=schemas.ProductImportResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Importa um catálogo de produtos a partir de CSV ou NDJSON (requer admin).",
+    responses={
+        status.HTTP_200_OK: {
+            "description": "Arquivo importado. Linhas inválidas são listadas em `errors`.",
+            "content": {"application/json": {"example": schemas.ProductImportResponse.model_config['json_schema_extra']['example']}}
+        },
+        status.HTTP_400_BAD_REQUEST: {
+            "content": {"application/json": {"example": {"detail": "Formato de arquivo não suportado. Use CSV ou NDJSON."}}}
+        },
+        status.HTTP_403_FORBIDDEN: {
+            "content": {"application/json": {"example": {"detail": "Acesso negado. Requer privilégios de administrador."}}}
+        }
+    }
+)
+def import_products_route(
+    file: UploadFile = File(..., description="Arquivo CSV ou NDJSON com os produtos."),
+    file_format: Optional[str] = Query(None, alias="format", description="Formato do arquivo ('csv' ou 'ndjson'). Padrão: detectado pela extensão."),
+    db: Session = Depends(get_db),
+    current_user: Annotated[models.User, Depends(get_current_admin_user)] = None
+):
+    """
+    Importa um catálogo completo de produtos em streaming.
+
+    O arquivo é lido e validado em blocos, copiado com `COPY` para uma tabela temporária e mesclado
+    em `products` e `product_images` em uma única transação. Produtos existentes (mesmo nome) são atualizados.
+
+    - **Regras de negócio**:
+        - Colunas: `name`, `description`, `price`, `inventory`, `size_id`, `category_id`, `gender_id`
+          e, opcionalmente, `image_urls` (separadas por `|` no CSV, lista no NDJSON).
+        - Cada linha segue as regras de `ProductCreate`; linhas inválidas são ignoradas e reportadas.
+        - Apenas usuários administradores podem importar.
+
+    - **Casos de uso**:
+        - Carga inicial do catálogo.
+        - Troca de coleção sazonal.
+    """
+    file_format = file_format or importer.detect_format(file.filename)
+    if file_format not in importer.IMPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato de arquivo não suportado. Use CSV ou NDJSON."
+        )
+    return importer.import_catalog(db, file.file, file_format)
+
 @router.get(
     "/read",
     response_model=List[schemas.ProductResponse],
@@ -76,6 +172,8 @@ def create_product_route(
     }
 )
 def read_products_route(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0, description="Número de registros a pular."),
     limit: int = Query(100, ge=1, le=100, description="Máximo de registros a retornar."),
     category_id: Optional[int] = Query(None, description="Filtrar por ID da categoria."),
@@ -100,7 +198,69 @@ def read_products_route(
         - Painel administrativo para buscar e gerenciar produtos.
         - API para aplicativo móvel listando produtos por critérios.
     """
-    return services.get_products(
+    etag = services.get_products_etag(
+        db, skip=skip, limit=limit, category_id=category_id,
+        gender_id=gender_id, min_price=min_price,
+        max_price=max_price, available_only=available_only
+    )
+    not_modified = check_etag(request, response, etag)
+    if not_modified:
+        return not_modified
+    products = services.get_products(
+        db, skip=skip, limit=limit, category_id=category_id,
+        gender_id=gender_id, min_price=min_price,
+        max_price=max_price, available_only=available_only
+    )
+    return model_list_response(schemas.ProductResponse, products, response)
+
+@router.get(
+    "/cards",
+    response_model=List[schemas.ProductCardResponse],
+    summary="Lista produtos em formato de card, com a imagem principal.",
+    responses={
+        status.HTTP_200_OK: {
+            "description": "Lista de cards de produtos retornada.",
+            "content": {"application/json": {"example": [
+                schemas.ProductCardResponse.model_config['json_schema_extra']['example'],
+                {**schemas.ProductCardResponse.model_config['json_schema_extra']['example'], "id": "b2c3d4e5-f6a7-8901-2345-678901bcdef0", "name": "Calça Jeans Slim", "available": False, "main_image_url": None}
+            ]}}
+        }
+    }
+)
+def read_product_cards_route(
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0, description="Número de registros a pular."),
+    limit: int = Query(100, ge=1, le=100, description="Máximo de registros a retornar."),
+    category_id: Optional[int] = Query(None, description="Filtrar por ID da categoria."),
+    gender_id: Optional[int] = Query(None, description="Filtrar por ID do gênero."),
+    min_price: Optional[float] = Query(None, description="Filtrar por preço mínimo."),
+    max_price: Optional[float] = Query(None, description="Filtrar por preço máximo."),
+    available_only: bool = Query(False, description="Mostrar apenas produtos com estoque > 0."),
+    db: Session = Depends(get_db),
+    current_user: Annotated[models.User, Depends(get_current_active_user)] = None
+):
+    """
+    Retorna apenas o necessário para montar cards de produtos: id, nome, preço, disponibilidade
+    e a URL da imagem principal. Aceita os mesmos filtros de `/products/read`, ordenando por nome.
+
+    - **Regras de negócio**:
+        - Requer autenticação de usuário.
+        - Produtos sem imagem principal retornam `main_image_url` nulo.
+
+    - **Casos de uso**:
+        - Páginas de categoria e vitrines da loja virtual.
+        - Listas de produtos em aplicativos móveis, com menos dados trafegados.
+    """
+    etag = services.get_products_etag(
+        db, skip=skip, limit=limit, category_id=category_id,
+        gender_id=gender_id, min_price=min_price,
+        max_price=max_price, available_only=available_only, kind="product-cards"
+    )
+    not_modified = check_etag(request, response, etag)
+    if not_modified:
+        return not_modified
+    return services.get_product_cards(
         db, skip=skip, limit=limit, category_id=category_id,
         gender_id=gender_id, min_price=min_price,
         max_price=max_price, available_only=available_only
@@ -122,6 +282,8 @@ def read_products_route(
 )
 def read_product_route(
     product_id: uuid.UUID,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: Annotated[models.User, Depends(get_current_active_user)] = None
 ):
@@ -136,6 +298,12 @@ def read_product_route(
         - Exibir a página de detalhes de um produto em um e-commerce.
         - Carregar dados de um produto para edição em um painel administrativo.
     """
+    etag = services.get_product_etag(db, product_id)
+    if etag is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produto não encontrado")
+    not_modified = check_etag(request, response, etag)
+    if not_modified:
+        return not_modified
     db_product = services.get_product(db, product_id)
     if db_product is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produto não encontrado")
@@ -186,6 +354,51 @@ def update_product_route(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produto não encontrado")
     return db_product
 
+@router.put(
+    "/shards/{product_id}",
+    response_model=schemas.ProductResponse,
+    summary="Define a fragmentação do estoque de um produto (requer admin).",
+    responses={
+        status.HTTP_200_OK: {
+            "description": "Estoque redistribuído entre os fragmentos.",
+            "content": {"application/json": {"example": {**schemas.ProductResponse.model_config['json_schema_extra']['example'], "inventory_shard_count": 8}}}
+        },
+        status.HTTP_404_NOT_FOUND: {
+            "content": {"application/json": {"example": {"detail": "Produto não encontrado"}}}
+        },
+        status.HTTP_403_FORBIDDEN: {
+            "content": {"application/json": {"example": {"detail": "Acesso negado. Requer privilégios de administrador."}}}
+        }
+    }
+)
+def set_product_shards_route(
+    product_id: uuid.UUID,
+    shards_data: schemas.ProductShardsUpdate,
+    db: Session = Depends(get_db),
+    current_user: Annotated[models.User, Depends(get_current_admin_user)] = None
+):
+    """
+    Divide o estoque de um produto em `shards` contadores independentes.
+
+    Em vendas relâmpago, todas as compras de um mesmo produto disputam a mesma linha de estoque.
+    Com o estoque fragmentado, cada compra debita um fragmento escolhido aleatoriamente,
+    e compras simultâneas deixam de esperar umas pelas outras. O estoque exibido continua
+    sendo o total.
+
+    - **Regras de negócio**:
+        - O estoque atual é redistribuído igualmente entre os fragmentos.
+        - `shards=0` volta o produto para um único contador.
+        - Apenas administradores podem alterar a fragmentação. Prefira fazê-lo antes do pico de vendas.
+
+    - **Casos de uso**:
+        - Preparar um produto para uma venda relâmpago.
+        - Desfazer a fragmentação após o evento.
+    """
+    db_product = services.set_product_inventory_shards(db, product_id, shards_data.shards)
+    if db_product is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produto não encontrado")
+    return db_product
+
 @router.delete(
     "/delete/{product_id}",
     response_model=ProductMessageResponse,
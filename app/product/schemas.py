@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, ConfigDict, HttpUrl
+from pydantic import BaseModel, Field, ConfigDict, HttpUrl, AliasChoices
 from typing import Optional, List
 from datetime import datetime
 import uuid
@@ -54,12 +54,116 @@ class ProductUpdate(BaseModel):
         }
     )
 
+class ProductBulkItem(BaseModel):
+    name: str = Field(..., min_length=1, max_length=255, description="Nome do produto. Usado como chave: cria o produto se não existir, atualiza se existir.")
+    description: Optional[str] = Field(None, min_length=1, description="Descrição do produto. Obrigatória para novos produtos.")
+    price: Optional[Decimal] = Field(None, gt=0, decimal_places=2, description="Preço do produto. Obrigatório para novos produtos.")
+    inventory: Optional[int] = Field(None, ge=0, description="Quantidade em estoque. Obrigatória para novos produtos.")
+    size_id: Optional[int] = Field(None, description="ID do tamanho. Obrigatório para novos produtos.")
+    category_id: Optional[int] = Field(None, description="ID da categoria. Obrigatório para novos produtos.")
+    gender_id: Optional[int] = Field(None, description="ID do gênero. Obrigatório para novos produtos.")
+
+class ProductBulkRequest(BaseModel):
+    items: List[ProductBulkItem] = Field(..., min_length=1, description="Produtos a serem criados ou atualizados.")
+
+    model_config = ConfigDict(
+        json_schema_extra = {
+            "example": {
+                "items": [
+                    {
+                        "name": "Camiseta Algodão Pima Premium",
+                        "description": "Camiseta de alta qualidade, confeccionada com algodão Pima peruano.",
+                        "price": "129.90",
+                        "inventory": 150,
+                        "size_id": 2,
+                        "category_id": 1,
+                        "gender_id": 1
+                    },
+                    {
+                        "name": "Calça Jeans Slim",
+                        "price": "199.90",
+                        "inventory": 80
+                    }
+                ]
+            }
+        }
+    )
+
+class ProductBulkItemResult(BaseModel):
+    index: int = Field(description="Posição do item na lista enviada.")
+    name: str = Field(description="Nome do produto.")
+    status: str = Field(description="Resultado do item: 'created', 'updated' ou 'error'.")
+    id: Optional[uuid.UUID] = Field(None, description="ID do produto criado ou atualizado.")
+    detail: Optional[str] = Field(None, description="Motivo da falha, quando `status` é 'error'.")
+
+class ProductBulkResponse(BaseModel):
+    results: List[ProductBulkItemResult] = Field(description="Resultado por item, na ordem enviada.")
+    created: int = Field(description="Quantidade de produtos criados.")
+    updated: int = Field(description="Quantidade de produtos atualizados.")
+    failed: int = Field(description="Quantidade de itens rejeitados.")
+    elapsed_ms: float = Field(description="Tempo total de processamento do lote, em milissegundos.")
+    rows_per_second: float = Field(description="Vazão do lote, em itens por segundo.")
+
+    model_config = ConfigDict(
+        json_schema_extra = {
+            "example": {
+                "results": [
+                    {"index": 0, "name": "Camiseta Algodão Pima Premium", "status": "created", "id": "a1b2c3d4-e5f6-7890-1234-567890abcdef", "detail": None},
+                    {"index": 1, "name": "Calça Jeans Slim", "status": "error", "id": None, "detail": "Campos obrigatórios ausentes: description, size_id, category_id, gender_id."}
+                ],
+                "created": 1,
+                "updated": 0,
+                "failed": 1,
+                "elapsed_ms": 12.5,
+                "rows_per_second": 160.0
+            }
+        }
+    )
+
+class ProductImportRow(ProductCreate):
+    image_urls: List[HttpUrl] = Field([], description="URLs das imagens do produto. A primeira vira a imagem principal se o produto ainda não tiver uma.")
+
+class ProductImportError(BaseModel):
+    line: int = Field(description="Linha do arquivo em que o erro ocorreu.")
+    detail: str = Field(description="Motivo da rejeição da linha.")
+
+class ProductImportResponse(BaseModel):
+    rows: int = Field(description="Total de linhas lidas do arquivo.")
+    valid: int = Field(description="Linhas válidas enviadas para a mesclagem.")
+    invalid: int = Field(description="Linhas rejeitadas na validação.")
+    errors: List[ProductImportError] = Field(description="Primeiras linhas rejeitadas (limitado a 100).")
+    created: int = Field(description="Produtos criados.")
+    updated: int = Field(description="Produtos atualizados.")
+    images_created: int = Field(description="Imagens de produto criadas.")
+    elapsed_ms: float = Field(description="Tempo total da importação, em milissegundos.")
+    rows_per_second: float = Field(description="Vazão da importação, em linhas por segundo.")
+
+    model_config = ConfigDict(
+        json_schema_extra = {
+            "example": {
+                "rows": 3,
+                "valid": 2,
+                "invalid": 1,
+                "errors": [{"line": 4, "detail": "price: Input should be greater than 0"}],
+                "created": 1,
+                "updated": 1,
+                "images_created": 2,
+                "elapsed_ms": 41.2,
+                "rows_per_second": 72.8
+            }
+        }
+    )
+
 class ProductResponse(BaseModel):
     id: uuid.UUID = Field(description="ID único do produto.")
     name: str = Field(description="Nome do produto.")
     description: str = Field(description="Descrição do produto.")
     price: Decimal = Field(description="Preço do produto.")
-    inventory: int = Field(description="Quantidade em estoque.")
+    inventory: int = Field(
+        validation_alias=AliasChoices("available_inventory", "inventory"),
+        description="Quantidade em estoque. Para produtos com estoque fragmentado, é a soma dos fragmentos."
+    )
+    inventory_shard_count: int = Field(0, description="Quantidade de fragmentos de estoque do produto (0 quando não fragmentado).")
     size_id: int = Field(description="ID do tamanho associado.")
     category_id: int = Field(description="ID da categoria associada.")
     gender_id: int = Field(description="ID do gênero associado.")
@@ -76,6 +180,7 @@ class ProductResponse(BaseModel):
                 "description": "Camiseta de alta qualidade, confeccionada com algodão Pima peruano...",
                 "price": "129.90",
                 "inventory": 150,
+                "inventory_shard_count": 0,
                 "size_id": 2,
                 "category_id": 1,
                 "gender_id": 1,
@@ -96,6 +201,37 @@ class ProductResponse(BaseModel):
         }
     )
 
+class ProductCardResponse(BaseModel):
+    id: uuid.UUID = Field(description="ID único do produto.")
+    name: str = Field(description="Nome do produto.")
+    price: Decimal = Field(description="Preço do produto.")
+    available: bool = Field(description="Se o produto tem estoque disponível.")
+    main_image_url: Optional[str] = Field(None, description="URL da imagem principal do produto, se houver.")
+
+    model_config = ConfigDict(
+        from_attributes=True,
+        json_schema_extra={
+            "example": {
+                "id": "a1b2c3d4-e5f6-7890-1234-567890abcdef",
+                "name": "Camiseta Algodão Pima Premium",
+                "price": "129.90",
+                "available": True,
+                "main_image_url": "http://example.com/images/produto_frente.jpg"
+            }
+        }
+    )
+
+class ProductShardsUpdate(BaseModel):
+    shards: int = Field(..., ge=0, le=64, description="Quantidade de fragmentos de estoque. Use 0 para voltar a um único contador.")
+
+    model_config = ConfigDict(
+        json_schema_extra = {
+            "example": {
+                "shards": 8
+            }
+        }
+    )
+
 class MessageResponse(BaseModel):
     message: str = Field(description="Mensagem de resposta da operação.")
     model_config = ConfigDict(
@@ -1,20 +1,71 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_
+from sqlalchemy import or_, func, select, literal_column, true, Row
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
 from app.database import models
-from app.product import schemas
-from typing import List, Optional
+from app.product import schemas, inventory
+from app.product_image import services as product_image_services
+from typing import Dict, List, NoReturn, Optional, Set
 import uuid
+import time
+from app.core.etag import make_etag
+from app.core.config import get_settings
+from app.core import reference
 
 def get_product_by_name(db: Session, name: str) -> Optional[models.Product]:
     return db.query(models.Product).filter(models.Product.name == name).first()
 
+REFERENCE_NOT_FOUND = (
+    ("size_id", reference.sizes, "Tamanho com ID {} não encontrado."),
+    ("category_id", reference.categories, "Categoria com ID {} não encontrada."),
+    ("gender_id", reference.genders, "Gênero com ID {} não encontrado."),
+)
+
+def _validate_references(db: Session, data: dict) -> None:
+    """Confere tamanho, categoria e gênero no cache de dados de referência, sem consultar o banco."""
+    for field, repository, detail in REFERENCE_NOT_FOUND:
+        value = data.get(field)
+        if value is not None and not repository.existing_ids(db, {value}):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=detail.format(value))
+
+def _recheck_references(db: Session, data: dict, exc: IntegrityError) -> NoReturn:
+    """
+    Trata a falha de uma escrita validada pelo cache. Se a causa foi uma chave estrangeira, a
+    referência pode ter sido apagada por outro processo (a invalidação entre processos só acontece
+    pelo TTL): o cache das referências usadas é descartado e a validação refeita no banco, com o
+    mesmo 404. Se nenhuma referência falta, o erro original segue adiante.
+    """
+    db.rollback()
+    if reference.is_foreign_key_violation(exc):
+        for field, repository, _ in REFERENCE_NOT_FOUND:
+            if data.get(field) is not None:
+                repository.invalidate()
+        _validate_references(db, data)
+    raise exc
+
+def _existing_reference_ids(db: Session, items: List[schemas.ProductBulkItem]) -> Dict[str, Set[int]]:
+    return {
+        field: repository.existing_ids(db, {getattr(item, field) for item in items if getattr(item, field) is not None})
+        for field, repository, _ in REFERENCE_NOT_FOUND
+    }
+
 def create_product(db: Session, product_data: schemas.ProductCreate) -> models.Product:
     if get_product_by_name(db, product_data.name):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Produto com este nome já existe."
         )
+    references = product_data.model_dump(include={"size_id", "category_id", "gender_id"})
+    _validate_references(db, references)
+
+    if product_data.product_image_ids:
+        missing_ids = product_image_services.missing_image_ids(db, product_data.product_image_ids)
+        if missing_ids:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Algumas imagens com IDs fornecidos não foram encontradas: {', '.join(map(str, missing_ids))}"
+            )
 
     db_product = models.Product(
         name=product_data.name,
@@ -25,30 +76,17 @@ def create_product(db: Session, product_data: schemas.ProductCreate) -> models.P
         category_id=product_data.category_id,
         gender_id=product_data.gender_id
     )
-    db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
+    try:
+        db.add(db_product)
+        db.flush()
 
-    if product_data.product_image_ids:
-        existing_images = db.query(models.ProductImage).filter(
-            models.ProductImage.id.in_(product_data.product_image_ids)
-        ).all()
-
-        if len(existing_images) != len(product_data.product_image_ids):
-            found_ids = {str(img.id) for img in existing_images}
-            missing_ids = [str(uid) for uid in product_data.product_image_ids if str(uid) not in found_ids]
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Algumas imagens com IDs fornecidos não foram encontradas: {', '.join(missing_ids)}"
-            )
-        
-        for img in existing_images:
-            img.product_id = db_product.id
-            db.add(img)
-
-        db.commit() 
-        db.refresh(db_product) 
+        if product_data.product_image_ids:
+            product_image_services.attach_images(db, {image_id: db_product.id for image_id in product_data.product_image_ids})
 
+        db.commit()
+    except IntegrityError as exc:
+        _recheck_references(db, references, exc)
+    db.refresh(db_product)
     return db_product
 
 def get_products(
@@ -62,6 +100,60 @@ def get_products(
     available_only: bool = False
 ) -> List[models.Product]:
     query = db.query(models.Product).options(joinedload(models.Product.images))
+    query = _filter_products(
+        query, category_id=category_id, gender_id=gender_id,
+        min_price=min_price, max_price=max_price, available_only=available_only
+    )
+    return query.offset(skip).limit(limit).all()
+
+def get_product_cards(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    category_id: Optional[int] = None,
+    gender_id: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    available_only: bool = False
+) -> List[dict]:
+    """
+    Lista os produtos no formato de card (id, nome, preço, disponibilidade e imagem principal)
+    com uma única consulta: a imagem principal vem de um `LEFT JOIN LATERAL` limitado a uma linha,
+    servido pelo índice parcial `ix_product_images_main`, sem carregar as demais imagens.
+    """
+    main_image = (
+        select(models.ProductImage.url)
+        .where(models.ProductImage.product_id == models.Product.id, models.ProductImage.is_main)
+        .order_by(models.ProductImage.created_at, models.ProductImage.id)
+        .limit(1)
+        .lateral("main_image")
+    )
+    query = select(
+        models.Product.id,
+        models.Product.name,
+        models.Product.price,
+        (models.Product.available_inventory > 0).label("available"),
+        main_image.c.url.label("main_image_url")
+    ).outerjoin(main_image, true())
+    query = _filter_products(
+        query, category_id=category_id, gender_id=gender_id,
+        min_price=min_price, max_price=max_price, available_only=available_only
+    )
+    return db.execute(
+        query.order_by(models.Product.name).offset(skip).limit(limit)
+    ).mappings().all()
+
+def get_product(db: Session, product_id: uuid.UUID) -> Optional[models.Product]:
+    return db.query(models.Product).options(joinedload(models.Product.images)).filter(models.Product.id == product_id).first()
+
+def _filter_products(
+    query,
+    category_id: Optional[int] = None,
+    gender_id: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    available_only: bool = False
+):
     if category_id:
         query = query.filter(models.Product.category_id == category_id)
     if gender_id:
@@ -71,11 +163,60 @@ def get_products(
     if max_price is not None:
         query = query.filter(models.Product.price <= max_price)
     if available_only:
-        query = query.filter(models.Product.inventory > 0)
-    return query.offset(skip).limit(limit).all()
+        query = query.filter(models.Product.available_inventory > 0)
+    return query
 
-def get_product(db: Session, product_id: uuid.UUID) -> Optional[models.Product]:
-    return db.query(models.Product).options(joinedload(models.Product.images)).filter(models.Product.id == product_id).first()
+def _product_version(db: Session, products) -> Row:
+    """
+    Versão de um conjunto de produtos (`products` é um `select` filtrado de `Product`): `updated_at`
+    máximo e contagem dos produtos, das suas imagens e `updated_at` máximo dos seus fragmentos de
+    estoque. Qualquer alteração em um produto, em suas imagens ou no seu estoque fragmentado muda
+    alguma das partes. Cada parte é agregada em uma subconsulta própria, restrita aos produtos
+    filtrados: juntar imagens e fragmentos na mesma consulta multiplicaria as linhas.
+    """
+    filtered = products.with_only_columns(models.Product.id, models.Product.updated_at).cte("filtered_products")
+    product_ids = select(filtered.c.id)
+    product_part = select(
+        func.max(filtered.c.updated_at).label("products_updated_at"),
+        func.count().label("products")
+    ).subquery()
+    image_part = select(
+        func.max(models.ProductImage.updated_at).label("images_updated_at"),
+        func.count().label("images")
+    ).where(models.ProductImage.product_id.in_(product_ids)).subquery()
+    shard_part = select(
+        func.max(models.ProductInventoryShard.updated_at).label("shards_updated_at")
+    ).where(models.ProductInventoryShard.product_id.in_(product_ids)).subquery()
+    return db.execute(
+        select(product_part, image_part, shard_part)
+        .join_from(product_part, image_part, true())
+        .join(shard_part, true())
+    ).one()
+
+def get_products_etag(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    category_id: Optional[int] = None,
+    gender_id: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    available_only: bool = False,
+    kind: str = "products"
+) -> str:
+    version = _product_version(db, _filter_products(
+        select(models.Product), category_id=category_id, gender_id=gender_id,
+        min_price=min_price, max_price=max_price, available_only=available_only
+    ))
+    return make_etag(
+        kind, *version, skip, limit, category_id, gender_id, min_price, max_price, available_only
+    )
+
+def get_product_etag(db: Session, product_id: uuid.UUID) -> Optional[str]:
+    version = _product_version(db, select(models.Product).where(models.Product.id == product_id))
+    if version[0] is None:
+        return None
+    return make_etag("product", product_id, *version)
 
 def update_product(db: Session, product_id: uuid.UUID, product_data: schemas.ProductUpdate) -> Optional[models.Product]:
     db_product = get_product(db, product_id)
@@ -90,47 +231,30 @@ def update_product(db: Session, product_id: uuid.UUID, product_data: schemas.Pro
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Novo nome de produto já existe."
             )
+    _validate_references(db, update_data)
+
+    if update_data.get("inventory") is not None and db_product.inventory_shard_count > 0:
+        inventory.redistribute_inventory(db, {product_id: update_data.pop("inventory")})
 
     for key, value in update_data.items():
         if key != "product_image_ids":
             setattr(db_product, key, value)
 
     if "product_image_ids" in update_data:
-        new_image_ids_set = set(update_data["product_image_ids"] or [])
-        
-        current_associated_image_ids = {img.id for img in db_product.images}
-
-        images_to_delete_from_product = db.query(models.ProductImage).filter(
-            models.ProductImage.product_id == product_id,
-            models.ProductImage.id.notin_(new_image_ids_set)
-        ).all()
-
-        for img_to_delete in images_to_delete_from_product:
-            db.delete(img_to_delete)
-
-        if new_image_ids_set:
-            images_to_associate = db.query(models.ProductImage).filter(
-                models.ProductImage.id.in_(list(new_image_ids_set))
-            ).all()
-
-            found_ids = {str(img.id) for img in images_to_associate}
-            missing_ids = [str(uid) for uid in new_image_ids_set if str(uid) not in found_ids]
-            if missing_ids:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Algumas imagens com IDs fornecidos para atualização não foram encontradas: {', '.join(missing_ids)}"
-                )
-            
-            for img in images_to_associate:
-                if img.product_id != product_id:
-                    img.product_id = product_id
-                    db.add(img)
-        
-        db.commit()
-        db.refresh(db_product)
+        new_image_ids = update_data["product_image_ids"] or []
+        missing_ids = product_image_services.missing_image_ids(db, new_image_ids)
+        if missing_ids:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Algumas imagens com IDs fornecidos para atualização não foram encontradas: {', '.join(map(str, missing_ids))}"
+            )
+        product_image_services.replace_product_images(db, product_id, new_image_ids)
 
-    db.add(db_product)
-    db.commit()
+    try:
+        db.add(db_product)
+        db.commit()
+    except IntegrityError as exc:
+        _recheck_references(db, update_data, exc)
     db.refresh(db_product)
     return db_product
 
@@ -143,4 +267,121 @@ def delete_product(db: Session, product_id: uuid.UUID) -> bool:
     
     db.delete(db_product)
     db.commit()
-    return True
\ No newline at end of file
+    return True
+
+PRODUCT_BULK_FIELDS = ("description", "price", "inventory", "size_id", "category_id", "gender_id")
+
+def _upsert_chunk(
+    db: Session,
+    chunk: List[schemas.ProductBulkItem],
+    chunk_start: int,
+    valid_ids: Dict[str, Set[int]],
+    results: List[dict],
+    seen_names: set
+) -> None:
+    """Grava um bloco de `bulk_upsert_products` com um único `INSERT ... ON CONFLICT` e faz o commit."""
+    existing_rows = db.execute(
+        select(models.Product.name, *[getattr(models.Product, field) for field in PRODUCT_BULK_FIELDS])
+        .where(models.Product.name.in_({item.name for item in chunk}))
+    ).mappings()
+    existing = {row["name"]: row for row in existing_rows}
+
+    rows = []
+    index_by_name = {}
+    for index, item in enumerate(chunk, start=chunk_start):
+        result = {"index": index, "name": item.name, "status": "error", "id": None, "detail": None}
+        results[index] = result
+
+        if item.name in seen_names:
+            result["detail"] = "Produto repetido no lote."
+            continue
+        seen_names.add(item.name)
+
+        row = dict(existing.get(item.name, {}))
+        row.update(item.model_dump(exclude_unset=True))
+        missing = [field for field in PRODUCT_BULK_FIELDS if row.get(field) is None]
+        if missing:
+            result["detail"] = f"Campos obrigatórios ausentes: {', '.join(missing)}."
+            continue
+        invalid = next((
+            detail.format(getattr(item, field)) for field, _, detail in REFERENCE_NOT_FOUND
+            if getattr(item, field) is not None and getattr(item, field) not in valid_ids[field]
+        ), None)
+        if invalid:
+            result["detail"] = invalid
+            continue
+
+        rows.append({"name": item.name, **{field: row[field] for field in PRODUCT_BULK_FIELDS}})
+        index_by_name[item.name] = index
+
+    if not rows:
+        return
+
+    stmt = insert(models.Product).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.Product.name],
+        set_={
+            **{field: stmt.excluded[field] for field in PRODUCT_BULK_FIELDS},
+            "updated_at": stmt.excluded.updated_at,
+        }
+    ).returning(
+        models.Product.id, models.Product.name, models.Product.inventory_shard_count,
+        literal_column("xmax = 0").label("inserted")
+    )
+
+    sharded_totals = {}
+    for product_id, name, shard_count, inserted in db.execute(stmt):
+        index = index_by_name[name]
+        result = results[index]
+        result["id"] = product_id
+        result["status"] = "created" if inserted else "updated"
+        if shard_count > 0 and chunk[index - chunk_start].inventory is not None:
+            sharded_totals[product_id] = chunk[index - chunk_start].inventory
+    inventory.redistribute_inventory(db, sharded_totals)
+    db.commit()
+
+def bulk_upsert_products(db: Session, items: List[schemas.ProductBulkItem]) -> dict:
+    """
+    Cria ou atualiza produtos em lote, usando o nome como chave.
+    Cada bloco de `PRODUCT_BULK_CHUNK_SIZE` itens é gravado com um único
+    `INSERT ... ON CONFLICT (name) DO UPDATE`. Itens inválidos não interrompem o lote.
+    """
+    started_at = time.perf_counter()
+    chunk_size = get_settings().PRODUCT_BULK_CHUNK_SIZE
+
+    valid_ids = _existing_reference_ids(db, items)
+    results: List[dict] = [None] * len(items)
+    seen_names = set()
+
+    for chunk_start in range(0, len(items), chunk_size):
+        chunk = items[chunk_start:chunk_start + chunk_size]
+        seen_before_chunk = set(seen_names)
+        try:
+            _upsert_chunk(db, chunk, chunk_start, valid_ids, results, seen_names)
+        except IntegrityError as exc:
+            db.rollback()
+            if not reference.is_foreign_key_violation(exc):
+                raise
+            # Uma referência apagada por outro processo ainda estava no cache: o bloco é refeito
+            # com os IDs relidos do banco, e só os itens que a usavam falham.
+            for _, repository, _ in REFERENCE_NOT_FOUND:
+                repository.invalidate()
+            valid_ids = _existing_reference_ids(db, items)
+            seen_names = seen_before_chunk
+            _upsert_chunk(db, chunk, chunk_start, valid_ids, results, seen_names)
+
+    elapsed = time.perf_counter() - started_at
+    return {
+        "results": results,
+        "created": sum(1 for result in results if result["status"] == "created"),
+        "updated": sum(1 for result in results if result["status"] == "updated"),
+        "failed": sum(1 for result in results if result["status"] == "error"),
+        "elapsed_ms": round(elapsed * 1000, 3),
+        "rows_per_second": round(len(items) / elapsed, 1) if elapsed > 0 else float(len(items)),
+    }
+
+def set_product_inventory_shards(db: Session, product_id: uuid.UUID, shard_count: int) -> Optional[models.Product]:
+    db_product = inventory.set_inventory_shards(db, product_id, shard_count)
+    if not db_product:
+        return None
+    return get_product(db, product_id)
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response, Form, File, UploadFile
 from sqlalchemy.orm import Session
 from typing import List, Optional, Annotated
+import os
 import uuid
 
 from app.database.connection import get_db
-from app.product_image import schemas, services
+from app.product_image import schemas, services, storage
 from app.database import models
+from app.core.config import get_settings
 from app.core.dependencies import get_current_active_user, get_current_admin_user
+from app.core.files import file_response
 from app.product_image.schemas import MessageResponse as ProductImageMessageResponse
 
 router = APIRouter(
@@ -47,6 +50,124 @@ def create_product_image_route(
     """
     return services.create_product_image(db, image_data)
 
+@router.post(
+    "/upload",
+    response_model=schemas.ProductImageResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Envia o arquivo de uma imagem de produto.",
+    responses={
+        status.HTTP_201_CREATED: {
+            "description": "Imagem armazenada. As miniaturas são geradas em segundo plano.",
+            "content": {"application/json": {"example": schemas.ProductImageResponse.model_config['json_schema_extra']['example']}}
+        },
+        status.HTTP_400_BAD_REQUEST: {"content": {"application/json": {"example": {"detail": "O arquivo enviado não é uma imagem JPEG, PNG, WebP ou GIF válida."}}}},
+        status.HTTP_404_NOT_FOUND: {"content": {"application/json": {"example": {"detail": "Produto associado não encontrado."}}}},
+        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE: {"content": {"application/json": {"example": {"detail": "A imagem excede o limite de 10485760 bytes."}}}}
+    }
+)
+def upload_product_image_route(
+    product_id: uuid.UUID = Form(..., description="ID do produto ao qual a imagem pertence."),
+    file: UploadFile = File(..., description="Arquivo JPEG, PNG, WebP ou GIF."),
+    description: Optional[str] = Form(None, max_length=255, description="Descrição opcional da imagem."),
+    is_main: bool = Form(False, description="Indica se esta é a imagem principal do produto."),
+    db: Session = Depends(get_db),
+    current_user: Annotated[models.User, Depends(get_current_active_user)] = None
+):
+    """
+    Armazena o arquivo de uma imagem e a associa ao produto.
+    - **Regras de negócio**:
+        - `product_id` deve existir. Requer auth. Tamanho máximo em `IMAGE_MAX_UPLOAD_BYTES`.
+        - O arquivo é guardado pelo SHA-256 do conteúdo: enviar a mesma imagem de novo não duplica o arquivo.
+        - As miniaturas (`IMAGE_THUMBNAIL_SIZES`, no formato do original e em WebP) são geradas por um pool de processos, fora da requisição.
+    - **Casos de uso**:
+        - Cadastro de fotos de produto sem redimensionamento manual.
+    """
+    return services.upload_product_image(db, product_id, file.file, description=description, is_main=is_main)
+
+@router.post(
+    "/bulk",
+    response_model=schemas.ProductImageBulkResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Cria e associa imagens de vários produtos em lote.",
+    responses={
+        status.HTTP_201_CREATED: {
+            "description": "Imagens criadas e associadas.",
+            "content": {"application/json": {"example": {"created": [schemas.ProductImageResponse.model_config['json_schema_extra']['example']], "attached": 1}}}
+        },
+        status.HTTP_400_BAD_REQUEST: {"content": {"application/json": {"example": {"detail": "O lote excede o limite de 1000 imagens."}}}},
+        status.HTTP_404_NOT_FOUND: {"content": {"application/json": {"example": {"detail": "Alguns produtos com IDs fornecidos não foram encontrados: a1b2c3d4-e5f6-7890-1234-567890abcdef"}}}}
+    }
+)
+def bulk_product_images_route(
+    bulk_data: schemas.ProductImageBulkRequest,
+    db: Session = Depends(get_db),
+    current_user: Annotated[models.User, Depends(get_current_active_user)] = None
+):
+    """
+    Cria novas imagens (por URL) e associa imagens existentes a vários produtos em uma única chamada.
+    - **Regras de negócio**:
+        - Todos os `product_id` e `attach_image_ids` devem existir; caso contrário nada é gravado (404).
+        - Uma imagem não pode ser associada a mais de um produto no mesmo lote.
+        - O total de imagens (novas + associadas) não pode exceder `IMAGE_BULK_MAX_ITEMS`. Requer auth.
+    - **Casos de uso**:
+        - Carga de fotos do catálogo enviada pela equipe de merchandising.
+        - Reorganizar imagens entre variações de um produto.
+    """
+    max_items = get_settings().IMAGE_BULK_MAX_ITEMS
+    if sum(len(item.images) + len(item.attach_image_ids) for item in bulk_data.items) > max_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"O lote excede o limite de {max_items} imagens."
+        )
+    created, attached = services.bulk_product_images(db, bulk_data.items)
+    return {"created": created, "attached": attached}
+
+@router.head("/files/{content_hash}/{name}", response_class=Response, include_in_schema=False)
+@router.get(
+    "/files/{content_hash}/{name}",
+    response_class=Response,
+    summary="Serve o original ou uma miniatura de uma imagem enviada.",
+    responses={
+        status.HTTP_200_OK: {"description": "Arquivo da imagem.", "content": {"image/jpeg": {}, "image/png": {}, "image/webp": {}, "image/gif": {}}},
+        status.HTTP_206_PARTIAL_CONTENT: {"description": "Intervalo do arquivo pedido em `Range`."},
+        status.HTTP_304_NOT_MODIFIED: {"description": "O cliente já possui a versão atual (`If-None-Match`)."},
+        status.HTTP_404_NOT_FOUND: {"content": {"application/json": {"example": {"detail": "Arquivo não encontrado"}}}}
+    }
+)
+def read_product_image_file_route(request: Request, content_hash: str, name: str):
+    """
+    Serve `original.<ext>`, `<tamanho>.<jpg|png>` ou `<tamanho>.webp` de uma imagem enviada, sem consultar o banco.
+    - **Regras de negócio**:
+        - Público, para uso direto em `<img>`. Suporta `ETag`/`If-None-Match` e `Range`.
+        - Se a miniatura ainda não existe, ela é agendada e o original é servido no lugar, sem cache.
+        - Com `MEDIA_ACCEL_REDIRECT_PREFIX`, o envio é delegado ao nginx (`X-Accel-Redirect` + `sendfile`).
+    - **Casos de uso**:
+        - Vitrine e app exibindo fotos de produtos.
+    """
+    resolved = storage.resolve_file(content_hash, name)
+    if resolved is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Arquivo não encontrado")
+    path, media_type, is_thumbnail = resolved
+    headers = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+    if is_thumbnail and not os.path.exists(path):
+        original = storage.find_original(content_hash)
+        if original is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Arquivo não encontrado")
+        path, media_type = original
+        storage.schedule_thumbnails(content_hash, media_type)
+        headers = {"Cache-Control": "no-store"}
+    elif not os.path.exists(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Arquivo não encontrado")
+
+    accel_prefix = get_settings().MEDIA_ACCEL_REDIRECT_PREFIX
+    return file_response(
+        request, path, media_type,
+        etag_parts=(content_hash, os.path.basename(path)),
+        headers=headers,
+        accel_redirect=f"{accel_prefix.rstrip('/')}/{os.path.relpath(path, storage.media_root())}" if accel_prefix else None
+    )
+
 @router.get(
     "/read",
     response_model=List[schemas.ProductImageResponse],
@@ -56,7 +177,7 @@ def create_product_image_route(
             "description": "Lista de imagens de produtos retornada.",
             "content": {"application/json": {"example": [
                 schemas.ProductImageResponse.model_config['json_schema_extra']['example'] if schemas.ProductImageResponse.model_config.get('json_schema_extra') else {},
-                {**(schemas.ProductImageResponse.model_config.get('json_schema_extra', {}).get('example', {})), "id": "eeddccbb-aa99-8877-6655-4433221100ff", "url": "http://example.com/images/produto_detalhe.jpg", "is_main": False}
+                {**(schemas.ProductImageResponse.model_config.get('json_schema_extra', {}).get('example', {})), "id": "eeddccbb-aa99-8877-6655-4433221100ff", "url": "http://example.com/images/produto_detalhe.jpg", "is_main": False, "content_hash": None, "content_type": None, "width": None, "height": None, "thumbnails": []}
             ]}}
         }
     }
@@ -1,7 +1,8 @@
-from pydantic import BaseModel, Field, HttpUrl, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, Field, HttpUrl, ConfigDict, computed_field
+from typing import List, Optional
 from datetime import datetime
 import uuid
+from app.product_image import storage
 
 class ProductImageCreate(BaseModel):
     product_id: uuid.UUID = Field(description="ID do produto ao qual esta imagem pertence.")
@@ -34,30 +35,94 @@ class ProductImageUpdate(BaseModel):
         }
     )
 
+class ProductImageThumbnail(BaseModel):
+    size: int = Field(description="Maior dimensão da miniatura, em pixels.")
+    url: str = Field(description="URL da miniatura no formato do original (JPEG, ou PNG para imagens com transparência).")
+    webp_url: str = Field(description="URL da miniatura em WebP.")
+
 class ProductImageResponse(BaseModel):
     id: uuid.UUID = Field(description="ID único da imagem do produto.")
     product_id: uuid.UUID = Field(description="ID do produto associado.")
     url: str = Field(description="URL da imagem.")
     description: Optional[str] = Field(description="Descrição da imagem.")
     is_main: bool = Field(description="Se é a imagem principal do produto.")
+    content_hash: Optional[str] = Field(None, description="SHA-256 do arquivo, para imagens enviadas por upload.")
+    content_type: Optional[str] = Field(None, description="Tipo do arquivo original, para imagens enviadas por upload.")
+    width: Optional[int] = Field(None, description="Largura do original em pixels, para imagens enviadas por upload.")
+    height: Optional[int] = Field(None, description="Altura do original em pixels, para imagens enviadas por upload.")
     created_at: datetime = Field(description="Data e hora de criação da imagem.")
     updated_at: datetime = Field(description="Data e hora da última atualização da imagem.")
 
+    @computed_field(description="Miniaturas por tamanho (vazia para imagens referenciadas só por URL).")
+    @property
+    def thumbnails(self) -> List[ProductImageThumbnail]:
+        if not self.content_hash or not self.content_type:
+            return []
+        return [ProductImageThumbnail(**thumbnail) for thumbnail in storage.thumbnail_urls(self.content_hash, self.content_type)]
+
     model_config = ConfigDict(
         from_attributes=True,
         json_schema_extra = {
             "example": {
                 "id": "00112233-4455-6677-8899-aabbccddeeff",
                 "product_id": "a1b2c3d4-e5f6-7890-1234-567890abcdef",
-                "url": "http://example.com/images/produto_frente.jpg",
+                "url": "/product-images/files/9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08/original.jpg",
                 "description": "Vista frontal da camiseta",
                 "is_main": True,
+                "content_hash": "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08",
+                "content_type": "image/jpeg",
+                "width": 2000,
+                "height": 2400,
                 "created_at": "2024-05-25T11:00:00Z",
-                "updated_at": "2024-05-25T11:05:00Z"
+                "updated_at": "2024-05-25T11:05:00Z",
+                "thumbnails": [
+                    {
+                        "size": 160,
+                        "url": "/product-images/files/9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08/160.jpg",
+                        "webp_url": "/product-images/files/9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08/160.webp"
+                    }
+                ]
             }
         }
     )
 
+class ProductImageBulkNew(BaseModel):
+    url: HttpUrl = Field(..., max_length=500, description="URL da imagem.")
+    description: Optional[str] = Field(None, max_length=255, description="Descrição opcional da imagem.")
+    is_main: bool = Field(False, description="Indica se esta é a imagem principal do produto.")
+
+class ProductImageBulkItem(BaseModel):
+    product_id: uuid.UUID = Field(description="ID do produto que recebe as imagens.")
+    images: List[ProductImageBulkNew] = Field([], description="Novas imagens a serem criadas para o produto.")
+    attach_image_ids: List[uuid.UUID] = Field([], description="IDs de imagens existentes a serem associadas ao produto.")
+
+class ProductImageBulkRequest(BaseModel):
+    items: List[ProductImageBulkItem] = Field(..., min_length=1, description="Imagens a criar e associar, agrupadas por produto.")
+
+    model_config = ConfigDict(
+        json_schema_extra = {
+            "example": {
+                "items": [
+                    {
+                        "product_id": "a1b2c3d4-e5f6-7890-1234-567890abcdef",
+                        "images": [
+                            {"url": "http://example.com/images/produto_frente.jpg", "description": "Vista frontal", "is_main": True},
+                            {"url": "http://example.com/images/produto_costas.jpg", "description": "Vista traseira"}
+                        ]
+                    },
+                    {
+                        "product_id": "b2c3d4e5-f6a7-8901-2345-67890abcdef1",
+                        "attach_image_ids": ["00112233-4455-6677-8899-aabbccddeeff"]
+                    }
+                ]
+            }
+        }
+    )
+
+class ProductImageBulkResponse(BaseModel):
+    created: List[ProductImageResponse] = Field(description="Imagens criadas, na ordem enviada.")
+    attached: int = Field(description="Quantidade de imagens existentes que mudaram de produto.")
+
 class MessageResponse(BaseModel):
     message: str = Field(description="Mensagem de resposta da operação.")
     model_config = ConfigDict(
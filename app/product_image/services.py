@@ -1,10 +1,60 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, update, delete, values, column, any_, all_, bindparam
+from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from fastapi import HTTPException, status
 from app.database import models
-from app.product_image import schemas
-from typing import List, Optional
+from app.product_image import schemas, storage
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple
 import uuid
 
+def _uuid_array(name: str, ids: List[uuid.UUID]):
+    return bindparam(name, ids, type_=ARRAY(UUID(as_uuid=True)))
+
+def missing_image_ids(db: Session, image_ids: Iterable[uuid.UUID]) -> List[uuid.UUID]:
+    """Retorna, na ordem recebida, os IDs que não correspondem a nenhuma imagem, com uma única consulta."""
+    requested = list(dict.fromkeys(image_ids))
+    if not requested:
+        return []
+    found = set(db.scalars(select(models.ProductImage.id).where(models.ProductImage.id == any_(_uuid_array("image_ids", requested)))))
+    return [image_id for image_id in requested if image_id not in found]
+
+def attach_images(db: Session, assignments: Dict[uuid.UUID, uuid.UUID]) -> int:
+    """
+    Associa cada imagem (chave) ao produto (valor) com um único `UPDATE ... FROM (VALUES ...)`.
+    Imagens que já pertencem ao produto indicado não são regravadas. Retorna as imagens movidas.
+    """
+    if not assignments:
+        return 0
+    requested = values(
+        column("image_id", UUID(as_uuid=True)), column("product_id", UUID(as_uuid=True)), name="requested"
+    ).data(list(assignments.items()))
+    return db.execute(
+        update(models.ProductImage)
+        .where(
+            models.ProductImage.id == requested.c.image_id,
+            models.ProductImage.product_id != requested.c.product_id
+        )
+        .values(product_id=requested.c.product_id, updated_at=models.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+def replace_product_images(db: Session, product_id: uuid.UUID, image_ids: List[uuid.UUID]) -> None:
+    """
+    Faz do conjunto `image_ids` as imagens do produto: remove as demais imagens dele com um único
+    `DELETE ... WHERE product_id = ? AND id <> ALL(...)` e associa as informadas com um único `UPDATE`.
+    Não faz commit; IDs inexistentes devem ser validados antes com `missing_image_ids`.
+    """
+    keep = list(dict.fromkeys(image_ids))
+    db.execute(
+        delete(models.ProductImage)
+        .where(
+            models.ProductImage.product_id == product_id,
+            models.ProductImage.id != all_(_uuid_array("keep_ids", keep))
+        )
+        .execution_options(synchronize_session=False)
+    )
+    attach_images(db, {image_id: product_id for image_id in keep})
+
 def create_product_image(db: Session, image_data: schemas.ProductImageCreate) -> models.ProductImage:
     db_image = models.ProductImage(
         product_id=image_data.product_id,
@@ -17,6 +67,38 @@ def create_product_image(db: Session, image_data: schemas.ProductImageCreate) ->
     db.refresh(db_image)
     return db_image
 
+def upload_product_image(
+    db: Session,
+    product_id: uuid.UUID,
+    upload: BinaryIO,
+    description: Optional[str] = None,
+    is_main: bool = False
+) -> models.ProductImage:
+    """
+    Armazena o arquivo enviado (uma única cópia por conteúdo), registra a imagem e agenda a
+    geração das miniaturas no pool de processos. A resposta não espera pelas miniaturas.
+    """
+    if db.query(models.Product.id).filter(models.Product.id == product_id).first() is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produto associado não encontrado.")
+
+    stored = storage.store_original(upload)
+    db_image = models.ProductImage(
+        product_id=product_id,
+        url=storage.file_url(stored.content_hash, storage.original_name(stored.content_type)),
+        description=description,
+        is_main=is_main,
+        content_hash=stored.content_hash,
+        content_type=stored.content_type,
+        byte_size=stored.byte_size,
+        width=stored.width,
+        height=stored.height
+    )
+    db.add(db_image)
+    db.commit()
+    db.refresh(db_image)
+    storage.schedule_thumbnails(stored.content_hash, stored.content_type)
+    return db_image
+
 def get_product_images(
     db: Session,
     skip: int = 0,
@@ -41,6 +123,8 @@ def update_product_image(db: Session, image_id: uuid.UUID, image_data: schemas.P
     for key, value in update_data.items():
         if key == "url" and value is not None:
             setattr(db_image, key, str(value))
+            # A imagem passa a ser externa; o arquivo enviado deixa de ser referenciado por ela.
+            db_image.content_hash = db_image.content_type = db_image.byte_size = db_image.width = db_image.height = None
         else:
             setattr(db_image, key, value)
 
@@ -55,4 +139,54 @@ def delete_product_image(db: Session, image_id: uuid.UUID) -> bool:
         return False
     db.delete(db_image)
     db.commit()
-    return True
\ No newline at end of file
+    return True
+
+def bulk_product_images(db: Session, items: List[schemas.ProductImageBulkItem]) -> Tuple[List[models.ProductImage], int]:
+    """
+    Cria e associa imagens de vários produtos em uma única transação: os produtos e as imagens
+    existentes são validados com uma consulta cada, as novas imagens são gravadas com um
+    `INSERT ... RETURNING` de várias linhas e as associações com um único `UPDATE`.
+    Qualquer ID inexistente rejeita o lote inteiro. Retorna as imagens criadas e a quantidade movida.
+    """
+    product_ids = list(dict.fromkeys(item.product_id for item in items))
+    found_products = set(db.scalars(select(models.Product.id).where(models.Product.id == any_(_uuid_array("product_ids", product_ids)))))
+    missing_products = [str(product_id) for product_id in product_ids if product_id not in found_products]
+    if missing_products:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Alguns produtos com IDs fornecidos não foram encontrados: {', '.join(missing_products)}"
+        )
+
+    assignments: Dict[uuid.UUID, uuid.UUID] = {}
+    for item in items:
+        for image_id in item.attach_image_ids:
+            if assignments.setdefault(image_id, item.product_id) != item.product_id:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"A imagem {image_id} foi indicada para mais de um produto."
+                )
+    missing_images = missing_image_ids(db, assignments)
+    if missing_images:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Algumas imagens com IDs fornecidos não foram encontradas: {', '.join(map(str, missing_images))}"
+        )
+
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "product_id": item.product_id,
+            "url": str(image.url),
+            "description": image.description,
+            "is_main": image.is_main,
+        }
+        for item in items
+        for image in item.images
+    ]
+    created = list(db.scalars(insert(models.ProductImage).returning(models.ProductImage), rows)) if rows else []
+    attached = attach_images(db, assignments)
+    db.commit()
+    if created:
+        # Recarrega as imagens expiradas pelo commit com uma consulta, em vez de uma por imagem.
+        db.scalars(select(models.ProductImage).where(models.ProductImage.id == any_(_uuid_array("created_ids", [image.id for image in created])))).all()
+    return created, attached
@@ -0,0 +1,243 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+FILES_URL_PREFIX = "/product-images/files"
+CHUNK_SIZE = 64 * 1024
+
+# Formato detectado pelo Pillow -> (extensão do original, content type).
+FORMATS: Dict[str, Tuple[str, str]] = {
+    "JPEG": ("jpg", "image/jpeg"),
+    "PNG": ("png", "image/png"),
+    "WEBP": ("webp", "image/webp"),
+    "GIF": ("gif", "image/gif"),
+}
+MEDIA_TYPES = {"jpg": "image/jpeg", "png": "image/png", "webp": "image/webp", "gif": "image/gif"}
+
+CONTENT_HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+VARIANT_PATTERN = re.compile(r"^(?:original\.(jpg|png|webp|gif)|(\d{1,4})\.(jpg|png|webp))$")
+
+
+@dataclass
+class StoredImage:
+    content_hash: str
+    content_type: str
+    byte_size: int
+    width: int
+    height: int
+    created: bool
+
+
+def media_root() -> str:
+    return os.path.abspath(get_settings().MEDIA_ROOT)
+
+
+def image_dir(content_hash: str) -> str:
+    """Diretório de uma imagem: `<MEDIA_ROOT>/images/<2 primeiros caracteres do hash>/<hash>`."""
+    return os.path.join(media_root(), "images", content_hash[:2], content_hash)
+
+
+def original_name(content_type: str) -> str:
+    extension = next(ext for ext, media_type in FORMATS.values() if media_type == content_type)
+    return f"original.{extension}"
+
+
+def thumbnail_extension(content_type: str) -> str:
+    """Miniaturas de JPEG continuam em JPEG; os demais formatos usam PNG para preservar transparência."""
+    return "jpg" if content_type == "image/jpeg" else "png"
+
+
+def file_url(content_hash: str, name: str) -> str:
+    return f"{FILES_URL_PREFIX}/{content_hash}/{name}"
+
+
+def thumbnail_urls(content_hash: str, content_type: str) -> List[dict]:
+    extension = thumbnail_extension(content_type)
+    return [
+        {"size": size, "url": file_url(content_hash, f"{size}.{extension}"), "webp_url": file_url(content_hash, f"{size}.webp")}
+        for size in get_settings().IMAGE_THUMBNAIL_SIZES
+    ]
+
+
+def resolve_file(content_hash: str, name: str) -> Optional[Tuple[str, str, bool]]:
+    """
+    Valida o nome pedido e retorna `(caminho, content type, é miniatura)`.
+    Hash e nome são conferidos por expressão regular, então o caminho nunca sai de `MEDIA_ROOT`.
+    """
+    match = VARIANT_PATTERN.match(name)
+    if not CONTENT_HASH_PATTERN.match(content_hash) or not match:
+        return None
+    original_ext, size, thumb_ext = match.groups()
+    if size is not None and int(size) not in get_settings().IMAGE_THUMBNAIL_SIZES:
+        return None
+    return os.path.join(image_dir(content_hash), name), MEDIA_TYPES[original_ext or thumb_ext], size is not None
+
+
+def find_original(content_hash: str) -> Optional[Tuple[str, str]]:
+    """Retorna `(caminho, content type)` do original de uma imagem, se ele existir."""
+    directory = image_dir(content_hash)
+    for extension, media_type in MEDIA_TYPES.items():
+        path = os.path.join(directory, f"original.{extension}")
+        if os.path.exists(path):
+            return path, media_type
+    return None
+
+
+def store_original(upload: BinaryIO) -> StoredImage:
+    """
+    Grava o arquivo enviado em disco, endereçado pelo SHA-256 do conteúdo: o mesmo arquivo enviado
+    várias vezes é armazenado uma única vez. O arquivo é copiado em blocos para um temporário
+    enquanto o hash é calculado e só então movido (de forma atômica) para o destino.
+    """
+    # O Pillow só é importado ao receber ou processar uma imagem, fora da inicialização da API.
+    from PIL import Image, UnidentifiedImageError
+
+    settings = get_settings()
+    tmp_dir = os.path.join(media_root(), "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    byte_size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            while chunk := upload.read(CHUNK_SIZE):
+                byte_size += len(chunk)
+                if byte_size > settings.IMAGE_MAX_UPLOAD_BYTES:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"A imagem excede o limite de {settings.IMAGE_MAX_UPLOAD_BYTES} bytes."
+                    )
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        try:
+            with Image.open(tmp_path) as image:
+                image_format, (width, height) = image.format, image.size
+                image.verify()
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError):
+            image_format = None
+        if image_format not in FORMATS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="O arquivo enviado não é uma imagem JPEG, PNG, WebP ou GIF válida."
+            )
+
+        content_hash = digest.hexdigest()
+        content_type = FORMATS[image_format][1]
+        target = os.path.join(image_dir(content_hash), original_name(content_type))
+        created = not os.path.exists(target)
+        if created:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tmp_path, target)
+        return StoredImage(content_hash, content_type, byte_size, width, height, created)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def render_thumbnails(directory: str, original: str, sizes: List[int], extension: str, webp_quality: int) -> List[str]:
+    """
+    Gera as miniaturas (no formato do original e em WebP) de uma imagem. Roda nos processos do pool.
+    As miniaturas são geradas da maior para a menor, cada uma a partir da anterior, e gravadas
+    via arquivo temporário + `os.replace`, para que nunca se sirva uma miniatura pela metade.
+    """
+    pending = [size for size in sorted(sizes, reverse=True)
+               if not all(os.path.exists(os.path.join(directory, f"{size}.{ext}")) for ext in (extension, "webp"))]
+    if not pending:
+        return []
+
+    from PIL import Image, ImageOps
+
+    written = []
+    with Image.open(os.path.join(directory, original)) as image:
+        # Em JPEGs grandes, decodifica direto em escala reduzida.
+        image.draft("RGB", (pending[0], pending[0]))
+        current = ImageOps.exif_transpose(image)
+        if extension == "jpg":
+            current = current.convert("RGB")
+        elif current.mode not in ("RGB", "RGBA"):
+            current = current.convert("RGBA")
+
+        for size in pending:
+            current = current.copy()
+            current.thumbnail((size, size), Image.LANCZOS)
+            for ext, image_format, options in (
+                (extension, "JPEG" if extension == "jpg" else "PNG", {"quality": 85, "optimize": True, "progressive": True} if extension == "jpg" else {"optimize": True}),
+                ("webp", "WEBP", {"quality": webp_quality, "method": 4}),
+            ):
+                target = os.path.join(directory, f"{size}.{ext}")
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+                with os.fdopen(fd, "wb") as tmp:
+                    current.save(tmp, image_format, **options)
+                os.replace(tmp_path, target)
+                written.append(target)
+    return written
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pending: Dict[str, Future] = {}
+_lock = threading.RLock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # "spawn" evita herdar as threads e conexões do processo da API.
+        _pool = ProcessPoolExecutor(max_workers=get_settings().IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _forget(content_hash: str, future: Future) -> None:
+    with _lock:
+        if _pending.get(content_hash) is future:
+            del _pending[content_hash]
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Falha ao gerar miniaturas da imagem %s.", content_hash, exc_info=future.exception())
+
+
+def schedule_thumbnails(content_hash: str, content_type: str) -> Optional[Future]:
+    """
+    Envia a geração das miniaturas para o pool de processos, fora do caminho da requisição.
+    Pedidos repetidos para o mesmo conteúdo reaproveitam a tarefa em andamento.
+    Com `IMAGE_WORKERS=0`, as miniaturas são geradas na própria thread.
+    """
+    settings = get_settings()
+    args = (image_dir(content_hash), original_name(content_type), settings.IMAGE_THUMBNAIL_SIZES,
+            thumbnail_extension(content_type), settings.IMAGE_WEBP_QUALITY)
+    if settings.IMAGE_WORKERS <= 0:
+        render_thumbnails(*args)
+        return None
+    with _lock:
+        future = _pending.get(content_hash)
+        if future is None:
+            future = _get_pool().submit(render_thumbnails, *args)
+            _pending[content_hash] = future
+            future.add_done_callback(lambda done: _forget(content_hash, done))
+    return future
+
+
+def pending_thumbnails(content_hash: str) -> Optional[Future]:
+    with _lock:
+        return _pending.get(content_hash)
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
@@ -0,0 +1,321 @@
+import logging
+import threading
+import time
+import uuid
+from datetime import timedelta
+from typing import Callable, List, Optional
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import select, update, delete, and_, or_, func, Row
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.database import models
+from app.database.models import utcnow
+from app.purchase import schemas, services
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+PROCESSING = "processing"
+DONE = "done"
+REJECTED = "rejected"
+DEAD_LETTER = "dead_letter"
+
+LATENCY_SAMPLE_SIZE = 1000
+# Entradas finalizadas que são apagadas após a retenção; as de dead letter ficam para análise.
+PURGED_STATES = (DONE, REJECTED)
+
+Intake = models.PurchaseIntake
+SessionFactory = Callable[[], Session]
+
+
+def enqueue_purchase(db: Session, purchase_data: schemas.PurchaseCreate) -> models.PurchaseIntake:
+    """Grava o pedido na fila de entrada. A validação de cliente, produtos e estoque fica com os workers."""
+    db_intake = Intake(id=uuid.uuid4(), payload=purchase_data.model_dump(mode="json"), status=QUEUED, attempts=0)
+    db.add(db_intake)
+    db.commit()
+    db.refresh(db_intake)
+    return db_intake
+
+
+def get_intake(db: Session, intake_id: uuid.UUID) -> Optional[models.PurchaseIntake]:
+    return db.query(Intake).filter(Intake.id == intake_id).first()
+
+
+def claim_batch(db: Session, batch_size: int) -> List[Row]:
+    """
+    Reserva até `batch_size` entradas disponíveis com `FOR UPDATE SKIP LOCKED` e as marca como
+    `processing`, para que workers concorrentes nunca peguem a mesma entrada. Entradas presas em
+    `processing` há mais de `PURCHASE_INTAKE_LEASE_SECONDS` (worker que morreu) voltam a ser elegíveis.
+    """
+    now = utcnow()
+    lease = timedelta(seconds=get_settings().PURCHASE_INTAKE_LEASE_SECONDS)
+    candidates = (
+        select(Intake.id)
+        .where(or_(
+            and_(Intake.status == QUEUED, Intake.available_at <= now),
+            and_(Intake.status == PROCESSING, Intake.locked_at < now - lease),
+        ))
+        .order_by(Intake.available_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    jobs = db.execute(
+        update(Intake)
+        .where(Intake.id.in_(candidates))
+        .values(status=PROCESSING, locked_at=now, attempts=Intake.attempts + 1)
+        .returning(Intake.id, Intake.payload, Intake.attempts)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return jobs
+
+
+def _finish(db: Session, intake_id: uuid.UUID, new_status: str, error: Optional[str] = None, retry_in: Optional[float] = None) -> str:
+    values = {"status": new_status, "last_error": error, "locked_at": None}
+    if retry_in is not None:
+        values["available_at"] = utcnow() + timedelta(seconds=retry_in)
+    else:
+        values["processed_at"] = utcnow()
+    db.execute(
+        update(Intake)
+        .where(Intake.id == intake_id, Intake.status == PROCESSING)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return new_status
+
+
+def _retry_or_dead_letter(db: Session, job: Row, error: str) -> str:
+    settings = get_settings()
+    if job.attempts >= settings.PURCHASE_INTAKE_MAX_ATTEMPTS:
+        logger.error("Entrada de pedido %s movida para dead letter após %s tentativas: %s", job.id, job.attempts, error)
+        return _finish(db, job.id, DEAD_LETTER, error)
+    retry_in = settings.PURCHASE_INTAKE_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+    logger.warning("Entrada de pedido %s falhou (tentativa %s), nova tentativa em %.1fs: %s", job.id, job.attempts, retry_in, error)
+    return _finish(db, job.id, QUEUED, error, retry_in=retry_in)
+
+
+def process_job(db: Session, job: Row) -> str:
+    """
+    Cria o pedido de uma entrada reservada com a mesma lógica de `/purchases/create`.
+
+    A marcação como `done` é gravada na mesma transação do pedido, e o pedido recebe o ID da
+    entrada: se o worker cair no meio, a entrada volta para a fila sem gerar pedido duplicado.
+    Erros de negócio (cliente inexistente, estoque insuficiente) rejeitam a entrada; falhas
+    transitórias são repetidas com espera exponencial até `PURCHASE_INTAKE_MAX_ATTEMPTS`.
+    """
+    try:
+        purchase_data = schemas.PurchaseCreate.model_validate(job.payload)
+    except ValidationError as exc:
+        return _finish(db, job.id, REJECTED, str(exc))
+
+    try:
+        claimed = db.execute(
+            update(Intake)
+            .where(Intake.id == job.id, Intake.status == PROCESSING)
+            .values(status=DONE, processed_at=utcnow(), last_error=None, locked_at=None)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            # Outro worker assumiu a entrada depois que a reserva expirou.
+            db.rollback()
+            return PROCESSING
+        services.create_purchase(db, purchase_data, purchase_id=job.id)
+        return DONE
+    except HTTPException as exc:
+        db.rollback()
+        if exc.status_code == status.HTTP_409_CONFLICT or exc.status_code >= 500:
+            return _retry_or_dead_letter(db, job, str(exc.detail))
+        return _finish(db, job.id, REJECTED, str(exc.detail))
+    except Exception as exc:
+        db.rollback()
+        logger.exception("Erro ao processar entrada de pedido %s.", job.id)
+        return _retry_or_dead_letter(db, job, repr(exc))
+
+
+def purge_finished(db: Session, retention: timedelta, batch_size: int = 1000) -> int:
+    """
+    Apaga, em lotes de `batch_size`, as entradas `done` e `rejected` processadas há mais de
+    `retention`. Cada status é percorrido pelo seu índice parcial em `processed_at`, e as linhas
+    já bloqueadas por outro processo que também está limpando são puladas.
+    """
+    cutoff = utcnow() - retention
+    purged = 0
+    for state in PURGED_STATES:
+        while True:
+            expired = (
+                select(Intake.id)
+                .where(Intake.status == state, Intake.processed_at < cutoff)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            deleted = db.execute(
+                delete(Intake).where(Intake.id.in_(expired)).execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+            purged += deleted
+            if deleted < batch_size:
+                break
+    return purged
+
+
+def process_batch(session_factory: SessionFactory, batch_size: Optional[int] = None) -> int:
+    """Reserva e processa um lote de entradas. Retorna quantas entradas foram reservadas."""
+    db = session_factory()
+    try:
+        jobs = claim_batch(db, batch_size or get_settings().PURCHASE_INTAKE_BATCH_SIZE)
+        for job in jobs:
+            process_job(db, job)
+        return len(jobs)
+    finally:
+        db.close()
+
+
+class IntakeWorkerPool:
+    """Threads que consomem a fila de entrada de pedidos dentro do processo da API."""
+
+    def __init__(self, session_factory: SessionFactory, workers: int, poll_interval: float, purge_interval: float = 3600.0):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.purge_interval = purge_interval
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._purge_lock = threading.Lock()
+        self._next_purge = time.monotonic()
+
+    def start(self) -> None:
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"purchase-intake-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Fila de entrada de pedidos: %s workers iniciados.", self.workers)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    @property
+    def running(self) -> int:
+        return sum(1 for thread in self._threads if thread.is_alive())
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                claimed = process_batch(self.session_factory)
+            except Exception:
+                logger.exception("Erro no worker da fila de entrada de pedidos.")
+                claimed = 0
+            if not claimed:
+                self._purge_if_due()
+                self._stop.wait(self.poll_interval)
+
+    def _purge_if_due(self) -> None:
+        # A limpeza roda com a fila ociosa, em um worker por vez, no máximo a cada `purge_interval`.
+        if time.monotonic() < self._next_purge or not self._purge_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_purge = time.monotonic() + self.purge_interval
+            settings = get_settings()
+            db = self.session_factory()
+            try:
+                purged = purge_finished(db, timedelta(days=settings.PURCHASE_INTAKE_RETENTION_DAYS))
+            finally:
+                db.close()
+            if purged:
+                logger.info("Fila de entrada de pedidos: %s entradas finalizadas apagadas.", purged)
+        except Exception:
+            logger.exception("Erro ao apagar entradas finalizadas da fila de entrada de pedidos.")
+        finally:
+            self._purge_lock.release()
+
+
+_pool: Optional[IntakeWorkerPool] = None
+
+
+def start_workers(session_factory: Optional[SessionFactory] = None) -> Optional[IntakeWorkerPool]:
+    global _pool
+    settings = get_settings()
+    if settings.PURCHASE_INTAKE_WORKERS <= 0 or _pool is not None:
+        return _pool
+    if session_factory is None:
+        from app.database.connection import SessionLocal
+        session_factory = SessionLocal
+    _pool = IntakeWorkerPool(
+        session_factory, settings.PURCHASE_INTAKE_WORKERS, settings.PURCHASE_INTAKE_POLL_INTERVAL_SECONDS,
+        settings.PURCHASE_INTAKE_PURGE_INTERVAL_SECONDS
+    )
+    _pool.start()
+    return _pool
+
+
+def stop_workers() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.stop()
+        _pool = None
+
+
+def get_intake_metrics(db: Session) -> dict:
+    """
+    Profundidade da fila por status, idade da entrada mais antiga e latência das últimas entradas
+    concluídas. Os status vivos (`queued`, `processing`, `dead_letter`) são contados inteiros; os
+    finalizados (`done`, `rejected`) só dentro da janela `PURCHASE_INTAKE_METRICS_WINDOW_SECONDS`.
+    Toda contagem percorre o índice parcial do seu status, nunca a tabela inteira.
+    """
+    since = utcnow() - timedelta(seconds=get_settings().PURCHASE_INTAKE_METRICS_WINDOW_SECONDS)
+
+    def count(*criteria):
+        return select(func.count()).select_from(Intake).where(*criteria).scalar_subquery()
+
+    row = db.execute(select(
+        count(Intake.status == QUEUED).label(QUEUED),
+        count(Intake.status == PROCESSING).label(PROCESSING),
+        count(Intake.status == DONE, Intake.processed_at >= since).label(DONE),
+        count(Intake.status == REJECTED, Intake.processed_at >= since).label(REJECTED),
+        count(Intake.status == DEAD_LETTER).label(DEAD_LETTER),
+        # Um status por contagem: `status IN (...)` não casa com os índices parciais.
+        (
+            count(Intake.status == DONE, Intake.processed_at >= since, Intake.attempts > 1)
+            + count(Intake.status == REJECTED, Intake.processed_at >= since, Intake.attempts > 1)
+        ).label("retried"),
+        select(func.min(Intake.created_at)).where(Intake.status == QUEUED).scalar_subquery().label("oldest_queued"),
+    )).one()
+    depth = {state: row._mapping[state] for state in (QUEUED, PROCESSING, DONE, REJECTED, DEAD_LETTER)}
+    oldest_queued, retried = row.oldest_queued, row.retried
+
+    recent = (
+        select((func.extract("epoch", Intake.processed_at - Intake.created_at) * 1000).label("ms"))
+        .where(Intake.status == DONE, Intake.processed_at >= since)
+        .order_by(Intake.processed_at.desc())
+        .limit(LATENCY_SAMPLE_SIZE)
+        .subquery()
+    )
+    samples, avg_ms, p50_ms, p95_ms, max_ms = db.execute(select(
+        func.count(recent.c.ms),
+        func.avg(recent.c.ms),
+        func.percentile_cont(0.5).within_group(recent.c.ms),
+        func.percentile_cont(0.95).within_group(recent.c.ms),
+        func.max(recent.c.ms),
+    )).one()
+
+    return {
+        "depth": depth,
+        "oldest_queued_seconds": (utcnow() - oldest_queued).total_seconds() if oldest_queued else None,
+        "retried": retried,
+        "window_seconds": get_settings().PURCHASE_INTAKE_METRICS_WINDOW_SECONDS,
+        "latency_ms": {
+            "samples": samples,
+            "avg": float(avg_ms) if avg_ms is not None else None,
+            "p50": float(p50_ms) if p50_ms is not None else None,
+            "p95": float(p95_ms) if p95_ms is not None else None,
+            "max": float(max_ms) if max_ms is not None else None,
+        },
+        "workers": _pool.running if _pool else 0,
+    }
@@ -0,0 +1,242 @@
+import argparse
+import datetime
+import logging
+import sys
+import threading
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, insert, union_all, func, or_, text
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.database import models
+
+logger = logging.getLogger(__name__)
+
+TOTAL = "total"
+PRODUCT = "product"
+CATEGORY = "category"
+GENDER = "gender"
+DIMENSIONS = (TOTAL, PRODUCT, CATEGORY, GENDER)
+TOTAL_KEY = "all"
+
+# (product_id, category_id, gender_id, quantidade, receita) de um produto dentro de um pedido.
+SaleLine = Tuple[object, int, int, int, Decimal]
+SessionFactory = Callable[[], Session]
+
+FOLD_DELTAS_SQL = """
+WITH moved AS (
+    DELETE FROM sales_daily_deltas
+    RETURNING dimension, day, dimension_key, quantity, revenue, order_count
+)
+INSERT INTO sales_daily (dimension, day, dimension_key, quantity, revenue, order_count, updated_at)
+SELECT dimension, day, dimension_key, sum(quantity), sum(revenue), sum(order_count), now()
+FROM moved
+GROUP BY dimension, day, dimension_key
+ON CONFLICT (dimension, day, dimension_key) DO UPDATE SET
+    quantity = sales_daily.quantity + EXCLUDED.quantity,
+    revenue = sales_daily.revenue + EXCLUDED.revenue,
+    order_count = sales_daily.order_count + EXCLUDED.order_count,
+    updated_at = EXCLUDED.updated_at
+"""
+
+# Os deltas apagados e os pedidos recontados vêm do mesmo snapshot (um único comando),
+# então pedidos concorrentes não são perdidos nem contados duas vezes.
+REBUILD_SQL = """
+WITH cleared_deltas AS (
+    DELETE FROM sales_daily_deltas RETURNING 1
+), sales AS (
+    SELECT (p.created_at AT TIME ZONE 'UTC')::date AS day, i.purchase_id, i.quantity, i.total_price,
+           i.product_id::text AS product_key, i.category_id::text AS category_key, i.gender_id::text AS gender_key
+    FROM purchase_items i
+    JOIN purchases p ON p.id = i.purchase_id
+    WHERE p.status <> 'cancelled'
+)
+INSERT INTO sales_daily (dimension, day, dimension_key, quantity, revenue, order_count, updated_at)
+SELECT d.dimension, sales.day, d.dimension_key, sum(sales.quantity), sum(sales.total_price),
+       count(DISTINCT sales.purchase_id), now()
+FROM sales
+CROSS JOIN LATERAL (VALUES
+    ('total', 'all'), ('product', sales.product_key), ('category', sales.category_key), ('gender', sales.gender_key)
+) AS d(dimension, dimension_key)
+GROUP BY d.dimension, sales.day, d.dimension_key
+"""
+
+
+def _delta_rows(day: datetime.date, lines: Iterable[SaleLine], sign: int) -> List[dict]:
+    totals: Dict[Tuple[str, str], List] = {}
+    for product_id, category_id, gender_id, quantity, revenue in lines:
+        for dimension, key in ((TOTAL, TOTAL_KEY), (PRODUCT, str(product_id)), (CATEGORY, str(category_id)), (GENDER, str(gender_id))):
+            accumulated = totals.setdefault((dimension, key), [0, Decimal("0.00")])
+            accumulated[0] += quantity
+            accumulated[1] += revenue
+    return [
+        {
+            "dimension": dimension, "day": day, "dimension_key": key,
+            "quantity": sign * quantity, "revenue": sign * revenue, "order_count": sign,
+        }
+        for (dimension, key), (quantity, revenue) in totals.items()
+    ]
+
+
+def record_sales(db: Session, day: datetime.date, lines: Iterable[SaleLine], sign: int = 1) -> None:
+    """
+    Registra as vendas de um pedido (`sign=1`) ou o seu estorno (`sign=-1`) como deltas,
+    com um único `INSERT`. Os deltas só são somados às tabelas de agregados por `fold_sales_deltas`,
+    para que pedidos simultâneos não disputem as mesmas linhas de `sales_daily`.
+    """
+    rows = _delta_rows(day, lines, sign)
+    if rows:
+        db.execute(insert(models.SalesDailyDelta).values(rows))
+
+
+def fold_sales_deltas(db: Session) -> int:
+    """Soma os deltas pendentes em `sales_daily` e os remove, em um único comando. Retorna as linhas afetadas."""
+    folded = db.execute(text(FOLD_DELTAS_SQL)).rowcount
+    db.commit()
+    return folded
+
+
+def rebuild_sales_rollups(db: Session) -> None:
+    """Recalcula `sales_daily` a partir de `purchase_items`, descartando os deltas pendentes."""
+    # Impede a consolidação concorrente dos deltas; checkouts e consultas continuam liberados.
+    db.execute(text("LOCK TABLE sales_daily IN EXCLUSIVE MODE"))
+    db.execute(text("DELETE FROM sales_daily"))
+    db.execute(text(REBUILD_SQL))
+    db.commit()
+
+
+def _labels(db: Session, group_by: str, keys: List[str]) -> Dict[str, str]:
+    if group_by == PRODUCT:
+        return {str(product_id): name for product_id, name in db.execute(
+            select(models.Product.id, models.Product.name).where(models.Product.id.in_(keys))
+        )}
+    if group_by in (CATEGORY, GENDER):
+        model = models.Category if group_by == CATEGORY else models.Gender
+        return {str(model_id): name for model_id, name in db.execute(
+            select(model.id, model.name).where(model.id.in_([int(key) for key in keys]))
+        )}
+    return {}
+
+
+def get_sales_stats(
+    db: Session,
+    start_date: datetime.date,
+    end_date: datetime.date,
+    group_by: str = TOTAL,
+    by_day: bool = False
+) -> List[dict]:
+    """
+    Consulta os agregados diários de vendas no período, somando os deltas ainda não consolidados.
+    Nunca lê `purchase_items`: o custo depende só da quantidade de dias e de chaves no período.
+    """
+    parts = [
+        select(model.day, model.dimension_key, model.quantity, model.revenue, model.order_count)
+        .where(model.dimension == group_by, model.day.between(start_date, end_date))
+        for model in (models.SalesDaily, models.SalesDailyDelta)
+    ]
+    combined = union_all(*parts).subquery("combined")
+    group_columns = [combined.c.day, combined.c.dimension_key] if by_day else [combined.c.dimension_key]
+    revenue = func.sum(combined.c.revenue)
+    rows = db.execute(
+        select(
+            *group_columns,
+            func.sum(combined.c.quantity).label("quantity"),
+            revenue.label("revenue"),
+            func.sum(combined.c.order_count).label("order_count"),
+        )
+        .group_by(*group_columns)
+        .having(or_(func.sum(combined.c.quantity) != 0, func.sum(combined.c.order_count) != 0))
+        .order_by(*([combined.c.day] if by_day else []), revenue.desc(), combined.c.dimension_key)
+    ).mappings().all()
+
+    labels = _labels(db, group_by, sorted({row["dimension_key"] for row in rows}))
+    return [
+        {
+            "day": row["day"] if by_day else None,
+            "key": None if group_by == TOTAL else row["dimension_key"],
+            "label": labels.get(row["dimension_key"]),
+            "quantity": row["quantity"],
+            "revenue": row["revenue"],
+            "order_count": row["order_count"],
+        }
+        for row in rows
+    ]
+
+
+class SalesRollupRefresher:
+    """Thread que consolida os deltas de vendas em `sales_daily` a cada `interval` segundos."""
+
+    def __init__(self, session_factory: SessionFactory, interval: float):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="sales-rollup-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            db = self.session_factory()
+            try:
+                fold_sales_deltas(db)
+            except Exception:
+                logger.exception("Erro ao consolidar os agregados de vendas.")
+            finally:
+                db.close()
+
+
+_refresher: Optional[SalesRollupRefresher] = None
+
+
+def start_refresher(session_factory: Optional[SessionFactory] = None) -> Optional[SalesRollupRefresher]:
+    global _refresher
+    interval = get_settings().SALES_ROLLUP_REFRESH_SECONDS
+    if interval <= 0 or _refresher is not None:
+        return _refresher
+    if session_factory is None:
+        from app.database.connection import SessionLocal
+        session_factory = SessionLocal
+    _refresher = SalesRollupRefresher(session_factory, interval)
+    _refresher.start()
+    return _refresher
+
+
+def stop_refresher() -> None:
+    global _refresher
+    if _refresher is not None:
+        _refresher.stop()
+        _refresher = None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Manutenção dos agregados diários de vendas.")
+    parser.add_argument("--rebuild", action="store_true", help="Recalcula todos os agregados a partir dos itens de pedido.")
+    args = parser.parse_args(argv)
+
+    from app.database.connection import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if args.rebuild:
+            rebuild_sales_rollups(db)
+            print("Agregados de vendas recalculados.", file=sys.stderr)
+        else:
+            folded = fold_sales_deltas(db)
+            print(f"{folded} agregados de vendas atualizados.", file=sys.stderr)
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
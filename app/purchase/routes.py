@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional, Annotated
 import uuid
-from datetime import datetime
+from datetime import datetime, date, timedelta, timezone
 
 from app.database.connection import get_db
-from app.purchase import schemas, services
+from app.purchase import schemas, services, intake, rollups
 from app.database import models
 from app.core.dependencies import get_current_active_user, get_current_admin_user
+from app.core.etag import check_etag
+from app.core.responses import model_list_response
 from app.purchase.schemas import MessageResponse as PurchaseMessageResponse
+from app.purchase.status import PurchaseStatus
 
 router = APIRouter(
     prefix="/purchases",
@@ -49,6 +52,94 @@ def create_purchase_route(
     """
     return services.create_purchase(db, purchase_data)
 
+def _intake_response(db_intake: models.PurchaseIntake) -> schemas.PurchaseIntakeResponse:
+    response = schemas.PurchaseIntakeResponse.model_validate(db_intake)
+    if db_intake.status == intake.DONE:
+        response.purchase_id = db_intake.id
+    return response
+
+@router.post(
+    "/intake",
+    response_model=schemas.PurchaseIntakeResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Enfileira um novo pedido para processamento assíncrono.",
+    responses={
+        status.HTTP_202_ACCEPTED: {
+            "description": "Pedido aceito na fila.",
+            "content": {"application/json": {"example": {
+                **schemas.PurchaseIntakeResponse.model_config['json_schema_extra']['example'],
+                "status": "queued", "attempts": 0, "purchase_id": None, "processed_at": None
+            }}}
+        }
+    }
+)
+def enqueue_purchase_route(
+    purchase_data: schemas.PurchaseCreate,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: Annotated[models.User, Depends(get_current_active_user)] = None
+):
+    """
+    Grava o pedido em uma fila no banco e responde imediatamente, sem esperar a reserva de estoque.
+    Workers em segundo plano criam o pedido com as mesmas regras de `/purchases/create`.
+    - **Regras de negócio**:
+        - O ID retornado é o ID do pedido que será criado. Acompanhe em `/purchases/intake/{intake_id}`.
+        - Cliente, produtos ou estoque inválidos levam a entrada para `rejected`, com o motivo em `last_error`.
+        - Falhas transitórias são repetidas; esgotadas as tentativas, a entrada vai para `dead_letter`.
+    - **Casos de uso**: Checkout em picos de acesso.
+    """
+    db_intake = intake.enqueue_purchase(db, purchase_data)
+    response.headers["Location"] = f"/purchases/intake/{db_intake.id}"
+    return _intake_response(db_intake)
+
+@router.get(
+    "/intake/metrics",
+    response_model=schemas.PurchaseIntakeMetricsResponse,
+    summary="Métricas da fila de entrada de pedidos (requer admin).",
+    responses={
+        status.HTTP_200_OK: {
+            "description": "Métricas da fila.",
+            "content": {"application/json": {"example": schemas.PurchaseIntakeMetricsResponse.model_config['json_schema_extra']['example']}}
+        }
+    }
+)
+def read_intake_metrics_route(
+    db: Session = Depends(get_db),
+    current_user: Annotated[models.User, Depends(get_current_admin_user)] = None
+):
+    """
+    Retorna a profundidade da fila por status, a idade da entrada mais antiga ainda na fila
+    e a latência (p50/p95) entre o enfileiramento e a criação do pedido.
+    - **Casos de uso**: Monitorar a fila durante promoções. Dimensionar a quantidade de workers.
+    """
+    return intake.get_intake_metrics(db)
+
+@router.get(
+    "/intake/{intake_id}",
+    response_model=schemas.PurchaseIntakeResponse,
+    summary="Consulta a situação de um pedido enfileirado.",
+    responses={
+        status.HTTP_200_OK: {
+            "description": "Situação da entrada.",
+            "content": {"application/json": {"example": schemas.PurchaseIntakeResponse.model_config['json_schema_extra']['example']}}
+        },
+        status.HTTP_404_NOT_FOUND: {"content": {"application/json": {"example": {"detail": "Entrada de pedido não encontrada."}}}}
+    }
+)
+def read_intake_route(
+    intake_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user: Annotated[models.User, Depends(get_current_active_user)] = None
+):
+    """
+    Retorna a situação de um pedido enviado para `/purchases/intake`.
+    - **Casos de uso**: Tela de confirmação consultando o pedido até ele ser criado.
+    """
+    db_intake = intake.get_intake(db, intake_id)
+    if db_intake is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Entrada de pedido não encontrada.")
+    return _intake_response(db_intake)
+
 @router.get(
     "/read",
     response_model=List[schemas.PurchaseResponse],
@@ -66,7 +157,7 @@ def read_purchases_route(
     skip: int = Query(0, ge=0, description="Registros a pular."),
     limit: int = Query(100, ge=1, le=100, description="Máximo de registros."),
     client_id: Optional[uuid.UUID] = Query(None, description="Filtrar por ID do cliente."),
-    status: Optional[str] = Query(None, description="Filtrar por status (ex: pending)."),
+    status: Optional[PurchaseStatus] = Query(None, description="Filtrar por status (ex: pending)."),
     start_date: Optional[datetime] = Query(None, description="Data/hora inicial (ISO)."),
     end_date: Optional[datetime] = Query(None, description="Data/hora final (ISO)."),
     product_section_category_id: Optional[int] = Query(None, description="Filtrar por categoria de item."),
@@ -79,12 +170,46 @@ def read_purchases_route(
     - **Regras de negócio**: Requer auth. Filtros opcionais. `client_id` (se cliente) só vê seus pedidos.
     - **Casos de uso**: Painel admin. Histórico de cliente. Relatórios.
     """
-    return services.get_purchases(
+    purchases = services.get_purchases(
         db, skip=skip, limit=limit, client_id=client_id, status=status,
         start_date=start_date, end_date=end_date,
         product_section_category_id=product_section_category_id,
         product_section_gender_id=product_section_gender_id
     )
+    return model_list_response(schemas.PurchaseResponse, purchases)
+
+@router.get(
+    "/stats",
+    response_model=schemas.SalesStatsResponse,
+    summary="Estatísticas de vendas por período, produto, categoria ou gênero.",
+    responses={
+        status.HTTP_200_OK: {
+            "description": "Vendas agregadas no período.",
+            "content": {"application/json": {"example": schemas.SalesStatsResponse.model_config['json_schema_extra']['example']}}
+        },
+        status.HTTP_400_BAD_REQUEST: {"content": {"application/json": {"example": {"detail": "A data inicial deve ser anterior ou igual à data final."}}}}
+    }
+)
+def read_sales_stats_route(
+    start_date: Optional[date] = Query(None, description="Dia inicial (UTC). Padrão: 29 dias antes de `end_date`."),
+    end_date: Optional[date] = Query(None, description="Dia final (UTC). Padrão: hoje."),
+    group_by: str = Query(rollups.TOTAL, pattern="^(total|product|category|gender)$", description="Agrupar por 'total', 'product', 'category' ou 'gender'."),
+    by_day: bool = Query(False, description="Separar as linhas por dia."),
+    db: Session = Depends(get_db),
+    current_user: Annotated[models.User, Depends(get_current_active_user)] = None
+):
+    """
+    Retorna quantidade vendida, receita e quantidade de pedidos no período, lidas das tabelas
+    de agregados diários (sem percorrer os itens de pedido).
+    - **Regras de negócio**: Pedidos cancelados não entram nas estatísticas. Os dias seguem o fuso UTC.
+    - **Casos de uso**: Relatórios de vendas. Ranking de produtos e categorias.
+    """
+    end_date = end_date or datetime.now(timezone.utc).date()
+    start_date = start_date or end_date - timedelta(days=29)
+    if start_date > end_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="A data inicial deve ser anterior ou igual à data final.")
+    rows = rollups.get_sales_stats(db, start_date, end_date, group_by=group_by, by_day=by_day)
+    return {"start_date": start_date, "end_date": end_date, "group_by": group_by, "by_day": by_day, "rows": rows}
 
 @router.get(
     "/read/{purchase_id}",
@@ -100,6 +225,8 @@ def read_purchases_route(
 )
 def read_purchase_route(
     purchase_id: uuid.UUID,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: Annotated[models.User, Depends(get_current_active_user)] = None
 ):
@@ -108,6 +235,12 @@ def read_purchase_route(
     - **Regras de negócio**: Pedido deve existir. Requer auth (cliente só vê seus pedidos).
     - **Casos de uso**: Detalhes de pedido. Cliente acompanhando status.
     """
+    etag = services.get_purchase_etag(db, purchase_id)
+    if etag is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pedido não encontrado")
+    not_modified = check_etag(request, response, etag)
+    if not_modified:
+        return not_modified
     db_purchase = services.get_purchase(db, purchase_id)
     if db_purchase is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pedido não encontrado")
@@ -122,6 +255,7 @@ def read_purchase_route(
             "description": "Pedido atualizado.",
             "content": {"application/json": {"example": {**(schemas.PurchaseResponse.model_config.get('json_schema_extra', {}).get('example', {})), "status": "shipped"}}}
         },
+        status.HTTP_400_BAD_REQUEST: {"content": {"application/json": {"example": {"detail": "Transição de status inválida: 'delivered' para 'pending'."}}}},
         status.HTTP_404_NOT_FOUND: {"content": {"application/json": {"example": {"detail": "Pedido não encontrado"}}}}
     }
 )
@@ -133,7 +267,8 @@ def update_purchase_route(
 ):
     """
     Atualiza info de pedido (primariamente status).
-    - **Regras de negócio**: Pedido deve existir. Apenas campos permitidos. Requer auth (admin/gerente). (Considerar transição de status).
+    - **Regras de negócio**: Pedido deve existir. Apenas campos permitidos. Requer auth (admin/gerente).
+        - Transições permitidas: `pending` → `paid`, `shipped` ou `cancelled`; `paid` → `shipped` ou `cancelled`; `shipped` → `delivered`. `delivered` e `cancelled` são finais.
     - **Casos de uso**: Marcar como 'pago', 'enviado'. Atualizar no painel admin.
     """
     db_purchase = services.update_purchase(db, purchase_id, purchase_data)
@@ -141,6 +276,61 @@ def update_purchase_route(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pedido não encontrado")
     return db_purchase
 
+@router.put(
+    "/status",
+    response_model=schemas.PurchaseBulkStatusResponse,
+    summary="Aplica uma transição de status a vários pedidos.",
+    responses={
+        status.HTTP_200_OK: {
+            "description": "Pedidos atualizados e rejeitados.",
+            "content": {"application/json": {"example": schemas.PurchaseBulkStatusResponse.model_config['json_schema_extra']['example']}}
+        },
+        status.HTTP_400_BAD_REQUEST: {"content": {"application/json": {"example": {"detail": "Cancelamentos devem usar /purchases/cancel/{purchase_id}, que devolve o estoque."}}}}
+    }
+)
+def bulk_update_status_route(
+    bulk_data: schemas.PurchaseBulkStatusUpdate,
+    db: Session = Depends(get_db),
+    current_user: Annotated[models.User, Depends(get_current_active_user)] = None
+):
+    """
+    Muda o status de até 1000 pedidos com um único comando no banco.
+    - **Regras de negócio**: Só são atualizados os pedidos cujo status atual permite a transição; os demais
+      (inexistentes, já no status pedido ou em status incompatível) voltam em `rejected` com o motivo.
+      Cancelamentos não são aceitos aqui. Requer auth.
+    - **Casos de uso**: Expedição marcando centenas de pedidos como enviados ou entregues.
+    """
+    updated, rejected = services.bulk_update_status(db, bulk_data.purchase_ids, bulk_data.status)
+    return {"status": bulk_data.status, "updated": updated, "rejected": rejected}
+
+@router.post(
+    "/cancel/{purchase_id}",
+    response_model=schemas.PurchaseResponse,
+    summary="Cancela um pedido e devolve o estoque.",
+    responses={
+        status.HTTP_200_OK: {
+            "description": "Pedido cancelado. Estoque devolvido.",
+            "content": {"application/json": {"example": {**(schemas.PurchaseResponse.model_config.get('json_schema_extra', {}).get('example', {})), "status": "cancelled"}}}
+        },
+        status.HTTP_400_BAD_REQUEST: {"content": {"application/json": {"example": {"detail": "Pedido já está cancelado."}}}},
+        status.HTTP_404_NOT_FOUND: {"content": {"application/json": {"example": {"detail": "Pedido não encontrado"}}}}
+    }
+)
+def cancel_purchase_route(
+    purchase_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user: Annotated[models.User, Depends(get_current_active_user)] = None
+):
+    """
+    Cancela pedido, mantendo o registro, e devolve ao estoque todos os seus itens.
+    - **Regras de negócio**: Pedido deve existir. Pedidos já cancelados, enviados ou entregues não podem ser cancelados. Requer auth.
+    - **Casos de uso**: Cliente desistindo da compra. Pagamento recusado.
+    """
+    db_purchase = services.cancel_purchase(db, purchase_id)
+    if db_purchase is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pedido não encontrado")
+    return db_purchase
+
 @router.delete(
     "/delete/{purchase_id}",
     response_model=PurchaseMessageResponse,
@@ -1,8 +1,9 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, List
-from datetime import datetime
+from typing import Optional, List, Dict
+from datetime import datetime, date
 import uuid
 from decimal import Decimal
+from app.purchase.status import PurchaseStatus
 
 class PurchaseItemCreate(BaseModel):
     product_id: uuid.UUID = Field(description="ID do produto a ser incluído no pedido.")
@@ -76,7 +77,7 @@ class PurchaseCreate(BaseModel):
     )
 
 class PurchaseUpdate(BaseModel):
-    status: Optional[str] = Field(None, max_length=50, description="Novo status do pedido.")
+    status: Optional[PurchaseStatus] = Field(None, description="Novo status do pedido. A transição precisa ser permitida a partir do status atual.")
 
     model_config = ConfigDict(
         json_schema_extra = {
@@ -86,10 +87,49 @@ class PurchaseUpdate(BaseModel):
         }
     )
 
+class PurchaseBulkStatusUpdate(BaseModel):
+    purchase_ids: List[uuid.UUID] = Field(..., min_length=1, max_length=1000, description="IDs dos pedidos a atualizar.")
+    status: PurchaseStatus = Field(description="Novo status aplicado a todos os pedidos.")
+
+    model_config = ConfigDict(
+        json_schema_extra = {
+            "example": {
+                "purchase_ids": ["f1e2d3c4-b5a6-9876-5432-fedcba987654", "0a9b8c7d-6e5f-4321-8765-abcdef012345"],
+                "status": "shipped"
+            }
+        }
+    )
+
+class PurchaseStatusRejection(BaseModel):
+    purchase_id: uuid.UUID = Field(description="ID do pedido não atualizado.")
+    current_status: Optional[PurchaseStatus] = Field(None, description="Status atual do pedido, se ele existir.")
+    detail: str = Field(description="Motivo da rejeição.")
+
+class PurchaseBulkStatusResponse(BaseModel):
+    status: PurchaseStatus = Field(description="Status aplicado.")
+    updated: List[uuid.UUID] = Field(description="IDs dos pedidos atualizados.")
+    rejected: List[PurchaseStatusRejection] = Field(description="Pedidos não atualizados e o motivo.")
+
+    model_config = ConfigDict(
+        json_schema_extra = {
+            "example": {
+                "status": "shipped",
+                "updated": ["f1e2d3c4-b5a6-9876-5432-fedcba987654"],
+                "rejected": [
+                    {
+                        "purchase_id": "0a9b8c7d-6e5f-4321-8765-abcdef012345",
+                        "current_status": "cancelled",
+                        "detail": "Transição de status inválida: 'cancelled' para 'shipped'."
+                    }
+                ]
+            }
+        }
+    )
+
 class PurchaseResponse(BaseModel):
     id: uuid.UUID = Field(description="ID único do pedido.")
     client_id: uuid.UUID = Field(description="ID do cliente que fez o pedido.")
-    status: str = Field(description="Status atual do pedido.")
+    status: PurchaseStatus = Field(description="Status atual do pedido.")
     subtotal: Decimal = Field(description="Subtotal do pedido.")
     created_at: datetime = Field(description="Data e hora de criação do pedido.")
     updated_at: datetime = Field(description="Data e hora da última atualização do pedido.")
@@ -122,6 +162,88 @@ class PurchaseResponse(BaseModel):
         }
     )
 
+class PurchaseIntakeResponse(BaseModel):
+    id: uuid.UUID = Field(description="ID da entrada na fila. O pedido criado a partir dela recebe o mesmo ID.")
+    status: str = Field(description="Situação da entrada: 'queued', 'processing', 'done', 'rejected' ou 'dead_letter'.")
+    attempts: int = Field(description="Quantidade de tentativas de processamento.")
+    last_error: Optional[str] = Field(None, description="Motivo da última falha, quando houver.")
+    purchase_id: Optional[uuid.UUID] = Field(None, description="ID do pedido criado, quando `status` é 'done'.")
+    created_at: datetime = Field(description="Data e hora de entrada na fila.")
+    processed_at: Optional[datetime] = Field(None, description="Data e hora em que a entrada foi concluída, rejeitada ou descartada.")
+
+    model_config = ConfigDict(
+        from_attributes=True,
+        json_schema_extra = {
+            "example": {
+                "id": "f1e2d3c4-b5a6-9876-5432-fedcba987654",
+                "status": "done",
+                "attempts": 1,
+                "last_error": None,
+                "purchase_id": "f1e2d3c4-b5a6-9876-5432-fedcba987654",
+                "created_at": "2024-05-25T15:00:00Z",
+                "processed_at": "2024-05-25T15:00:01Z"
+            }
+        }
+    )
+
+class PurchaseIntakeLatency(BaseModel):
+    samples: int = Field(description="Quantidade de entradas concluídas consideradas (as mais recentes).")
+    avg: Optional[float] = Field(None, description="Latência média entre a entrada na fila e a criação do pedido, em milissegundos.")
+    p50: Optional[float] = Field(None, description="Mediana da latência, em milissegundos.")
+    p95: Optional[float] = Field(None, description="Percentil 95 da latência, em milissegundos.")
+    max: Optional[float] = Field(None, description="Maior latência, em milissegundos.")
+
+class PurchaseIntakeMetricsResponse(BaseModel):
+    depth: Dict[str, int] = Field(description="Quantidade de entradas por status; `done` e `rejected` contam só as finalizadas dentro da janela.")
+    oldest_queued_seconds: Optional[float] = Field(None, description="Idade da entrada mais antiga ainda na fila, em segundos.")
+    retried: int = Field(description="Entradas finalizadas dentro da janela que precisaram de mais de uma tentativa.")
+    window_seconds: int = Field(description="Janela, em segundos, das contagens de entradas finalizadas e da latência.")
+    latency_ms: PurchaseIntakeLatency = Field(description="Latência das entradas concluídas dentro da janela.")
+    workers: int = Field(description="Workers da fila em execução neste processo.")
+
+    model_config = ConfigDict(
+        json_schema_extra = {
+            "example": {
+                "depth": {"queued": 12, "processing": 2, "done": 980, "rejected": 5, "dead_letter": 1},
+                "oldest_queued_seconds": 0.8,
+                "retried": 3,
+                "window_seconds": 3600,
+                "latency_ms": {"samples": 980, "avg": 95.2, "p50": 60.1, "p95": 310.7, "max": 1204.3},
+                "workers": 2
+            }
+        }
+    )
+
+class SalesStatsRow(BaseModel):
+    day: Optional[date] = Field(None, description="Dia das vendas (UTC), quando `by_day` é verdadeiro.")
+    key: Optional[str] = Field(None, description="ID do produto, categoria ou gênero agrupado. Nulo para o total.")
+    label: Optional[str] = Field(None, description="Nome do produto, categoria ou gênero agrupado.")
+    quantity: int = Field(description="Quantidade de unidades vendidas.")
+    revenue: Decimal = Field(description="Receita das vendas.")
+    order_count: int = Field(description="Quantidade de pedidos com vendas no grupo.")
+
+class SalesStatsResponse(BaseModel):
+    start_date: date = Field(description="Início do período (inclusivo).")
+    end_date: date = Field(description="Fim do período (inclusivo).")
+    group_by: str = Field(description="Agrupamento: 'total', 'product', 'category' ou 'gender'.")
+    by_day: bool = Field(description="Se as linhas estão separadas por dia.")
+    rows: List[SalesStatsRow] = Field(description="Vendas agregadas, das maiores receitas para as menores.")
+
+    model_config = ConfigDict(
+        json_schema_extra = {
+            "example": {
+                "start_date": "2024-05-01",
+                "end_date": "2024-05-31",
+                "group_by": "category",
+                "by_day": False,
+                "rows": [
+                    {"day": None, "key": "1", "label": "Camisetas", "quantity": 420, "revenue": "54558.00", "order_count": 311},
+                    {"day": None, "key": "3", "label": "Calças", "quantity": 95, "revenue": "18990.50", "order_count": 88}
+                ]
+            }
+        }
+    )
+
 class MessageResponse(BaseModel):
     message: str = Field(description="Mensagem de resposta da operação.")
     model_config = ConfigDict(
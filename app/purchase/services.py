@@ -1,13 +1,105 @@
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, aliased
+from sqlalchemy import select, insert, update, values, column, exists, func, any_, bindparam, Integer, Row
+from sqlalchemy.dialects.postgresql import UUID, ARRAY
+from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
 from app.database import models
-from app.purchase import schemas
-from typing import List, Optional
+from app.purchase import schemas, rollups
+from typing import Dict, List, Optional, Tuple
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
+from app.core.etag import make_etag
+from app.core import reference
+from app.product import inventory
+from app.purchase.status import PurchaseStatus, can_transition, allowed_sources
 
-def create_purchase(db: Session, purchase_data: schemas.PurchaseCreate) -> models.Purchase:
+CANCELLED_STATUS = PurchaseStatus.cancelled
+
+def _lock_products(db: Session, product_ids: List[uuid.UUID]) -> Dict[uuid.UUID, Row]:
+    """
+    Carrega e bloqueia os produtos do pedido em uma única consulta, sempre na ordem do ID,
+    para evitar deadlocks entre pedidos concorrentes que contenham os mesmos produtos.
+    Produtos com estoque fragmentado não são bloqueados nem retornados: o estoque deles
+    é controlado pelos fragmentos.
+    """
+    return {
+        row.id: row for row in db.execute(
+            select(
+                models.Product.id, models.Product.name, models.Product.inventory,
+                models.Product.category_id, models.Product.gender_id
+            )
+            .where(models.Product.id.in_(product_ids), models.Product.inventory_shard_count == 0)
+            .order_by(models.Product.id)
+            .with_for_update(key_share=True)
+        )
+    }
+
+def _get_sharded_products(db: Session, product_ids: List[uuid.UUID]) -> Dict[uuid.UUID, Row]:
+    if not product_ids:
+        return {}
+    return {
+        row.id: row for row in db.execute(
+            select(models.Product.id, models.Product.name, models.Product.category_id, models.Product.gender_id)
+            .where(models.Product.id.in_(product_ids), models.Product.inventory_shard_count > 0)
+        )
+    }
+
+def _reserve_inventory(db: Session, quantities: Dict[uuid.UUID, int], locked: Dict[uuid.UUID, Row]) -> None:
+    """
+    Debita o estoque de todos os produtos do pedido com um único `UPDATE` condicional,
+    que só é aplicado se todos os produtos tiverem estoque suficiente.
+    """
+    if not quantities:
+        return
+    product_ids = sorted(quantities)
+    requested = values(
+        column("product_id", UUID(as_uuid=True)), column("quantity", Integer), name="requested"
+    ).data([(product_id, quantities[product_id]) for product_id in product_ids])
+    current = aliased(models.Product, name="current")
+    shortage = (
+        select(requested.c.product_id)
+        .join(current, current.id == requested.c.product_id)
+        .where(current.inventory < requested.c.quantity)
+    )
+    reserved = db.execute(
+        update(models.Product)
+        .where(
+            models.Product.id == requested.c.product_id,
+            models.Product.inventory >= requested.c.quantity,
+            ~exists(shortage)
+        )
+        .values(inventory=models.Product.inventory - requested.c.quantity)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if reserved == len(product_ids):
+        return
+
+    for product_id in quantities:
+        row = locked[product_id]
+        if row.inventory < quantities[product_id]:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Estoque insuficiente para o produto {row.name}. Disponível: {row.inventory}, Solicitado: {quantities[product_id]}."
+            )
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Não foi possível reservar o estoque do pedido. Tente novamente."
+    )
+
+def _reserve_sharded_inventory(db: Session, quantities: Dict[uuid.UUID, int], sharded: Dict[uuid.UUID, Row]) -> None:
+    for product_id in sorted(quantities):
+        available = inventory.reserve_from_shards(db, product_id, quantities[product_id])
+        if available is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Estoque insuficiente para o produto {sharded[product_id].name}. Disponível: {available}, Solicitado: {quantities[product_id]}."
+            )
+
+def _size_not_found(size_id: int) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Tamanho com ID {size_id} não encontrado.")
+
+def create_purchase(db: Session, purchase_data: schemas.PurchaseCreate, purchase_id: Optional[uuid.UUID] = None) -> models.Purchase:
     db_client = db.query(models.Client).filter(models.Client.id == purchase_data.client_id).first()
     if not db_client:
         raise HTTPException(
@@ -15,51 +107,92 @@ def create_purchase(db: Session, purchase_data: schemas.PurchaseCreate) -> model
             detail="Cliente não encontrado."
         )
 
-    total_subtotal = Decimal('0.00')
-    purchase_items = []
+    # Linhas repetidas (mesmo produto, tamanho e preço) viram um único item do pedido.
+    lines: Dict[tuple, int] = {}
+    quantities: Dict[uuid.UUID, int] = {}
+    for item_data in purchase_data.items:
+        key = (item_data.product_id, item_data.size_id, item_data.unit_price_at_purchase)
+        lines[key] = lines.get(key, 0) + item_data.quantity
+        quantities[item_data.product_id] = quantities.get(item_data.product_id, 0) + item_data.quantity
+
+    size_ids = {item_data.size_id for item_data in purchase_data.items}
+    existing_size_ids = reference.sizes.existing_ids(db, size_ids)
+    locked = _lock_products(db, sorted(quantities))
+    sharded = _get_sharded_products(db, [product_id for product_id in quantities if product_id not in locked])
 
     for item_data in purchase_data.items:
-        db_product = db.query(models.Product).filter(models.Product.id == item_data.product_id).first()
-        if not db_product:
+        if item_data.product_id not in locked and item_data.product_id not in sharded:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Produto com ID {item_data.product_id} não encontrado."
             )
-        if db_product.inventory < item_data.quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Estoque insuficiente para o produto {db_product.name}. Disponível: {db_product.inventory}, Solicitado: {item_data.quantity}."
-            )
-        
-        db_size = db.query(models.Size).filter(models.Size.id == item_data.size_id).first()
-        if not db_size:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Tamanho com ID {item_data.size_id} não encontrado."
-            )
-
-        item_total_price = item_data.quantity * item_data.unit_price_at_purchase
-        total_subtotal += item_total_price
-
-        purchase_item = models.PurchaseItem(
-            product_id=item_data.product_id,
-            size_id=item_data.size_id,
-            quantity=item_data.quantity,
-            unit_price_at_purchase=item_data.unit_price_at_purchase,
-            total_price=item_total_price
-        )
-        purchase_items.append(purchase_item)
+        if item_data.size_id not in existing_size_ids:
+            raise _size_not_found(item_data.size_id)
 
-        db_product.inventory -= item_data.quantity
-        db.add(db_product)
+    plain_quantities = {product_id: quantity for product_id, quantity in quantities.items() if product_id in locked}
+    sharded_quantities = {product_id: quantity for product_id, quantity in quantities.items() if product_id in sharded}
+    if sharded_quantities:
+        # Se algum fragmento não tiver estoque, o savepoint desfaz também o que já foi debitado.
+        with db.begin_nested():
+            _reserve_inventory(db, plain_quantities, locked)
+            _reserve_sharded_inventory(db, sharded_quantities, sharded)
+    else:
+        _reserve_inventory(db, plain_quantities, locked)
 
     db_purchase = models.Purchase(
+        id=purchase_id or uuid.uuid4(),
         client_id=purchase_data.client_id,
-        subtotal=total_subtotal,
-        status="pending",
-        items=purchase_items
+        subtotal=sum((quantity * unit_price for (_, _, unit_price), quantity in lines.items()), Decimal('0.00')),
+        status=PurchaseStatus.pending
     )
     db.add(db_purchase)
+    db.flush()
+
+    products = {**locked, **sharded}
+    try:
+        db.execute(insert(models.PurchaseItem).values([
+            {
+                "id": uuid.uuid4(),
+                "purchase_id": db_purchase.id,
+                "product_id": product_id,
+                "size_id": size_id,
+                "quantity": quantity,
+                "unit_price_at_purchase": unit_price,
+                "total_price": quantity * unit_price,
+                "category_id": products[product_id].category_id,
+                "gender_id": products[product_id].gender_id,
+            }
+            for (product_id, size_id, unit_price), quantity in lines.items()
+        ]))
+    except IntegrityError as exc:
+        # Os produtos estão bloqueados; a chave estrangeira que pode falhar é a do tamanho, se ele
+        # foi apagado por outro processo enquanto ainda estava no cache deste (a invalidação entre
+        # processos só acontece pelo TTL). O cache é descartado e os tamanhos relidos do banco.
+        db.rollback()
+        if reference.is_foreign_key_violation(exc):
+            reference.sizes.invalidate()
+            missing = size_ids - reference.sizes.existing_ids(db, size_ids)
+            if missing:
+                raise _size_not_found(min(missing))
+        raise
+
+    revenues: Dict[uuid.UUID, Decimal] = {}
+    for (product_id, _, unit_price), quantity in lines.items():
+        revenues[product_id] = revenues.get(product_id, Decimal('0.00')) + quantity * unit_price
+    rollups.record_sales(db, _sales_day(db_purchase), [
+        (product_id, products[product_id].category_id, products[product_id].gender_id, quantity, revenues[product_id])
+        for product_id, quantity in quantities.items()
+    ])
+    db.execute(
+        update(models.Client)
+        .where(models.Client.id == db_purchase.client_id)
+        .values(
+            order_count=models.Client.order_count + 1,
+            lifetime_value=models.Client.lifetime_value + db_purchase.subtotal,
+            last_order_at=func.greatest(models.Client.last_order_at, db_purchase.created_at)
+        )
+        .execution_options(synchronize_session=False)
+    )
     db.commit()
     db.refresh(db_purchase)
     return db_purchase
@@ -75,36 +208,161 @@ def get_purchases(
     product_section_category_id: Optional[int] = None,
     product_section_gender_id: Optional[int] = None
 ) -> List[models.Purchase]:
-    query = db.query(models.Purchase).options(joinedload(models.Purchase.items).joinedload(models.PurchaseItem.product_rel))
+    """
+    Lista pedidos com uma subconsulta que seleciona apenas os IDs da página (os filtros de
+    categoria/gênero viram um semi-join `EXISTS`, sem multiplicar as linhas do pedido); só os
+    pedidos da página são carregados, com itens e produtos no mesmo `JOIN`.
+    Os pedidos são ordenados do mais recente para o mais antigo, para que a paginação seja estável.
+    """
+    ordering = (models.Purchase.created_at.desc(), models.Purchase.id.desc())
+    page = select(models.Purchase.id)
 
     if client_id:
-        query = query.filter(models.Purchase.client_id == client_id)
+        page = page.where(models.Purchase.client_id == client_id)
     if status:
-        query = query.filter(models.Purchase.status == status)
+        page = page.where(models.Purchase.status == status)
     if start_date:
-        query = query.filter(models.Purchase.created_at >= start_date)
+        page = page.where(models.Purchase.created_at >= start_date)
     if end_date:
-        query = query.filter(models.Purchase.created_at <= end_date)
-    
+        page = page.where(models.Purchase.created_at <= end_date)
+
     if product_section_category_id or product_section_gender_id:
-        query = query.join(models.Purchase.items).join(models.PurchaseItem.product_rel)
+        # O filtro da seção fica dentro do semi-join, junto com o produto do item: nada de trazer
+        # os IDs dos produtos para a aplicação e devolvê-los em uma lista `IN` sem limite.
+        section_filters = []
         if product_section_category_id:
-            query = query.filter(models.Product.category_id == product_section_category_id)
+            section_filters.append(models.Product.category_id == product_section_category_id)
         if product_section_gender_id:
-            query = query.filter(models.Product.gender_id == product_section_gender_id)
-        query = query.distinct()
+            section_filters.append(models.Product.gender_id == product_section_gender_id)
+        # Seção sem produtos: uma sondagem barata evita varrer os pedidos à toa.
+        if not db.scalar(select(exists().where(*section_filters))):
+            return []
+        page = page.where(exists().where(
+            models.PurchaseItem.purchase_id == models.Purchase.id,
+            models.PurchaseItem.product_id == models.Product.id,
+            *section_filters
+        ))
 
-    return query.offset(skip).limit(limit).all()
+    page = page.order_by(*ordering).offset(skip).limit(limit)
+    return (
+        db.query(models.Purchase)
+        .options(joinedload(models.Purchase.items).joinedload(models.PurchaseItem.product_rel))
+        .filter(models.Purchase.id.in_(page.scalar_subquery()))
+        .order_by(*ordering)
+        .all()
+    )
 
 def get_purchase(db: Session, purchase_id: uuid.UUID) -> Optional[models.Purchase]:
     return db.query(models.Purchase).options(joinedload(models.Purchase.items).joinedload(models.PurchaseItem.product_rel)).filter(models.Purchase.id == purchase_id).first()
 
+def get_purchase_etag(db: Session, purchase_id: uuid.UUID) -> Optional[str]:
+    updated_at = db.query(models.Purchase.updated_at).filter(models.Purchase.id == purchase_id).scalar()
+    if updated_at is None:
+        return None
+    return make_etag("purchase", purchase_id, updated_at)
+
+def _lock_purchase(db: Session, purchase_id: uuid.UUID) -> Optional[models.Purchase]:
+    return db.query(models.Purchase).filter(models.Purchase.id == purchase_id).with_for_update().first()
+
+def _sales_day(db_purchase: models.Purchase):
+    return db_purchase.created_at.astimezone(timezone.utc).date()
+
+def _restock_purchase_items(db: Session, db_purchase: models.Purchase) -> None:
+    """
+    Devolve ao estoque todos os itens do pedido com um único `UPDATE ... FROM (VALUES ...)`
+    e estorna as vendas do pedido nos agregados diários, com a categoria e o gênero gravados nos
+    itens na venda (os mesmos usados nos deltas originais).
+    Os produtos são bloqueados na mesma ordem usada por `create_purchase`, evitando deadlocks
+    com compras concorrentes dos mesmos produtos. Produtos com estoque fragmentado recebem
+    a devolução no fragmento com menos estoque.
+    """
+    sold = db.execute(
+        select(
+            models.PurchaseItem.product_id, models.PurchaseItem.category_id, models.PurchaseItem.gender_id,
+            func.sum(models.PurchaseItem.quantity), func.sum(models.PurchaseItem.total_price)
+        )
+        .where(models.PurchaseItem.purchase_id == db_purchase.id)
+        .group_by(models.PurchaseItem.product_id, models.PurchaseItem.category_id, models.PurchaseItem.gender_id)
+    ).all()
+    if not sold:
+        return
+    rollups.record_sales(db, _sales_day(db_purchase), sold, sign=-1)
+    quantities = {row[0]: row[3] for row in sold}
+
+    locked = _lock_products(db, sorted(quantities))
+    inventory.restock_shards(db, {
+        product_id: quantity for product_id, quantity in quantities.items() if product_id not in locked
+    })
+    if not locked:
+        return
+
+    restocked = values(
+        column("product_id", UUID(as_uuid=True)), column("quantity", Integer), name="restocked"
+    ).data([(product_id, quantities[product_id]) for product_id in sorted(locked)])
+    db.execute(
+        update(models.Product)
+        .where(models.Product.id == restocked.c.product_id)
+        .values(inventory=models.Product.inventory + restocked.c.quantity)
+        .execution_options(synchronize_session=False)
+    )
+
+def _revert_client_totals(db: Session, db_purchase: models.Purchase) -> None:
+    """Remove o pedido dos agregados do cliente; a data do último pedido é recalculada pelo índice (client_id, created_at)."""
+    last_order_at = (
+        select(func.max(models.Purchase.created_at))
+        .where(
+            models.Purchase.client_id == db_purchase.client_id,
+            models.Purchase.status != CANCELLED_STATUS,
+            models.Purchase.id != db_purchase.id
+        )
+        .scalar_subquery()
+    )
+    db.execute(
+        update(models.Client)
+        .where(models.Client.id == db_purchase.client_id)
+        .values(
+            order_count=models.Client.order_count - 1,
+            lifetime_value=models.Client.lifetime_value - db_purchase.subtotal,
+            last_order_at=last_order_at
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+def _revert_purchase(db: Session, db_purchase: models.Purchase) -> None:
+    _restock_purchase_items(db, db_purchase)
+    _revert_client_totals(db, db_purchase)
+
+def _ensure_cancellable(db_purchase: models.Purchase) -> None:
+    if db_purchase.status == CANCELLED_STATUS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pedido já está cancelado."
+        )
+    if not can_transition(db_purchase.status, CANCELLED_STATUS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Pedido com status '{db_purchase.status.value}' não pode ser cancelado."
+        )
+
+def _transition_error(current: PurchaseStatus, new: PurchaseStatus) -> str:
+    return f"Transição de status inválida: '{current.value}' para '{new.value}'."
+
 def update_purchase(db: Session, purchase_id: uuid.UUID, purchase_data: schemas.PurchaseUpdate) -> Optional[models.Purchase]:
-    db_purchase = get_purchase(db, purchase_id)
+    db_purchase = _lock_purchase(db, purchase_id)
     if not db_purchase:
         return None
 
     update_data = purchase_data.model_dump(exclude_unset=True)
+    new_status = update_data.get("status")
+
+    if new_status == CANCELLED_STATUS:
+        _ensure_cancellable(db_purchase)
+        _revert_purchase(db, db_purchase)
+    elif new_status is not None and new_status != db_purchase.status and not can_transition(db_purchase.status, new_status):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=_transition_error(db_purchase.status, new_status)
+        )
 
     for key, value in update_data.items():
         setattr(db_purchase, key, value)
@@ -114,16 +372,77 @@ def update_purchase(db: Session, purchase_id: uuid.UUID, purchase_data: schemas.
     db.refresh(db_purchase)
     return db_purchase
 
+def bulk_update_status(
+    db: Session,
+    purchase_ids: List[uuid.UUID],
+    new_status: PurchaseStatus
+) -> Tuple[List[uuid.UUID], List[dict]]:
+    """
+    Aplica a mesma transição de status a vários pedidos com um único
+    `UPDATE ... WHERE id = ANY(...) AND status IN (...) RETURNING id`: só mudam os pedidos cujo
+    status atual permite a transição. Retorna os IDs atualizados e os rejeitados, com o motivo.
+    Cancelamentos não passam por aqui, pois precisam devolver o estoque de cada pedido.
+    """
+    if new_status == CANCELLED_STATUS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cancelamentos devem usar /purchases/cancel/{purchase_id}, que devolve o estoque."
+        )
+
+    requested = list(dict.fromkeys(purchase_ids))
+    updated_ids = set(db.scalars(
+        update(models.Purchase)
+        .where(
+            models.Purchase.id == any_(bindparam("purchase_ids", requested, type_=ARRAY(UUID(as_uuid=True)))),
+            models.Purchase.status.in_(allowed_sources(new_status))
+        )
+        .values(status=new_status, updated_at=models.utcnow())
+        .returning(models.Purchase.id)
+        .execution_options(synchronize_session=False)
+    ).all())
+
+    updated = [purchase_id for purchase_id in requested if purchase_id in updated_ids]
+    rejected = []
+    remaining = set(requested) - updated_ids
+    if remaining:
+        current = dict(db.execute(
+            select(models.Purchase.id, models.Purchase.status).where(models.Purchase.id.in_(remaining))
+        ).all())
+        for purchase_id in requested:
+            if purchase_id not in remaining:
+                continue
+            if purchase_id not in current:
+                rejected.append({"purchase_id": purchase_id, "current_status": None, "detail": "Pedido não encontrado"})
+            elif current[purchase_id] == new_status:
+                rejected.append({"purchase_id": purchase_id, "current_status": new_status, "detail": f"Pedido já está com status '{new_status.value}'."})
+            else:
+                rejected.append({"purchase_id": purchase_id, "current_status": current[purchase_id], "detail": _transition_error(current[purchase_id], new_status)})
+
+    db.commit()
+    return updated, rejected
+
+def cancel_purchase(db: Session, purchase_id: uuid.UUID) -> Optional[models.Purchase]:
+    db_purchase = _lock_purchase(db, purchase_id)
+    if not db_purchase:
+        return None
+
+    _ensure_cancellable(db_purchase)
+    _revert_purchase(db, db_purchase)
+    db_purchase.status = CANCELLED_STATUS
+
+    db.add(db_purchase)
+    db.commit()
+    db.refresh(db_purchase)
+    return db_purchase
+
 def delete_purchase(db: Session, purchase_id: uuid.UUID) -> bool:
-    db_purchase = get_purchase(db, purchase_id)
+    db_purchase = _lock_purchase(db, purchase_id)
     if not db_purchase:
         return False
-    
-    for item in db_purchase.items:
-        db_product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-        if db_product:
-            db_product.inventory += item.quantity
-            db.add(db_product)
+
+    # Pedidos cancelados já tiveram o estoque devolvido.
+    if db_purchase.status != CANCELLED_STATUS:
+        _revert_purchase(db, db_purchase)
 
     db.delete(db_purchase)
     db.commit()
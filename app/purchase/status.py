@@ -0,0 +1,32 @@
+import enum
+from typing import Dict, FrozenSet, List
+
+
+class PurchaseStatus(str, enum.Enum):
+    """Status de um pedido, gravado no banco como o tipo enum `purchase_status`."""
+
+    pending = "pending"
+    paid = "paid"
+    shipped = "shipped"
+    delivered = "delivered"
+    cancelled = "cancelled"
+
+
+# Transições permitidas a partir de cada status. Pedidos entregues ou cancelados são finais:
+# reabrir um pedido cancelado exigiria reservar o estoque novamente.
+TRANSITIONS: Dict[PurchaseStatus, FrozenSet[PurchaseStatus]] = {
+    PurchaseStatus.pending: frozenset({PurchaseStatus.paid, PurchaseStatus.shipped, PurchaseStatus.cancelled}),
+    PurchaseStatus.paid: frozenset({PurchaseStatus.shipped, PurchaseStatus.cancelled}),
+    PurchaseStatus.shipped: frozenset({PurchaseStatus.delivered}),
+    PurchaseStatus.delivered: frozenset(),
+    PurchaseStatus.cancelled: frozenset(),
+}
+
+
+def can_transition(current: PurchaseStatus, new: PurchaseStatus) -> bool:
+    return new in TRANSITIONS[PurchaseStatus(current)]
+
+
+def allowed_sources(new: PurchaseStatus) -> List[PurchaseStatus]:
+    """Status a partir dos quais um pedido pode passar para `new`."""
+    return [current for current, targets in TRANSITIONS.items() if new in targets]
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from app.database.connection import get_db
+from app.reference import schemas, services
+from app.core.config import get_settings
+from app.core.etag import etag_matches
+
+router = APIRouter(
+    prefix="/reference",
+    tags=["Dados de Referência"],
+)
+
+@router.get(
+    "",
+    response_class=Response,
+    summary="Retorna tamanhos, categorias e gêneros em uma única chamada.",
+    responses={
+        status.HTTP_200_OK: {
+            "description": "Dados de referência e a versão do conteúdo.",
+            "model": schemas.ReferenceResponse,
+            "content": {"application/json": {"example": schemas.ReferenceResponse.model_config['json_schema_extra']['example']}}
+        },
+        status.HTTP_304_NOT_MODIFIED: {"description": "O cliente já possui a versão atual (`If-None-Match`)."}
+    }
+)
+def read_reference_route(
+    request: Request,
+    v: Optional[str] = Query(None, description="Versão já conhecida pelo cliente (campo `version`). Se for a atual, a resposta pode ser guardada indefinidamente."),
+    db: Session = Depends(get_db)
+):
+    """
+    Carga inicial dos frontends: todos os tamanhos, categorias e gêneros, pré-serializados a partir
+    do cache de dados de referência, com `ETag` e `Cache-Control`.
+    - **Regras de negócio**:
+        - Público: não exige autenticação, para poder ser guardado por CDNs e navegadores.
+        - Sem `v`, ou com uma versão antiga, o cache vale por `REFERENCE_CACHE_TTL_SECONDS` e depois é revalidado com `If-None-Match`.
+        - Com `v` igual à versão atual, a resposta é imutável (`max-age` de um ano).
+    - **Casos de uso**:
+        - Inicialização da loja virtual e do painel administrativo.
+    """
+    payload = services.get_reference_payload(db)
+    if v == payload.version:
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        cache_control = f"public, max-age={int(get_settings().REFERENCE_CACHE_TTL_SECONDS)}, must-revalidate"
+    headers = {"ETag": payload.etag, "Cache-Control": cache_control}
+    if etag_matches(request, payload.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=payload.body, media_type="application/json", headers=headers)
@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field, ConfigDict
+from typing import List
+from app.size.schemas import SizeResponse
+from app.category.schemas import CategoryResponse
+from app.gender.schemas import GenderResponse
+
+class ReferenceResponse(BaseModel):
+    version: str = Field(description="Hash do conteúdo de tamanhos, categorias e gêneros. Muda sempre que alguma das três tabelas muda.")
+    sizes: List[SizeResponse] = Field(description="Todos os tamanhos, ordenados por ID.")
+    categories: List[CategoryResponse] = Field(description="Todas as categorias, ordenadas por ID.")
+    genders: List[GenderResponse] = Field(description="Todos os gêneros, ordenados por ID.")
+
+    model_config = ConfigDict(
+        json_schema_extra = {
+            "example": {
+                "version": "3f1d2c4b5a69788796a5b4c3d2e1f00112233445",
+                "sizes": [SizeResponse.model_config['json_schema_extra']['example']],
+                "categories": [CategoryResponse.model_config['json_schema_extra']['example']],
+                "genders": [GenderResponse.model_config['json_schema_extra']['example']]
+            }
+        }
+    )
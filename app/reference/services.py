@@ -0,0 +1,47 @@
+import threading
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core import reference
+from app.core.etag import make_etag
+from app.reference import schemas
+
+
+@dataclass(frozen=True)
+class ReferencePayload:
+    versions: Tuple[str, ...]
+    version: str
+    etag: str
+    body: bytes
+
+
+_payload: Optional[ReferencePayload] = None
+_lock = threading.Lock()
+
+
+def get_reference_payload(db: Session) -> ReferencePayload:
+    """
+    Retorna tamanhos, categorias e gêneros já serializados em JSON, junto com a versão do conteúdo.
+    O corpo só é gerado de novo quando a versão de alguma das três tabelas no cache muda;
+    nas demais chamadas nenhuma consulta nem serialização é feita.
+    """
+    global _payload
+    snapshots = [repository.snapshot(db) for repository in reference.REPOSITORIES]
+    versions = tuple(snapshot.version for snapshot in snapshots)
+    payload = _payload
+    if payload is not None and payload.versions == versions:
+        return payload
+
+    with _lock:
+        if _payload is not None and _payload.versions == versions:
+            return _payload
+        etag = make_etag("reference", *versions)
+        version = etag.strip('"')
+        sizes, categories, genders = (snapshot.rows for snapshot in snapshots)
+        body = schemas.ReferenceResponse(
+            version=version, sizes=sizes, categories=categories, genders=genders
+        ).model_dump_json().encode("utf-8")
+        _payload = ReferencePayload(versions=versions, version=version, etag=etag, body=body)
+        return _payload
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional, Annotated
 
@@ -6,6 +6,7 @@ from app.database.connection import get_db
 from app.size import schemas, services
 from app.database import models
 from app.core.dependencies import get_current_active_user, get_current_admin_user
+from app.core.etag import check_etag
 from app.size.schemas import MessageResponse as SizeMessageResponse
 
 router = APIRouter(
@@ -59,6 +60,8 @@ def create_size_route(
     }
 )
 def read_sizes_route(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0, description="Número de registros a pular."),
     limit: int = Query(100, ge=1, le=100, description="Número máximo de registros."),
     db: Session = Depends(get_db),
@@ -69,6 +72,9 @@ def read_sizes_route(
     - **Regras de negócio**: Requer auth.
     - **Casos de uso**: Preencher seleção de tamanho. Listar em painel admin. Filtro de cliente.
     """
+    not_modified = check_etag(request, response, services.get_sizes_etag(db, skip=skip, limit=limit))
+    if not_modified:
+        return not_modified
     return services.get_sizes(db, skip=skip, limit=limit)
 
 @router.get(
@@ -85,6 +91,8 @@ def read_sizes_route(
 )
 def read_size_route(
     size_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: Annotated[models.User, Depends(get_current_active_user)] = None
 ):
@@ -93,7 +101,13 @@ def read_size_route(
     - **Regras de negócio**: Tamanho deve existir. Requer auth.
     - **Casos de uso**: Exibir detalhes ao editar produto.
     """
-    db_size = services.get_size(db, size_id)
+    etag = services.get_size_etag(db, size_id)
+    if etag is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tamanho não encontrado")
+    not_modified = check_etag(request, response, etag)
+    if not_modified:
+        return not_modified
+    db_size = services.get_cached_size(db, size_id)
     if db_size is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tamanho não encontrado")
     return db_size
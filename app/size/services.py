@@ -2,7 +2,9 @@ from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from app.database import models
 from app.size import schemas
-from typing import List, Optional
+from typing import Any, Optional, Tuple
+from app.core.etag import make_etag
+from app.core import reference
 
 def get_size_by_name(db: Session, name: str) -> Optional[models.Size]:
     return db.query(models.Size).filter(models.Size.name == name).first()
@@ -20,6 +22,7 @@ def create_size(db: Session, size_data: schemas.SizeCreate) -> models.Size:
     )
     db.add(db_size)
     db.commit()
+    reference.sizes.invalidate()
     db.refresh(db_size)
     return db_size
 
@@ -27,12 +30,24 @@ def get_sizes(
     db: Session,
     skip: int = 0,
     limit: int = 100
-) -> List[models.Size]:
-    return db.query(models.Size).offset(skip).limit(limit).all()
+) -> Tuple[Any, ...]:
+    return reference.sizes.all(db)[skip:skip + limit]
 
 def get_size(db: Session, size_id: int) -> Optional[models.Size]:
     return db.query(models.Size).filter(models.Size.id == size_id).first()
 
+def get_cached_size(db: Session, size_id: int) -> Optional[Any]:
+    return reference.sizes.get(db, size_id)
+
+def get_sizes_etag(db: Session, skip: int = 0, limit: int = 100) -> str:
+    return make_etag("sizes", reference.sizes.snapshot(db).version, skip, limit)
+
+def get_size_etag(db: Session, size_id: int) -> Optional[str]:
+    row = reference.sizes.get(db, size_id)
+    if row is None:
+        return None
+    return make_etag("size", size_id, row.updated_at)
+
 def update_size(db: Session, size_id: int, size_data: schemas.SizeUpdate) -> Optional[models.Size]:
     db_size = get_size(db, size_id)
     if not db_size:
@@ -52,6 +67,7 @@ def update_size(db: Session, size_id: int, size_data: schemas.SizeUpdate) -> Opt
 
     db.add(db_size)
     db.commit()
+    reference.sizes.invalidate()
     db.refresh(db_size)
     return db_size
 
@@ -61,5 +77,6 @@ def delete_size(db: Session, size_id: int) -> bool:
         return False
     db.delete(db_size)
     db.commit()
+    reference.sizes.invalidate()
     return True
 
@@ -0,0 +1,18 @@
+import multiprocessing
+import os
+
+# Uso: gunicorn app.main:app -c gunicorn.conf.py
+# A aplicação é importada uma vez no processo mestre e os workers a herdam via fork (cópia sob
+# escrita). O engine do banco é criado em cada worker no primeiro uso, e um pool herdado do
+# mestre é descartado logo após o fork (ver app/database/connection.py).
+preload_app = True
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+
+def child_exit(server, worker):
+    # Métricas em modo multiprocesso (PROMETHEUS_MULTIPROC_DIR): descarta os gauges do worker encerrado.
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,30 @@
+"""Cria estatísticas estendidas de categoria e gênero do produto
+
+Revision ID: 0b7e3c5a9d14
+Revises: f61b2d8e4c93
+Create Date: 2026-10-19 21:04:52.613027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b7e3c5a9d14'
+down_revision: Union[str, None] = 'f61b2d8e4c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Categoria e gênero são correlacionados (uma seção costuma ter um só gênero). Sem estas
+    # estatísticas o planejador multiplica as seletividades, subestima os produtos da seção e
+    # escolhe um plano paralelo caro para a listagem de pedidos filtrada pelos dois.
+    op.execute('CREATE STATISTICS st_products_category_gender (dependencies) ON category_id, gender_id FROM products')
+    op.execute('ANALYZE products')
+
+
+def downgrade() -> None:
+    op.execute('DROP STATISTICS IF EXISTS st_products_category_gender')
@@ -0,0 +1,40 @@
+"""Adiciona fragmentos de estoque para produtos de alta demanda
+
+Revision ID: 3f7a2c91e5b4
+Revises: 9c1e4b7d2a30
+Create Date: 2026-10-19 11:02:17.530482
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f7a2c91e5b4'
+down_revision: Union[str, None] = '9c1e4b7d2a30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('inventory_shard_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('product_inventory_shards',
+    sa.Column('product_id', sa.UUID(), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('inventory', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('product_id', 'shard')
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        "UPDATE products SET inventory = totals.inventory "
+        "FROM (SELECT product_id, sum(inventory) AS inventory FROM product_inventory_shards GROUP BY product_id) totals "
+        "WHERE products.id = totals.product_id AND products.inventory_shard_count > 0"
+    )
+    op.drop_table('product_inventory_shards')
+    op.drop_column('products', 'inventory_shard_count')
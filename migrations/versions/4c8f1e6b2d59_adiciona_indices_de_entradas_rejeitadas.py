@@ -0,0 +1,28 @@
+"""Adiciona índices das entradas rejeitadas e em dead letter
+
+Revision ID: 4c8f1e6b2d59
+Revises: 8e5d2a7c0f36
+Create Date: 2026-10-19 22:05:41.870334
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c8f1e6b2d59'
+down_revision: Union[str, None] = '8e5d2a7c0f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_purchase_intake_rejected', 'purchase_intake', ['processed_at'], unique=False, postgresql_where=sa.text("status = 'rejected'"))
+    op.create_index('ix_purchase_intake_dead_letter', 'purchase_intake', ['processed_at'], unique=False, postgresql_where=sa.text("status = 'dead_letter'"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_purchase_intake_dead_letter', table_name='purchase_intake', postgresql_where=sa.text("status = 'dead_letter'"))
+    op.drop_index('ix_purchase_intake_rejected', table_name='purchase_intake', postgresql_where=sa.text("status = 'rejected'"))
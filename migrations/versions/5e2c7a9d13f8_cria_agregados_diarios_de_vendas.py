@@ -0,0 +1,68 @@
+"""Cria agregados diários de vendas
+
+Revision ID: 5e2c7a9d13f8
+Revises: b81d0e4f6a27
+Create Date: 2026-10-19 15:21:48.903117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2c7a9d13f8'
+down_revision: Union[str, None] = 'b81d0e4f6a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('sales_daily',
+    sa.Column('dimension', sa.String(length=10), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('dimension_key', sa.String(length=36), nullable=False),
+    sa.Column('quantity', sa.BigInteger(), nullable=False),
+    sa.Column('revenue', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('order_count', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('dimension', 'day', 'dimension_key')
+    )
+    op.create_table('sales_daily_deltas',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('dimension', sa.String(length=10), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('dimension_key', sa.String(length=36), nullable=False),
+    sa.Column('quantity', sa.BigInteger(), nullable=False),
+    sa.Column('revenue', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('order_count', sa.BigInteger(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_sales_daily_deltas_dimension_day', 'sales_daily_deltas', ['dimension', 'day'], unique=False)
+
+    # Carga inicial a partir dos pedidos existentes.
+    op.execute("""
+    INSERT INTO sales_daily (dimension, day, dimension_key, quantity, revenue, order_count, updated_at)
+    SELECT d.dimension, sales.day, d.dimension_key, sum(sales.quantity), sum(sales.total_price),
+           count(DISTINCT sales.purchase_id), now()
+    FROM (
+        SELECT (p.created_at AT TIME ZONE 'UTC')::date AS day, i.purchase_id, i.quantity, i.total_price,
+               pr.id::text AS product_key, pr.category_id::text AS category_key, pr.gender_id::text AS gender_key
+        FROM purchase_items i
+        JOIN purchases p ON p.id = i.purchase_id
+        JOIN products pr ON pr.id = i.product_id
+        WHERE p.status <> 'cancelled'
+    ) AS sales
+    CROSS JOIN LATERAL (VALUES
+        ('total', 'all'), ('product', sales.product_key), ('category', sales.category_key), ('gender', sales.gender_key)
+    ) AS d(dimension, dimension_key)
+    GROUP BY d.dimension, sales.day, d.dimension_key
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sales_daily_deltas_dimension_day', table_name='sales_daily_deltas')
+    op.drop_table('sales_daily_deltas')
+    op.drop_table('sales_daily')
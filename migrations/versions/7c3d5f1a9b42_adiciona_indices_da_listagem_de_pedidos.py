@@ -0,0 +1,30 @@
+"""Adiciona índices da listagem de pedidos
+
+Revision ID: 7c3d5f1a9b42
+Revises: e4a91c3b7d52
+Create Date: 2026-10-19 17:02:11.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3d5f1a9b42'
+down_revision: Union[str, None] = 'e4a91c3b7d52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_purchases_created_at_id', 'purchases', ['created_at', 'id'], unique=False)
+    op.create_index('ix_purchase_items_purchase_id_product_id', 'purchase_items', ['purchase_id', 'product_id'], unique=False)
+    op.create_index('ix_purchase_items_product_id', 'purchase_items', ['product_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_purchase_items_product_id', table_name='purchase_items')
+    op.drop_index('ix_purchase_items_purchase_id_product_id', table_name='purchase_items')
+    op.drop_index('ix_purchases_created_at_id', table_name='purchases')
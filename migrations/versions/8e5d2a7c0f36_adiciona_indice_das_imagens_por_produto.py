@@ -0,0 +1,26 @@
+"""Adiciona índice das imagens por produto
+
+Revision ID: 8e5d2a7c0f36
+Revises: 0b7e3c5a9d14
+Create Date: 2026-10-19 21:38:16.402719
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e5d2a7c0f36'
+down_revision: Union[str, None] = '0b7e3c5a9d14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_product_images_product_id', 'product_images', ['product_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_images_product_id', table_name='product_images')
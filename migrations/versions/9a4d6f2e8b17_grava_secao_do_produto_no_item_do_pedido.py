@@ -0,0 +1,36 @@
+"""Grava a categoria e o gênero do produto no item do pedido
+
+Revision ID: 9a4d6f2e8b17
+Revises: 4c8f1e6b2d59
+Create Date: 2026-10-19 22:41:09.157482
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4d6f2e8b17'
+down_revision: Union[str, None] = '4c8f1e6b2d59'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('purchase_items', sa.Column('category_id', sa.Integer(), nullable=True))
+    op.add_column('purchase_items', sa.Column('gender_id', sa.Integer(), nullable=True))
+    # Itens antigos recebem a seção atual do produto: é a mesma que os agregados de vendas usaram
+    # até aqui (tanto nos deltas quanto na reconstrução a partir dos itens).
+    op.execute(
+        'UPDATE purchase_items SET category_id = products.category_id, gender_id = products.gender_id '
+        'FROM products WHERE products.id = purchase_items.product_id'
+    )
+    op.alter_column('purchase_items', 'category_id', nullable=False)
+    op.alter_column('purchase_items', 'gender_id', nullable=False)
+
+
+def downgrade() -> None:
+    op.drop_column('purchase_items', 'gender_id')
+    op.drop_column('purchase_items', 'category_id')
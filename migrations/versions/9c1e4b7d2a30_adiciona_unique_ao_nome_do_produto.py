@@ -0,0 +1,26 @@
+"""Adiciona restrição única ao nome do produto
+
+Revision ID: 9c1e4b7d2a30
+Revises: 854f32a87698
+Create Date: 2026-10-19 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c1e4b7d2a30'
+down_revision: Union[str, None] = '854f32a87698'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_unique_constraint('products_name_key', 'products', ['name'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('products_name_key', 'products', type_='unique')
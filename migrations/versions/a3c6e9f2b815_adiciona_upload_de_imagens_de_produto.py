@@ -0,0 +1,36 @@
+"""Adiciona upload de imagens de produto
+
+Revision ID: a3c6e9f2b815
+Revises: d2f84a6c1e07
+Create Date: 2026-10-19 19:26:51.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c6e9f2b815'
+down_revision: Union[str, None] = 'd2f84a6c1e07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('product_images', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('product_images', sa.Column('content_type', sa.String(length=50), nullable=True))
+    op.add_column('product_images', sa.Column('byte_size', sa.Integer(), nullable=True))
+    op.add_column('product_images', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('product_images', sa.Column('height', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_product_images_content_hash'), 'product_images', ['content_hash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_product_images_content_hash'), table_name='product_images')
+    op.drop_column('product_images', 'height')
+    op.drop_column('product_images', 'width')
+    op.drop_column('product_images', 'byte_size')
+    op.drop_column('product_images', 'content_type')
+    op.drop_column('product_images', 'content_hash')
@@ -0,0 +1,45 @@
+"""Cria fila de entrada de pedidos
+
+Revision ID: b81d0e4f6a27
+Revises: 3f7a2c91e5b4
+Create Date: 2026-10-19 13:40:05.284913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81d0e4f6a27'
+down_revision: Union[str, None] = '3f7a2c91e5b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('purchase_intake',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('available_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('locked_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_purchase_intake_queued', 'purchase_intake', ['available_at'], unique=False, postgresql_where=sa.text("status = 'queued'"))
+    op.create_index('ix_purchase_intake_processing', 'purchase_intake', ['locked_at'], unique=False, postgresql_where=sa.text("status = 'processing'"))
+    op.create_index('ix_purchase_intake_done', 'purchase_intake', ['processed_at'], unique=False, postgresql_where=sa.text("status = 'done'"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_purchase_intake_done', table_name='purchase_intake', postgresql_where=sa.text("status = 'done'"))
+    op.drop_index('ix_purchase_intake_processing', table_name='purchase_intake', postgresql_where=sa.text("status = 'processing'"))
+    op.drop_index('ix_purchase_intake_queued', table_name='purchase_intake', postgresql_where=sa.text("status = 'queued'"))
+    op.drop_table('purchase_intake')
@@ -0,0 +1,51 @@
+"""Converte status do pedido para enum
+
+Revision ID: d2f84a6c1e07
+Revises: 7c3d5f1a9b42
+Create Date: 2026-10-19 18:10:37.552904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f84a6c1e07'
+down_revision: Union[str, None] = '7c3d5f1a9b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STATUSES = ('pending', 'paid', 'shipped', 'delivered', 'cancelled')
+purchase_status = postgresql.ENUM(*STATUSES, name='purchase_status')
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    op.execute("UPDATE purchases SET status = lower(trim(status)) WHERE status <> lower(trim(status))")
+    invalid = bind.execute(
+        sa.text("SELECT DISTINCT status FROM purchases WHERE NOT (status = ANY(:statuses))"),
+        {"statuses": list(STATUSES)}
+    ).scalars().all()
+    if invalid:
+        raise RuntimeError(f"Pedidos com status fora de {STATUSES}: {invalid}. Corrija-os antes de aplicar esta migração.")
+
+    purchase_status.create(bind)
+    op.alter_column('purchases', 'status',
+               existing_type=sa.String(length=50),
+               type_=purchase_status,
+               existing_nullable=False,
+               postgresql_using='status::purchase_status')
+    op.create_index('ix_purchases_status_created_at', 'purchases', ['status', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_purchases_status_created_at', table_name='purchases')
+    op.alter_column('purchases', 'status',
+               existing_type=purchase_status,
+               type_=sa.String(length=50),
+               existing_nullable=False,
+               postgresql_using='status::text')
+    purchase_status.drop(op.get_bind())
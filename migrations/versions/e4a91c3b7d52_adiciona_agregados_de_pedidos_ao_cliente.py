@@ -0,0 +1,53 @@
+"""Adiciona agregados de pedidos ao cliente
+
+Revision ID: e4a91c3b7d52
+Revises: 5e2c7a9d13f8
+Create Date: 2026-10-19 16:48:12.615370
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a91c3b7d52'
+down_revision: Union[str, None] = '5e2c7a9d13f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('clients', sa.Column('order_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('clients', sa.Column('lifetime_value', sa.Numeric(precision=14, scale=2), server_default='0', nullable=False))
+    op.add_column('clients', sa.Column('last_order_at', sa.DateTime(timezone=True), nullable=True))
+
+    op.execute("""
+    UPDATE clients
+    SET order_count = totals.order_count,
+        lifetime_value = totals.lifetime_value,
+        last_order_at = totals.last_order_at
+    FROM (
+        SELECT client_id, count(*) AS order_count, sum(subtotal) AS lifetime_value, max(created_at) AS last_order_at
+        FROM purchases
+        WHERE status <> 'cancelled'
+        GROUP BY client_id
+    ) AS totals
+    WHERE clients.id = totals.client_id
+    """)
+
+    op.create_index('ix_clients_lifetime_value', 'clients', ['lifetime_value'], unique=False)
+    op.create_index('ix_clients_order_count', 'clients', ['order_count'], unique=False)
+    op.create_index('ix_clients_last_order_at', 'clients', ['last_order_at'], unique=False)
+    op.create_index('ix_purchases_client_id_created_at', 'purchases', ['client_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_purchases_client_id_created_at', table_name='purchases')
+    op.drop_index('ix_clients_last_order_at', table_name='clients')
+    op.drop_index('ix_clients_order_count', table_name='clients')
+    op.drop_index('ix_clients_lifetime_value', table_name='clients')
+    op.drop_column('clients', 'last_order_at')
+    op.drop_column('clients', 'lifetime_value')
+    op.drop_column('clients', 'order_count')
@@ -0,0 +1,26 @@
+"""Adiciona índice da imagem principal do produto
+
+Revision ID: f61b2d8e4c93
+Revises: a3c6e9f2b815
+Create Date: 2026-10-19 19:12:37.205814
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f61b2d8e4c93'
+down_revision: Union[str, None] = 'a3c6e9f2b815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_product_images_main', 'product_images', ['product_id'], unique=False, postgresql_where=sa.text('is_main'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_images_main', table_name='product_images', postgresql_where=sa.text('is_main'))
@@ -13,6 +13,7 @@ sys.path.insert(0, PROJECT_ROOT)
 from app.main import app
 from app.database.connection import Base, get_db
 from app.core.config import get_settings
+from app.core import reference
 
 if os.path.exists(os.path.join(PROJECT_ROOT, ".env.test")):
     load_dotenv(os.path.join(PROJECT_ROOT, ".env.test"))
@@ -67,6 +68,17 @@ def create_test_database_tables():
         raise
 
 
+@pytest.fixture(scope="function", autouse=True)
+def clear_reference_cache():
+    """
+    O cache de tamanhos, categorias e gêneros é global ao processo, mas os dados de cada teste
+    são revertidos ao final: o cache é esvaziado antes e depois de cada teste.
+    """
+    reference.invalidate_all()
+    yield
+    reference.invalidate_all()
+
+
 @pytest.fixture(scope="function")
 def db_session(create_test_database_tables) -> SQLAlchemySession:
     """
@@ -100,6 +112,16 @@ def db_session(create_test_database_tables) -> SQLAlchemySession:
             del app.dependency_overrides[get_db]
 
 
+@pytest.fixture(scope="function")
+def session_factory(create_test_database_tables):
+    """
+    Fixture que fornece a fábrica de sessões do banco de teste, sem transação externa.
+    Usada em testes de concorrência, em que cada thread precisa de sua própria conexão
+    e os dados precisam estar de fato commitados. O teste é responsável pela limpeza.
+    """
+    return TestingSessionLocal
+
+
 @pytest.fixture(scope="session")
 def client(create_test_database_tables) -> TestClient:
     """
@@ -0,0 +1,84 @@
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware, choose_encoding
+
+PAYLOAD = [{"id": index, "name": f"Produto {index}", "description": "Descrição repetida " * 5} for index in range(50)]
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500, media_types=["application/json"], cache_entries=4)
+
+    @app.get("/large")
+    async def large(response: Response):
+        response.headers["ETag"] = '"v1"'
+        return PAYLOAD
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/binary")
+    async def binary():
+        return Response(content=b"\x00" * 5000, media_type="image/png")
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse((b'{"chunk": "' + b"x" * 1000 + b'"}\n' for _ in range(5)), media_type="application/json")
+
+    return app
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate, br") == "br"
+    assert choose_encoding("gzip, br;q=0.5") == "gzip"
+    assert choose_encoding("br;q=0, gzip;q=0") is None
+    assert choose_encoding("*") == "br"
+    assert choose_encoding("identity") is None
+    assert choose_encoding("") is None
+
+
+def test_compresses_large_json_responses():
+    client = TestClient(build_app())
+    identity = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["ETag"] == '"v1"'
+
+    for encoding in ("gzip", "br"):
+        response = client.get("/large", headers={"Accept-Encoding": encoding})
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == encoding
+        assert response.headers["Vary"] == "Accept-Encoding"
+        assert response.headers["ETag"] == 'W/"v1"'
+        assert int(response.headers["Content-Length"]) < len(identity.content) / 4
+        assert response.json() == PAYLOAD
+
+
+def test_caches_compressed_bodies_by_etag():
+    app = build_app()
+    client = TestClient(app)
+    first = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    second = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert first.content == second.content
+
+    middleware = app.middleware_stack.app
+    assert isinstance(middleware, CompressionMiddleware)
+    assert list(middleware._cache) == [("gzip", '"v1"', "/large", b"")]
+
+
+def test_skips_small_and_non_allowlisted_responses():
+    client = TestClient(build_app())
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    binary = client.get("/binary", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in binary.headers
+    assert len(binary.content) == 5000
+
+
+def test_compresses_streaming_responses():
+    client = TestClient(build_app())
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text.count('"chunk"') == 5
@@ -0,0 +1,50 @@
+from fastapi.testclient import TestClient
+import json
+import logging
+
+from app.core import logs
+from app.core.config import get_settings
+from app.main import create_app
+
+
+def test_access_log_is_structured_json_with_request_id(capsys, monkeypatch):
+    monkeypatch.setattr(get_settings(), "PURCHASE_INTAKE_WORKERS", 0)
+    monkeypatch.setattr(get_settings(), "SALES_ROLLUP_REFRESH_SECONDS", 0)
+    app = create_app()
+    # Dois ciclos de inicialização e encerramento: o segundo precisa voltar a registrar os logs.
+    for request_id in ("req-000", "req-123"):
+        with TestClient(app) as client:
+            response = client.get("/", headers={"X-Request-ID": request_id})
+            assert response.status_code == 200
+            assert response.headers["X-Request-ID"] == request_id
+    with TestClient(app) as client:
+        generated = client.get("/").headers["X-Request-ID"]
+        assert len(generated) == 32
+        logging.getLogger("app.test").warning("fora de requisição %s", 42, extra={"sku": "X1"})
+    output = capsys.readouterr().out
+
+    entries = [json.loads(line) for line in output.splitlines() if line.startswith("{")]
+    access = [entry for entry in entries if entry["logger"] == "app.access"]
+    assert any(entry["request_id"] == "req-000" for entry in access)
+    first = next(entry for entry in access if entry["request_id"] == "req-123")
+    assert first["level"] == "INFO"
+    assert first["method"] == "GET"
+    assert first["route"] == "/"
+    assert first["status"] == 200
+    assert first["duration_ms"] >= 0
+    assert "db_statements" in first and "db_ms" in first
+    assert any(entry["request_id"] == generated for entry in access)
+
+    other = next(entry for entry in entries if entry["logger"] == "app.test")
+    assert other["message"] == "fora de requisição 42"
+    assert other["sku"] == "X1"
+    assert "request_id" not in other
+
+
+def test_access_log_samples_successful_hot_routes():
+    middleware = logs.AccessLogMiddleware(app=None, sampled_routes=["/products/read"], sample_rate=0.0, slow_ms=500)
+    assert not middleware._should_log("/products/read", 200, 10)
+    assert middleware._should_log("/products/read", 200, 800)
+    assert middleware._should_log("/products/read", 404, 10)
+    assert middleware._should_log("/products/read", 500, 10)
+    assert middleware._should_log("/sizes/read", 200, 10)
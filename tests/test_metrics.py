@@ -0,0 +1,55 @@
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy.orm import Session
+import uuid
+
+from app.database import models
+from app.auth.services import get_password_hash
+
+VALID_TEST_PASSWORD = "testpassword123"
+
+
+def sample(name: str, labels: dict = None) -> float:
+    return REGISTRY.get_sample_value(name, labels or {}) or 0.0
+
+
+def test_metrics_endpoint_reports_http_db_and_auth_timings(client: TestClient, db_session: Session):
+    email = f"metrics_{uuid.uuid4().hex[:8]}@example.com"
+    user = models.User(
+        name="Metrics Test", email=email, cpf=str(uuid.uuid4().int)[:11],
+        hashed_password=get_password_hash(VALID_TEST_PASSWORD), is_active=True, is_admin=False
+    )
+    db_session.add(user)
+    db_session.commit()
+
+    route_labels = {"route": "/products/read"}
+    requests_before = sample("http_requests_total", {"method": "GET", "status": "200", **route_labels})
+    statements_before = sample("db_statements_total", route_labels)
+    verify_before = sample("auth_password_verify_seconds_count")
+    decode_before = sample("auth_jwt_decode_seconds_count")
+
+    login = client.post("/auth/login", json={"email": email, "password": VALID_TEST_PASSWORD})
+    assert login.status_code == 200
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    assert client.get("/products/read", headers=headers).status_code == 200
+    assert client.get("/products/read", headers=headers).status_code == 200
+
+    assert sample("http_requests_total", {"method": "GET", "status": "200", **route_labels}) == requests_before + 2
+    assert sample("http_request_duration_seconds_count", {"method": "GET", **route_labels}) >= 2
+    assert sample("db_statements_total", route_labels) >= statements_before + 2
+    assert sample("http_request_db_statements_count", route_labels) >= 2
+    assert sample("auth_password_verify_seconds_count") == verify_before + 1
+    assert sample("auth_jwt_decode_seconds_count") == decode_before + 2
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_bucket{le="0.005",method="GET",route="/products/read"}' in response.text
+    assert 'db_pool_connections{state="checked_out"}' in response.text
+
+
+def test_unmatched_routes_share_a_label(client: TestClient):
+    before = sample("http_requests_total", {"method": "GET", "route": "<unmatched>", "status": "404"})
+    client.get(f"/nao-existe/{uuid.uuid4()}")
+    client.get(f"/nao-existe/{uuid.uuid4()}")
+    assert sample("http_requests_total", {"method": "GET", "route": "<unmatched>", "status": "404"}) == before + 2
@@ -1,12 +1,19 @@
 from fastapi.testclient import TestClient
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 import pytest
 import uuid
+import io
+import os
 from decimal import Decimal
+from PIL import Image
 
 from app.database import models
 from app.auth.services import get_password_hash
 from app.core.dependencies import create_token_response
+from app.core.config import get_settings
+from app.product import services as product_services
+from app.product_image import storage as image_storage
 
 VALID_TEST_PASSWORD = "testpassword123"
 
@@ -121,6 +128,17 @@ def test_create_product_success(client: TestClient, db_session: Session, created
     assert img1_db.product_id == uuid.UUID(data["id"])
 
 
+def test_create_product_with_unknown_reference_ids(client: TestClient, db_session: Session, created_product_dependencies):
+    deps = created_product_dependencies
+    headers = {"Authorization": f"Bearer {deps['user_token']}"}
+    product_data = {
+        "name": f"Produto Ref Inexistente {uuid.uuid4().hex[:8]}", "description": "Desc", "price": "10.00", "inventory": 1,
+        "size_id": deps["size_id"], "category_id": 999999999, "gender_id": deps["gender_id"]
+    }
+    response = client.post("/products/create", json=product_data, headers=headers)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Categoria com ID 999999999 não encontrada."
+
 def test_read_products_list(client: TestClient, db_session: Session, created_product_dependencies):
     headers = {"Authorization": f"Bearer {created_product_dependencies['user_token']}"}
     name1 = f"Produto Lista Prod1 {uuid.uuid4().hex[:8]}"
@@ -137,6 +155,17 @@ def test_read_products_list(client: TestClient, db_session: Session, created_pro
     assert isinstance(data, list)
     assert any(p["name"] == name1 for p in data)
 
+def test_read_products_list_matches_single_product_serialization(client: TestClient, db_session: Session, created_product_dependencies):
+    deps = created_product_dependencies
+    headers = {"Authorization": f"Bearer {deps['user_token']}"}
+    product_id = deps["base_product_id_for_images"]
+
+    response = client.get(f"/products/read?category_id={deps['category_id']}", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["ETag"]
+    assert response.json() == [client.get(f"/products/read/{product_id}", headers=headers).json()]
+
 def test_read_one_product_success(client: TestClient, db_session: Session, created_product_dependencies):
     headers = {"Authorization": f"Bearer {created_product_dependencies['user_token']}"}
     product_name = f"Produto Leitura Unica Prod {uuid.uuid4().hex[:8]}"
@@ -160,6 +189,91 @@ def test_read_one_product_success(client: TestClient, db_session: Session, creat
     assert len(data["images"]) == 1
     assert data["images"][0]["id"] == created_product_dependencies["image1_id"]
 
+def test_read_one_product_etag_not_modified(client: TestClient, db_session: Session, created_product_dependencies):
+    headers = {"Authorization": f"Bearer {created_product_dependencies['user_token']}"}
+    create_data = {
+        "name": f"Produto ETag Prod {uuid.uuid4().hex[:8]}", "description": "Desc ETag Prod", "price": "30.00", "inventory": 12,
+        "size_id": created_product_dependencies["size_id"],
+        "category_id": created_product_dependencies["category_id"],
+        "gender_id": created_product_dependencies["gender_id"]
+    }
+    create_resp = client.post("/products/create", json=create_data, headers=headers)
+    assert create_resp.status_code == 201
+    product_id = create_resp.json()["id"]
+
+    first = client.get(f"/products/read/{product_id}", headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    cached = client.get(f"/products/read/{product_id}", headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["ETag"] == etag
+
+    update_resp = client.put(f"/products/update/{product_id}", json={"price": "31.00"}, headers=headers)
+    assert update_resp.status_code == 200
+    after_update = client.get(f"/products/read/{product_id}", headers={**headers, "If-None-Match": etag})
+    assert after_update.status_code == 200
+    assert after_update.headers["ETag"] != etag
+
+def test_read_products_list_etag_changes_with_images(client: TestClient, db_session: Session, created_product_dependencies):
+    headers = {"Authorization": f"Bearer {created_product_dependencies['user_token']}"}
+    params = {"category_id": created_product_dependencies["category_id"]}
+
+    first = client.get("/products/read", params=params, headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert client.get("/products/read", params=params, headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    image_resp = client.put(f"/product-images/update/{created_product_dependencies['image2_id']}", json={"description": "Nova"}, headers=headers)
+    assert image_resp.status_code == 200
+    after_update = client.get("/products/read", params=params, headers={**headers, "If-None-Match": etag})
+    assert after_update.status_code == 200
+
+def test_product_etag_version_does_not_multiply_images_by_shards(client: TestClient, db_session: Session, created_product_dependencies):
+    deps = created_product_dependencies
+    headers = {"Authorization": f"Bearer {deps['user_token']}"}
+    admin_headers = {"Authorization": f"Bearer {deps['admin_token']}"}
+    create_resp = client.post("/products/create", json={
+        "name": f"Produto Versão {uuid.uuid4().hex[:8]}", "description": "Desc Versão", "price": "20.00", "inventory": 8,
+        "size_id": deps["size_id"], "category_id": deps["category_id"], "gender_id": deps["gender_id"],
+        "product_image_ids": [deps["image1_id"], deps["image2_id"]]
+    }, headers=headers)
+    assert create_resp.status_code == 201
+    product_id = uuid.UUID(create_resp.json()["id"])
+    assert client.put(f"/products/shards/{product_id}", json={"shards": 4}, headers=admin_headers).status_code == 200
+
+    version = product_services._product_version(db_session, select(models.Product).where(models.Product.id == product_id))
+    assert version.products == 1
+    assert version.images == 2
+    assert version.shards_updated_at is not None
+
+    etag = client.get(f"/products/read/{product_id}", headers=headers).headers["ETag"]
+    assert client.put(f"/products/update/{product_id}", json={"inventory": 9}, headers=headers).status_code == 200
+    assert client.get(f"/products/read/{product_id}", headers={**headers, "If-None-Match": etag}).status_code == 200
+
+def test_read_product_cards_with_main_image(client: TestClient, db_session: Session, created_product_dependencies):
+    deps = created_product_dependencies
+    headers = {"Authorization": f"Bearer {deps['user_token']}"}
+    product_data = {
+        "name": f"Produto Card Sem Imagem {uuid.uuid4().hex[:8]}", "description": "Desc", "price": "15.00", "inventory": 0,
+        "size_id": deps["size_id"], "category_id": deps["category_id"], "gender_id": deps["gender_id"]
+    }
+    no_image_id = client.post("/products/create", json=product_data, headers=headers).json()["id"]
+    base_product_id = deps["base_product_id_for_images"]
+    main_url = client.get(f"/product-images/read/{deps['image1_id']}", headers=headers).json()["url"]
+
+    response = client.get(f"/products/cards?category_id={deps['category_id']}", headers=headers)
+    assert response.status_code == 200
+    cards = {card["id"]: card for card in response.json()}
+    assert set(cards) == {base_product_id, no_image_id}
+    assert cards[base_product_id]["main_image_url"] == main_url
+    assert cards[base_product_id]["available"] is True
+    assert cards[no_image_id] == {"id": no_image_id, "name": product_data["name"], "price": "15.00", "available": False, "main_image_url": None}
+
+    response = client.get(f"/products/cards?category_id={deps['category_id']}&available_only=true", headers=headers)
+    assert [card["id"] for card in response.json()] == [base_product_id]
+
 def test_update_product_success(client: TestClient, db_session: Session, created_product_dependencies):
     headers = {"Authorization": f"Bearer {created_product_dependencies['user_token']}"}
     initial_name = f"Produto Update Init Prod {uuid.uuid4().hex[:8]}"
@@ -184,6 +298,130 @@ def test_update_product_success(client: TestClient, db_session: Session, created
     assert len(data["images"]) == 1
     assert data["images"][0]["id"] == created_product_dependencies["image2_id"]
 
+def test_update_product_images_replaces_the_set(client: TestClient, db_session: Session, created_product_dependencies):
+    deps = created_product_dependencies
+    headers = {"Authorization": f"Bearer {deps['user_token']}"}
+    product_id = deps["base_product_id_for_images"]
+
+    response = client.put(f"/products/update/{product_id}", json={"product_image_ids": [deps["image2_id"]]}, headers=headers)
+    assert response.status_code == 200, f"Detalhe: {response.json()}"
+    assert [image["id"] for image in response.json()["images"]] == [deps["image2_id"]]
+    assert client.get(f"/product-images/read/{deps['image1_id']}", headers=headers).status_code == 404
+
+    missing_id = str(uuid.uuid4())
+    response = client.put(f"/products/update/{product_id}", json={"product_image_ids": [missing_id]}, headers=headers)
+    assert response.status_code == 404
+    assert missing_id in response.json()["detail"]
+    assert client.get(f"/product-images/read/{deps['image2_id']}", headers=headers).status_code == 200
+
+    response = client.put(f"/products/update/{product_id}", json={"product_image_ids": []}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["images"] == []
+
+def test_update_sharded_product_inventory_redistributes(client: TestClient, db_session: Session, created_product_dependencies):
+    deps = created_product_dependencies
+    headers = {"Authorization": f"Bearer {deps['user_token']}"}
+    admin_headers = {"Authorization": f"Bearer {deps['admin_token']}"}
+    name = f"Produto Fragmentado {uuid.uuid4().hex[:8]}"
+    create_resp = client.post("/products/create", json={
+        "name": name, "description": "Desc Fragmentado", "price": "30.00", "inventory": 9,
+        "size_id": deps["size_id"], "category_id": deps["category_id"], "gender_id": deps["gender_id"]
+    }, headers=headers)
+    assert create_resp.status_code == 201
+    product_id = create_resp.json()["id"]
+
+    shard_resp = client.put(f"/products/shards/{product_id}", json={"shards": 4}, headers=admin_headers)
+    assert shard_resp.status_code == 200
+    assert shard_resp.json()["inventory"] == 9
+
+    update_resp = client.put(f"/products/update/{product_id}", json={"inventory": 10}, headers=headers)
+    assert update_resp.status_code == 200, f"Detalhe: {update_resp.json()}"
+    assert update_resp.json()["inventory"] == 10
+    shards = db_session.query(models.ProductInventoryShard.inventory).filter(
+        models.ProductInventoryShard.product_id == uuid.UUID(product_id)
+    ).order_by(models.ProductInventoryShard.shard).all()
+    assert [row.inventory for row in shards] == [3, 3, 2, 2]
+
+    bulk_resp = client.post("/products/bulk", json={"items": [{"name": name, "inventory": 0}]}, headers=headers)
+    assert bulk_resp.status_code == 200
+    available = client.get("/products/read", params={"category_id": deps["category_id"], "available_only": True}, headers=headers)
+    assert product_id not in [product["id"] for product in available.json()]
+
+    invalid = client.put(f"/products/shards/{product_id}", json={"shards": 65}, headers=admin_headers)
+    assert invalid.status_code == 422
+
+def test_bulk_upsert_products(client: TestClient, db_session: Session, created_product_dependencies):
+    deps = created_product_dependencies
+    headers = {"Authorization": f"Bearer {deps['user_token']}"}
+    existing_name = f"Produto Bulk Existente {uuid.uuid4().hex[:8]}"
+    create_resp = client.post("/products/create", json={
+        "name": existing_name, "description": "Desc Bulk", "price": "10.00", "inventory": 3,
+        "size_id": deps["size_id"], "category_id": deps["category_id"], "gender_id": deps["gender_id"]
+    }, headers=headers)
+    assert create_resp.status_code == 201
+    existing_id = create_resp.json()["id"]
+
+    new_name = f"Produto Bulk Novo {uuid.uuid4().hex[:8]}"
+    bulk_data = {"items": [
+        {"name": new_name, "description": "Novo via lote", "price": "19.90", "inventory": 7,
+         "size_id": deps["size_id"], "category_id": deps["category_id"], "gender_id": deps["gender_id"]},
+        {"name": existing_name, "price": "12.50", "inventory": 9},
+        {"name": f"Produto Bulk Incompleto {uuid.uuid4().hex[:8]}", "price": "5.00"},
+        {"name": f"Produto Bulk FK {uuid.uuid4().hex[:8]}", "description": "FK", "price": "5.00", "inventory": 1,
+         "size_id": 999999999, "category_id": deps["category_id"], "gender_id": deps["gender_id"]},
+        {"name": new_name, "price": "1.00"},
+    ]}
+    response = client.post("/products/bulk", json=bulk_data, headers=headers)
+    assert response.status_code == 200, f"Detalhe: {response.json()}"
+    data = response.json()
+    assert [r["status"] for r in data["results"]] == ["created", "updated", "error", "error", "error"]
+    assert data["created"] == 1 and data["updated"] == 1 and data["failed"] == 3
+    assert data["results"][1]["id"] == existing_id
+    assert "Tamanho com ID 999999999" in data["results"][3]["detail"]
+    assert data["rows_per_second"] > 0
+
+    updated = db_session.query(models.Product).filter(models.Product.id == uuid.UUID(existing_id)).first()
+    db_session.refresh(updated)
+    assert updated.price == Decimal("12.50")
+    assert updated.inventory == 9
+    assert updated.description == "Desc Bulk"
+
+def test_import_products_csv_as_admin(client: TestClient, db_session: Session, created_product_dependencies):
+    deps = created_product_dependencies
+    admin_headers = {"Authorization": f"Bearer {deps['admin_token']}"}
+    name1 = f"Produto Import 1 {uuid.uuid4().hex[:8]}"
+    name2 = f"Produto Import 2 {uuid.uuid4().hex[:8]}"
+    refs = f"{deps['size_id']},{deps['category_id']},{deps['gender_id']}"
+    csv_content = (
+        "name,description,price,inventory,size_id,category_id,gender_id,image_urls\n"
+        f"{name1},Importado,19.90,5,{refs},http://images.example.com/a.png|http://images.example.com/b.png\n"
+        f"{name2},Importado,-1,5,{refs},\n"
+        f"{name1},Importado de novo,21.00,6,{refs},http://images.example.com/a.png\n"
+    )
+    response = client.post(
+        "/products/import",
+        files={"file": ("catalogo.csv", csv_content.encode("utf-8"), "text/csv")},
+        headers=admin_headers
+    )
+    assert response.status_code == 200, f"Detalhe: {response.json()}"
+    data = response.json()
+    assert data["rows"] == 3
+    assert data["valid"] == 2
+    assert data["invalid"] == 1
+    assert data["errors"][0]["line"] == 3
+    assert data["created"] == 1
+    assert data["images_created"] == 1
+
+    product = db_session.query(models.Product).filter(models.Product.name == name1).first()
+    assert product.price == Decimal("21.00")
+    assert product.inventory == 6
+    assert [img.is_main for img in product.images] == [True]
+
+def test_import_products_forbidden_for_normal_user(client: TestClient, db_session: Session, created_product_dependencies):
+    headers = {"Authorization": f"Bearer {created_product_dependencies['user_token']}"}
+    response = client.post("/products/import", files={"file": ("catalogo.ndjson", b"{}\n", "application/x-ndjson")}, headers=headers)
+    assert response.status_code == 403
+
 def test_delete_product_success_as_admin(client: TestClient, db_session: Session, created_product_dependencies):
     user_headers = {"Authorization": f"Bearer {created_product_dependencies['user_token']}"}
     admin_headers = {"Authorization": f"Bearer {created_product_dependencies['admin_token']}"}
@@ -229,6 +467,78 @@ def test_create_product_image_success(client: TestClient, db_session: Session, c
     assert data["url"] == image_url
     assert data["product_id"] == product_id_for_new_image
 
+@pytest.fixture(scope="function")
+def media_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(get_settings(), "MEDIA_ROOT", str(tmp_path))
+    monkeypatch.setattr(get_settings(), "IMAGE_THUMBNAIL_SIZES", [64, 200])
+    yield tmp_path
+    image_storage.shutdown_pool()
+
+def _jpeg_bytes(width: int = 640, height: int = 400) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 40, 90)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+def test_upload_product_image_stores_content_once_and_serves_thumbnails(client: TestClient, db_session: Session, created_product_dependencies, media_root):
+    headers = {"Authorization": f"Bearer {created_product_dependencies['user_token']}"}
+    product_id = created_product_dependencies["base_product_id_for_images"]
+    content = _jpeg_bytes()
+
+    uploads = [
+        client.post("/product-images/upload", data={"product_id": product_id, "description": f"Foto {n}"}, files={"file": ("foto.jpg", content, "image/jpeg")}, headers=headers)
+        for n in range(2)
+    ]
+    assert [r.status_code for r in uploads] == [201, 201], uploads[0].json()
+    first, second = (r.json() for r in uploads)
+    assert first["id"] != second["id"]
+    assert first["content_hash"] == second["content_hash"]
+    assert (first["content_type"], first["width"], first["height"]) == ("image/jpeg", 640, 400)
+    assert [t["size"] for t in first["thumbnails"]] == [64, 200]
+
+    originals = [name for _, _, names in os.walk(media_root / "images") for name in names if name.startswith("original.")]
+    assert originals == ["original.jpg"]
+
+    pending = image_storage.pending_thumbnails(first["content_hash"])
+    if pending is not None:
+        pending.result(timeout=60)
+
+    webp = client.get(first["thumbnails"][1]["webp_url"])
+    assert webp.status_code == 200
+    assert webp.headers["content-type"] == "image/webp"
+    assert Image.open(io.BytesIO(webp.content)).size == (200, 125)
+    thumbnail = client.get(first["thumbnails"][0]["url"])
+    assert Image.open(io.BytesIO(thumbnail.content)).size == (64, 40)
+
+    original = client.get(first["url"])
+    assert original.content == content
+    assert client.get(first["url"], headers={"If-None-Match": original.headers["etag"]}).status_code == 304
+    head = client.head(first["url"])
+    assert head.status_code == 200 and head.content == b"" and head.headers["etag"] == original.headers["etag"]
+
+    partial = client.get(first["url"], headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.content == content[10:20]
+    assert partial.headers["content-range"] == f"bytes 10-19/{len(content)}"
+    assert client.get(first["url"], headers={"Range": "bytes=-5"}).content == content[-5:]
+    assert client.get(first["url"], headers={"Range": f"bytes={len(content)}-"}).status_code == 416
+
+    assert client.get(f"/product-images/files/{first['content_hash']}/999.webp").status_code == 404
+    assert client.get("/product-images/files/..%2F..%2Fetc/passwd").status_code == 404
+
+def test_upload_product_image_rejects_invalid_files(client: TestClient, db_session: Session, created_product_dependencies, media_root, monkeypatch):
+    headers = {"Authorization": f"Bearer {created_product_dependencies['user_token']}"}
+    product_id = created_product_dependencies["base_product_id_for_images"]
+
+    not_image = client.post("/product-images/upload", data={"product_id": product_id}, files={"file": ("foto.jpg", b"not an image", "image/jpeg")}, headers=headers)
+    assert not_image.status_code == 400
+    missing_product = client.post("/product-images/upload", data={"product_id": str(uuid.uuid4())}, files={"file": ("foto.jpg", _jpeg_bytes(), "image/jpeg")}, headers=headers)
+    assert missing_product.status_code == 404
+
+    monkeypatch.setattr(get_settings(), "IMAGE_MAX_UPLOAD_BYTES", 100)
+    too_large = client.post("/product-images/upload", data={"product_id": product_id}, files={"file": ("foto.jpg", _jpeg_bytes(), "image/jpeg")}, headers=headers)
+    assert too_large.status_code == 413
+    assert os.listdir(media_root / "tmp") == []
+
 def test_read_product_images_for_a_product(client: TestClient, db_session: Session, created_product_dependencies):
     headers = {"Authorization": f"Bearer {created_product_dependencies['user_token']}"}
     product_id_to_query = created_product_dependencies["base_product_id_for_images"]
@@ -263,6 +573,50 @@ def test_update_product_image_success(client: TestClient, db_session: Session, c
     assert data["description"] == updated_description
     assert data["is_main"] is True
 
+def test_bulk_product_images(client: TestClient, db_session: Session, created_product_dependencies):
+    deps = created_product_dependencies
+    headers = {"Authorization": f"Bearer {deps['user_token']}"}
+    product_data = {
+        "name": f"Produto Bulk Img {uuid.uuid4().hex[:8]}", "description": "Desc", "price": "10.00", "inventory": 1,
+        "size_id": deps["size_id"], "category_id": deps["category_id"], "gender_id": deps["gender_id"]
+    }
+    other_product_id = client.post("/products/create", json=product_data, headers=headers).json()["id"]
+    base_product_id = deps["base_product_id_for_images"]
+
+    response = client.post("/product-images/bulk", json={"items": [
+        {"product_id": base_product_id, "images": [{"url": "http://images.example.com/bulk_a.png", "is_main": True}]},
+        {
+            "product_id": other_product_id,
+            "images": [{"url": "http://images.example.com/bulk_b.png", "description": "Costas"}],
+            "attach_image_ids": [deps["image1_id"]]
+        }
+    ]}, headers=headers)
+    assert response.status_code == 201, f"Detalhe: {response.json()}"
+    data = response.json()
+    assert data["attached"] == 1
+    assert [(image["product_id"], image["url"]) for image in data["created"]] == [
+        (base_product_id, "http://images.example.com/bulk_a.png"),
+        (other_product_id, "http://images.example.com/bulk_b.png"),
+    ]
+    other_images = client.get(f"/product-images/read?product_id={other_product_id}", headers=headers).json()
+    assert {image["id"] for image in other_images} == {deps["image1_id"], data["created"][1]["id"]}
+
+    missing_product_id = str(uuid.uuid4())
+    response = client.post("/product-images/bulk", json={"items": [
+        {"product_id": base_product_id, "images": [{"url": "http://images.example.com/bulk_c.png"}]},
+        {"product_id": missing_product_id, "attach_image_ids": [deps["image2_id"]]}
+    ]}, headers=headers)
+    assert response.status_code == 404
+    assert missing_product_id in response.json()["detail"]
+    base_images = client.get(f"/product-images/read?product_id={base_product_id}", headers=headers).json()
+    assert "http://images.example.com/bulk_c.png" not in {image["url"] for image in base_images}
+
+    response = client.post("/product-images/bulk", json={"items": [
+        {"product_id": base_product_id, "attach_image_ids": [deps["image2_id"]]},
+        {"product_id": other_product_id, "attach_image_ids": [deps["image2_id"]]}
+    ]}, headers=headers)
+    assert response.status_code == 400
+
 def test_delete_product_image_success_as_admin(client: TestClient, db_session: Session, created_product_dependencies):
     admin_headers = {"Authorization": f"Bearer {created_product_dependencies['admin_token']}"}
     image_id_to_delete = created_product_dependencies["image1_id"]
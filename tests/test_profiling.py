@@ -0,0 +1,83 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+import json
+import os
+import pstats
+import time
+import uuid
+
+from app.main import app, create_app
+from app.core import profiling
+from app.core.config import get_settings
+from app.core.dependencies import create_token_response
+from app.database import models
+from app.database.connection import configure_database, get_db
+
+
+def user_token(db_session: Session, is_admin: bool) -> str:
+    user = models.User(
+        name="Profiling Test", email=f"profiling_{uuid.uuid4().hex[:8]}@example.com", cpf=str(uuid.uuid4().int)[:11],
+        hashed_password="x", is_active=True, is_admin=is_admin
+    )
+    db_session.add(user)
+    db_session.commit()
+    return create_token_response(user.id, is_admin=is_admin).access_token
+
+
+def busy_sync_work(seconds: float) -> int:
+    # Ocupa a CPU, para que o resultado não dependa de quando o GIL deixa a thread amostradora rodar.
+    deadline, total = time.perf_counter() + seconds, 0
+    while time.perf_counter() < deadline:
+        total += 1
+    return total
+
+
+def test_admin_header_profiles_the_request(db_session: Session, tmp_path):
+    admin = {"Authorization": f"Bearer {user_token(db_session, is_admin=True)}"}
+    regular = {"Authorization": f"Bearer {user_token(db_session, is_admin=False)}"}
+    settings = get_settings().model_copy(update={
+        "PROFILING_ENABLED": True, "PROFILING_DIR": str(tmp_path), "PROFILING_MAX_PROFILES": 2,
+        "PROFILING_INTERVAL_MS": 1.0
+    })
+    try:
+        profiled_app = create_app(settings)
+        profiled_app.dependency_overrides[get_db] = app.dependency_overrides[get_db]
+
+        @profiled_app.get("/profiling-test/slow")
+        def slow_sync_route():
+            return {"total": busy_sync_work(0.2)}
+
+        client = TestClient(profiled_app)
+
+        assert "x-profile-id" not in client.get("/products/read", headers=admin).headers
+        assert "x-profile-id" not in client.get("/products/read", headers={**regular, "X-Profile": "1"}).headers
+        assert os.listdir(tmp_path) == []
+
+        response = client.get("/profiling-test/slow", headers={**admin, "X-Profile": "1"})
+        assert response.status_code == 200
+        profile_id = response.headers["x-profile-id"]
+        assert "GET_profiling_test_slow" in profile_id
+
+        stats = pstats.Stats(str(tmp_path / f"{profile_id}.prof"))
+        functions = {name for _, _, name in stats.stats}
+        # A rota é síncrona: ela roda no threadpool e ainda assim aparece no perfil.
+        assert "busy_sync_work" in functions
+        assert "slow_sync_route" in functions
+        busy = next(value for key, value in stats.stats.items() if key[2] == "busy_sync_work")
+        assert busy[3] > 0.05
+        assert any(caller[2] == "slow_sync_route" for caller in busy[4])
+
+        speedscope = json.loads((tmp_path / f"{profile_id}.speedscope.json").read_text())
+        assert speedscope["profiles"][0]["type"] == "sampled"
+        assert speedscope["profiles"][0]["samples"]
+        assert len(speedscope["profiles"][0]["samples"]) == len(speedscope["profiles"][0]["weights"])
+        assert "busy_sync_work" in {frame["name"] for frame in speedscope["shared"]["frames"]}
+
+        for _ in range(2):
+            client.get("/profiling-test/slow", headers={**admin, "X-Profile": "1"})
+        remaining = sorted(os.listdir(tmp_path))
+        assert len(remaining) == 4
+        assert f"{profile_id}.prof" not in remaining
+    finally:
+        profiling.uninstall_threadpool_hook()
+        configure_database(get_settings())
@@ -3,10 +3,18 @@ from sqlalchemy.orm import Session
 import pytest
 import uuid
 from decimal import Decimal
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import event, func
+from fastapi import HTTPException
 
 from app.database import models
 from app.auth.services import get_password_hash
 from app.core.dependencies import create_token_response
+from app.purchase import schemas as purchase_schemas, services as purchase_services, intake as purchase_intake, rollups as purchase_rollups
+from app.core.config import get_settings
+from app.product import inventory as product_inventory
+from app.core import reference
 
 VALID_TEST_PASSWORD = "testpassword123"
 
@@ -167,6 +175,41 @@ def test_create_purchase_product_not_found(client: TestClient, db_session: Sessi
     assert f"Produto com ID {non_existent_product_id} não encontrado" in response.json()["detail"]
 
 
+def test_create_purchase_round_trips_do_not_grow_with_order_size(client: TestClient, db_session: Session, created_purchase_prerequisites):
+    deps = created_purchase_prerequisites
+
+    def count_statements(items) -> int:
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        connection = db_session.get_bind()
+        event.listen(connection, "before_cursor_execute", listener)
+        try:
+            purchase_services.create_purchase(db_session, purchase_schemas.PurchaseCreate(client_id=deps["client_id"], items=items))
+        finally:
+            event.remove(connection, "before_cursor_execute", listener)
+        return len(statements)
+
+    single = [{"product_id": deps["product1_id"], "size_id": deps["size_id"], "quantity": 1, "unit_price_at_purchase": str(deps["product1_price"])}]
+    many = [
+        {"product_id": deps[key], "size_id": deps["size_id"], "quantity": 1, "unit_price_at_purchase": str(deps[price])}
+        for key, price in [("product1_id", "product1_price"), ("product2_id", "product2_price")] * 5
+    ]
+    assert count_statements(many) == count_statements(single)
+
+def test_create_purchase_aggregates_duplicate_lines(client: TestClient, db_session: Session, created_purchase_prerequisites):
+    deps = created_purchase_prerequisites
+    headers = {"Authorization": f"Bearer {deps['user_token']}"}
+    line = {"product_id": deps["product1_id"], "size_id": deps["size_id"], "quantity": 2, "unit_price_at_purchase": str(deps["product1_price"])}
+    response = client.post("/purchases/create", json={"client_id": deps["client_id"], "items": [line, line, line]}, headers=headers)
+    assert response.status_code == 201, f"Detalhe: {response.json()}"
+    data = response.json()
+    assert len(data["items"]) == 1
+    assert data["items"][0]["quantity"] == 6
+    assert Decimal(data["subtotal"]) == Decimal("6") * deps["product1_price"]
+
+    product = db_session.query(models.Product).filter(models.Product.id == uuid.UUID(deps["product1_id"])).first()
+    assert product.inventory == deps["product1_inventory"] - 6
+
 def test_read_purchases_list(client: TestClient, db_session: Session, created_purchase_prerequisites):
     deps = created_purchase_prerequisites
     headers = {"Authorization": f"Bearer {deps['user_token']}"}
@@ -186,6 +229,41 @@ def test_read_purchases_list(client: TestClient, db_session: Session, created_pu
     assert len(data) >= 1
     assert any(item["client_id"] == deps["client_id"] for item in data)
 
+def test_read_purchases_filtered_by_product_section(client: TestClient, db_session: Session, created_purchase_prerequisites):
+    deps = created_purchase_prerequisites
+    headers = {"Authorization": f"Bearer {deps['user_token']}"}
+    product1 = db_session.get(models.Product, uuid.UUID(deps["product1_id"]))
+
+    other_category = client.post("/categories/create", json={"name": f"CatOutra-{uuid.uuid4().hex[:4]}"}, headers=headers).json()["id"]
+    other_product = client.post("/products/create", json={
+        "name": f"ProdOutra-{uuid.uuid4().hex[:8]}", "description": "Outra seção", "price": "5.00", "inventory": 10,
+        "size_id": deps["size_id"], "category_id": other_category, "gender_id": product1.gender_id
+    }, headers=headers).json()
+
+    def buy(*lines) -> str:
+        items = [{"product_id": product_id, "size_id": deps["size_id"], "quantity": 1, "unit_price_at_purchase": price} for product_id, price in lines]
+        resp = client.post("/purchases/create", json={"client_id": deps["client_id"], "items": items}, headers=headers)
+        assert resp.status_code == 201, f"Detalhe: {resp.json()}"
+        return resp.json()["id"]
+
+    mixed_id = buy((deps["product1_id"], str(deps["product1_price"])), (deps["product2_id"], str(deps["product2_price"])), (other_product["id"], "5.00"))
+    other_id = buy((other_product["id"], "5.00"))
+
+    params = {"client_id": deps["client_id"], "product_section_category_id": product1.category_id}
+    data = client.get("/purchases/read", params=params, headers=headers).json()
+    assert [p["id"] for p in data] == [mixed_id]
+    assert len(data[0]["items"]) == 3
+
+    params = {"client_id": deps["client_id"], "product_section_category_id": other_category, "product_section_gender_id": product1.gender_id}
+    data = client.get("/purchases/read", params=params, headers=headers).json()
+    assert [p["id"] for p in data] == [other_id, mixed_id]
+
+    params = {"client_id": deps["client_id"], "product_section_category_id": other_category, "skip": 1, "limit": 1}
+    assert [p["id"] for p in client.get("/purchases/read", params=params, headers=headers).json()] == [mixed_id]
+
+    params = {"product_section_category_id": other_category, "product_section_gender_id": product1.gender_id + 1000}
+    assert client.get("/purchases/read", params=params, headers=headers).json() == []
+
 def test_read_one_purchase_success(client: TestClient, db_session: Session, created_purchase_prerequisites):
     deps = created_purchase_prerequisites
     headers = {"Authorization": f"Bearer {deps['user_token']}"}
@@ -218,6 +296,52 @@ def test_update_purchase_status_success(client: TestClient, db_session: Session,
     data = response.json()
     assert data["status"] == "shipped"
 
+def test_update_purchase_status_rejects_illegal_transitions(client: TestClient, db_session: Session, created_purchase_prerequisites):
+    deps = created_purchase_prerequisites
+    headers = {"Authorization": f"Bearer {deps['user_token']}"}
+
+    items = [{"product_id": deps["product1_id"], "size_id": deps["size_id"], "quantity": 1, "unit_price_at_purchase": str(deps["product1_price"])}]
+    purchase_id = client.post("/purchases/create", json={"client_id": deps["client_id"], "items": items}, headers=headers).json()["id"]
+
+    assert client.put(f"/purchases/update/{purchase_id}", json={"status": "delivered"}, headers=headers).status_code == 400
+    assert client.put(f"/purchases/update/{purchase_id}", json={"status": "lost"}, headers=headers).status_code == 422
+    assert client.put(f"/purchases/update/{purchase_id}", json={"status": "paid"}, headers=headers).json()["status"] == "paid"
+    assert client.put(f"/purchases/update/{purchase_id}", json={"status": "shipped"}, headers=headers).json()["status"] == "shipped"
+
+    response = client.put(f"/purchases/update/{purchase_id}", json={"status": "pending"}, headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Transição de status inválida: 'shipped' para 'pending'."
+    assert client.post(f"/purchases/cancel/{purchase_id}", headers=headers).status_code == 400
+
+def test_bulk_update_purchase_status(client: TestClient, db_session: Session, created_purchase_prerequisites):
+    deps = created_purchase_prerequisites
+    headers = {"Authorization": f"Bearer {deps['user_token']}"}
+
+    items = [{"product_id": deps["product2_id"], "size_id": deps["size_id"], "quantity": 1, "unit_price_at_purchase": str(deps["product2_price"])}]
+    pending_ids = [client.post("/purchases/create", json={"client_id": deps["client_id"], "items": items}, headers=headers).json()["id"] for _ in range(3)]
+    cancelled_id = client.post("/purchases/create", json={"client_id": deps["client_id"], "items": items}, headers=headers).json()["id"]
+    assert client.post(f"/purchases/cancel/{cancelled_id}", headers=headers).status_code == 200
+    missing_id = str(uuid.uuid4())
+
+    response = client.put("/purchases/status", json={"purchase_ids": pending_ids + [cancelled_id, missing_id, pending_ids[0]], "status": "shipped"}, headers=headers)
+    assert response.status_code == 200, f"Detalhe: {response.json()}"
+    data = response.json()
+    assert data["updated"] == pending_ids
+    assert {r["purchase_id"]: r["current_status"] for r in data["rejected"]} == {cancelled_id: "cancelled", missing_id: None}
+
+    shipped = db_session.query(models.Purchase).filter(models.Purchase.id.in_([uuid.UUID(i) for i in pending_ids])).all()
+    assert {p.status for p in shipped} == {"shipped"}
+
+    data = client.put("/purchases/status", json={"purchase_ids": pending_ids[:2], "status": "delivered"}, headers=headers).json()
+    assert data["updated"] == pending_ids[:2] and data["rejected"] == []
+
+    data = client.put("/purchases/status", json={"purchase_ids": pending_ids, "status": "delivered"}, headers=headers).json()
+    assert data["updated"] == [pending_ids[2]]
+    assert [r["detail"] for r in data["rejected"]] == ["Pedido já está com status 'delivered'."] * 2
+
+    response = client.put("/purchases/status", json={"purchase_ids": pending_ids, "status": "cancelled"}, headers=headers)
+    assert response.status_code == 400
+
 def test_delete_purchase_success_as_admin(client: TestClient, db_session: Session, created_purchase_prerequisites):
     deps = created_purchase_prerequisites
     user_headers = {"Authorization": f"Bearer {deps['user_token']}"}
@@ -243,6 +367,181 @@ def test_delete_purchase_success_as_admin(client: TestClient, db_session: Sessio
     db_session.refresh(prod1) 
     assert prod1.inventory == inventory_before_purchase_deletion + quantity_ordered
 
+def test_cancel_purchase_restocks_once(client: TestClient, db_session: Session, created_purchase_prerequisites):
+    deps = created_purchase_prerequisites
+    user_headers = {"Authorization": f"Bearer {deps['user_token']}"}
+    admin_headers = {"Authorization": f"Bearer {deps['admin_token']}"}
+
+    purchase_items_data = [
+        {"product_id": deps["product1_id"], "size_id": deps["size_id"], "quantity": 3, "unit_price_at_purchase": str(deps["product1_price"])},
+        {"product_id": deps["product2_id"], "size_id": deps["size_id"], "quantity": 2, "unit_price_at_purchase": str(deps["product2_price"])}
+    ]
+    create_resp = client.post("/purchases/create", json={"client_id": deps["client_id"], "items": purchase_items_data}, headers=user_headers)
+    assert create_resp.status_code == 201
+    purchase_id = create_resp.json()["id"]
+
+    cancel_resp = client.post(f"/purchases/cancel/{purchase_id}", headers=user_headers)
+    assert cancel_resp.status_code == 200, f"Detalhe: {cancel_resp.json()}"
+    assert cancel_resp.json()["status"] == "cancelled"
+
+    second_cancel = client.post(f"/purchases/cancel/{purchase_id}", headers=user_headers)
+    assert second_cancel.status_code == 400
+
+    delete_resp = client.delete(f"/purchases/delete/{purchase_id}", headers=admin_headers)
+    assert delete_resp.status_code == 200
+
+    prod1 = db_session.query(models.Product).filter(models.Product.id == uuid.UUID(deps["product1_id"])).first()
+    prod2 = db_session.query(models.Product).filter(models.Product.id == uuid.UUID(deps["product2_id"])).first()
+    assert prod1.inventory == deps["product1_inventory"]
+    assert prod2.inventory == deps["product2_inventory"]
+
+def test_sharded_product_checkout_and_cancel(client: TestClient, db_session: Session, created_purchase_prerequisites):
+    deps = created_purchase_prerequisites
+    user_headers = {"Authorization": f"Bearer {deps['user_token']}"}
+    admin_headers = {"Authorization": f"Bearer {deps['admin_token']}"}
+    product1_id = deps["product1_id"]
+
+    forbidden = client.put(f"/products/shards/{product1_id}", json={"shards": 4}, headers=user_headers)
+    assert forbidden.status_code == 403
+
+    shard_resp = client.put(f"/products/shards/{product1_id}", json={"shards": 4}, headers=admin_headers)
+    assert shard_resp.status_code == 200, f"Detalhe: {shard_resp.json()}"
+    assert shard_resp.json()["inventory"] == deps["product1_inventory"]
+    assert shard_resp.json()["inventory_shard_count"] == 4
+    shards = db_session.query(models.ProductInventoryShard.inventory).filter(
+        models.ProductInventoryShard.product_id == uuid.UUID(product1_id)
+    ).order_by(models.ProductInventoryShard.shard).all()
+    assert [row.inventory for row in shards] == [5, 5, 5, 5]
+
+    purchase_items_data = [
+        {"product_id": product1_id, "size_id": deps["size_id"], "quantity": 7, "unit_price_at_purchase": str(deps["product1_price"])},
+        {"product_id": deps["product2_id"], "size_id": deps["size_id"], "quantity": 1, "unit_price_at_purchase": str(deps["product2_price"])}
+    ]
+    create_resp = client.post("/purchases/create", json={"client_id": deps["client_id"], "items": purchase_items_data}, headers=user_headers)
+    assert create_resp.status_code == 201, f"Detalhe: {create_resp.json()}"
+    purchase_id = create_resp.json()["id"]
+    assert client.get(f"/products/read/{product1_id}", headers=user_headers).json()["inventory"] == deps["product1_inventory"] - 7
+
+    too_many = [
+        {"product_id": deps["product2_id"], "size_id": deps["size_id"], "quantity": 1, "unit_price_at_purchase": str(deps["product2_price"])},
+        {"product_id": product1_id, "size_id": deps["size_id"], "quantity": 14, "unit_price_at_purchase": str(deps["product1_price"])}
+    ]
+    rejected = client.post("/purchases/create", json={"client_id": deps["client_id"], "items": too_many}, headers=user_headers)
+    assert rejected.status_code == 400
+    assert "Disponível: 13" in rejected.json()["detail"]
+    prod2 = db_session.query(models.Product).filter(models.Product.id == uuid.UUID(deps["product2_id"])).first()
+    db_session.refresh(prod2)
+    assert prod2.inventory == deps["product2_inventory"] - 1
+
+    cancel_resp = client.post(f"/purchases/cancel/{purchase_id}", headers=user_headers)
+    assert cancel_resp.status_code == 200
+
+    unshard_resp = client.put(f"/products/shards/{product1_id}", json={"shards": 0}, headers=admin_headers)
+    assert unshard_resp.status_code == 200
+    assert unshard_resp.json()["inventory"] == deps["product1_inventory"]
+    assert unshard_resp.json()["inventory_shard_count"] == 0
+    assert db_session.query(models.ProductInventoryShard).filter(
+        models.ProductInventoryShard.product_id == uuid.UUID(product1_id)
+    ).count() == 0
+
+def test_sales_stats_follow_purchases_and_cancellations(client: TestClient, db_session: Session, created_purchase_prerequisites):
+    deps = created_purchase_prerequisites
+    headers = {"Authorization": f"Bearer {deps['user_token']}"}
+    purchase_items_data = [
+        {"product_id": deps["product1_id"], "size_id": deps["size_id"], "quantity": 2, "unit_price_at_purchase": str(deps["product1_price"])},
+        {"product_id": deps["product2_id"], "size_id": deps["size_id"], "quantity": 1, "unit_price_at_purchase": str(deps["product2_price"])}
+    ]
+    create_resp = client.post("/purchases/create", json={"client_id": deps["client_id"], "items": purchase_items_data}, headers=headers)
+    assert create_resp.status_code == 201
+    purchase_id = create_resp.json()["id"]
+
+    def stats(group_by: str, **params) -> dict:
+        response = client.get("/purchases/stats", params={"group_by": group_by, **params}, headers=headers)
+        assert response.status_code == 200, f"Detalhe: {response.json()}"
+        return {row["key"]: row for row in response.json()["rows"]}
+
+    by_product = stats("product")
+    assert by_product[deps["product1_id"]]["quantity"] == 2
+    assert Decimal(by_product[deps["product1_id"]]["revenue"]) == 2 * deps["product1_price"]
+    assert by_product[deps["product2_id"]]["order_count"] == 1
+    assert by_product[deps["product1_id"]]["label"].startswith("ProdPur1-")
+
+    # Os dois produtos são da mesma categoria: um pedido, três unidades.
+    category_key = str(db_session.get(models.Product, uuid.UUID(deps["product1_id"])).category_id)
+    by_category = stats("category")
+    assert (by_category[category_key]["quantity"], by_category[category_key]["order_count"]) == (3, 1)
+
+    purchase_rollups.fold_sales_deltas(db_session)
+    assert stats("category")[category_key] == by_category[category_key]
+    purchase_rollups.rebuild_sales_rollups(db_session)
+    assert stats("category")[category_key] == by_category[category_key]
+
+    by_day = client.get("/purchases/stats", params={"group_by": "product", "by_day": True}, headers=headers).json()
+    assert all(row["day"] is not None for row in by_day["rows"])
+
+    assert client.post(f"/purchases/cancel/{purchase_id}", headers=headers).status_code == 200
+    assert category_key not in stats("category")
+    assert deps["product1_id"] not in stats("product")
+
+    invalid = client.get("/purchases/stats", params={"start_date": "2024-02-01", "end_date": "2024-01-01"}, headers=headers)
+    assert invalid.status_code == 400
+
+def test_sales_stats_reversal_uses_section_at_sale(client: TestClient, db_session: Session, created_purchase_prerequisites):
+    deps = created_purchase_prerequisites
+    headers = {"Authorization": f"Bearer {deps['user_token']}"}
+    items = [{"product_id": deps["product1_id"], "size_id": deps["size_id"], "quantity": 2, "unit_price_at_purchase": str(deps["product1_price"])}]
+    create_resp = client.post("/purchases/create", json={"client_id": deps["client_id"], "items": items}, headers=headers)
+    assert create_resp.status_code == 201
+    purchase_id = create_resp.json()["id"]
+    old_category = str(db_session.get(models.Product, uuid.UUID(deps["product1_id"])).category_id)
+
+    cat_resp = client.post("/categories/create", json={"name": f"CatNova-{uuid.uuid4().hex[:4]}"}, headers=headers)
+    assert cat_resp.status_code == 201
+    new_category = str(cat_resp.json()["id"])
+    update_resp = client.put(f"/products/update/{deps['product1_id']}", json={"category_id": int(new_category)}, headers=headers)
+    assert update_resp.status_code == 200
+
+    # O estorno sai da categoria em que a venda foi registrada, não da atual do produto.
+    assert client.post(f"/purchases/cancel/{purchase_id}", headers=headers).status_code == 200
+    by_category = client.get("/purchases/stats", params={"group_by": "category"}, headers=headers).json()["rows"]
+    keys = {row["key"] for row in by_category}
+    assert old_category not in keys
+    assert new_category not in keys
+
+def test_client_order_aggregates_follow_purchases(client: TestClient, db_session: Session, created_purchase_prerequisites):
+    deps = created_purchase_prerequisites
+    headers = {"Authorization": f"Bearer {deps['user_token']}"}
+
+    def buy(product_key: str, quantity: int) -> dict:
+        items = [{"product_id": deps[f"{product_key}_id"], "size_id": deps["size_id"], "quantity": quantity, "unit_price_at_purchase": str(deps[f"{product_key}_price"])}]
+        resp = client.post("/purchases/create", json={"client_id": deps["client_id"], "items": items}, headers=headers)
+        assert resp.status_code == 201, f"Detalhe: {resp.json()}"
+        return resp.json()
+
+    first = buy("product1", 2)
+    second = buy("product2", 3)
+
+    profile = client.get(f"/clients/read/{deps['client_id']}", headers=headers).json()
+    assert profile["order_count"] == 2
+    assert Decimal(profile["lifetime_value"]) == Decimal(first["subtotal"]) + Decimal(second["subtotal"])
+    assert profile["last_order_at"] == second["created_at"]
+
+    filtered = client.get("/clients/read", params={"min_order_count": 2, "sort_by": "lifetime_value", "sort_desc": True}, headers=headers)
+    assert filtered.status_code == 200
+    assert deps["client_id"] in [c["id"] for c in filtered.json()]
+    assert client.get("/clients/read", params={"sort_by": "password"}, headers=headers).status_code == 422
+
+    cancel_resp = client.post(f"/purchases/cancel/{second['id']}", headers=headers)
+    assert cancel_resp.status_code == 200
+
+    profile = client.get(f"/clients/read/{deps['client_id']}", headers=headers).json()
+    assert profile["order_count"] == 1
+    assert Decimal(profile["lifetime_value"]) == Decimal(first["subtotal"])
+    assert profile["last_order_at"] == first["created_at"]
+
+    filtered = client.get("/clients/read", params={"min_order_count": 2}, headers=headers)
+    assert deps["client_id"] not in [c["id"] for c in filtered.json()]
+
 def test_delete_purchase_forbidden_for_normal_user(client: TestClient, db_session: Session, created_purchase_prerequisites):
     deps = created_purchase_prerequisites
     user_headers = {"Authorization": f"Bearer {deps['user_token']}"}
@@ -255,4 +554,314 @@ def test_delete_purchase_forbidden_for_normal_user(client: TestClient, db_sessio
 
     delete_resp = client.delete(f"/purchases/delete/{purchase_id}", headers=user_headers)
     assert delete_resp.status_code == 403
-    assert "Acesso negado" in delete_resp.json()["detail"]
\ No newline at end of file
+    assert "Acesso negado" in delete_resp.json()["detail"]
+
+def test_purchase_intake_enqueue_and_poll(client: TestClient, db_session: Session, created_purchase_prerequisites):
+    deps = created_purchase_prerequisites
+    user_headers = {"Authorization": f"Bearer {deps['user_token']}"}
+    admin_headers = {"Authorization": f"Bearer {deps['admin_token']}"}
+    purchase_items_data = [{"product_id": deps["product1_id"], "size_id": deps["size_id"], "quantity": 2, "unit_price_at_purchase": str(deps["product1_price"])}]
+
+    response = client.post("/purchases/intake", json={"client_id": deps["client_id"], "items": purchase_items_data}, headers=user_headers)
+    assert response.status_code == 202, f"Detalhe: {response.json()}"
+    data = response.json()
+    assert data["status"] == "queued"
+    assert data["purchase_id"] is None
+    assert response.headers["location"] == f"/purchases/intake/{data['id']}"
+
+    prod1 = db_session.query(models.Product).filter(models.Product.id == uuid.UUID(deps["product1_id"])).first()
+    assert prod1.inventory == deps["product1_inventory"]
+
+    poll = client.get(f"/purchases/intake/{data['id']}", headers=user_headers)
+    assert poll.status_code == 200
+    assert poll.json()["status"] == "queued"
+    assert client.get(f"/purchases/intake/{uuid.uuid4()}", headers=user_headers).status_code == 404
+
+    assert client.get("/purchases/intake/metrics", headers=user_headers).status_code == 403
+    metrics = client.get("/purchases/intake/metrics", headers=admin_headers)
+    assert metrics.status_code == 200
+    assert metrics.json()["depth"]["queued"] >= 1
+    assert metrics.json()["oldest_queued_seconds"] is not None
+
+def _create_concurrency_catalog(session_factory, inventory: int, shards: int = 0) -> dict:
+    marker = uuid.uuid4().hex[:6]
+    setup = session_factory()
+    size = models.Size(name=f"SzConc-{marker}")
+    category = models.Category(name=f"CatConc-{marker}")
+    gender = models.Gender(name=f"GenConc-{marker}")
+    setup.add_all([size, category, gender])
+    setup.flush()
+    products = [
+        models.Product(
+            name=f"ProdConc{i}-{marker}", description="Concorrência", price=Decimal("10.00"), inventory=inventory,
+            size_id=size.id, category_id=category.id, gender_id=gender.id
+        )
+        for i in range(2)
+    ]
+    buyer = models.Client(name="Cliente Concorrente", email=f"conc.{marker}@example.com", cpf=f"555{abs(hash(marker)) % 100000000:08d}", hashed_password="x")
+    setup.add_all(products + [buyer])
+    setup.commit()
+    ids = {"products": [p.id for p in products], "size": size.id, "category": category.id, "gender": gender.id, "client": buyer.id}
+    if shards:
+        for product_id in ids["products"]:
+            product_inventory.set_inventory_shards(setup, product_id, shards)
+    setup.close()
+    return ids
+
+def _drop_concurrency_catalog(session_factory, ids: dict) -> None:
+    cleanup = session_factory()
+    product_ids = ids["products"]
+    cleanup.query(models.PurchaseIntake).filter(
+        models.PurchaseIntake.payload["client_id"].astext == str(ids["client"])
+    ).delete(synchronize_session=False)
+    purchase_ids = [row.purchase_id for row in cleanup.query(models.PurchaseItem.purchase_id).filter(models.PurchaseItem.product_id.in_(product_ids))]
+    cleanup.query(models.PurchaseItem).filter(models.PurchaseItem.product_id.in_(product_ids)).delete(synchronize_session=False)
+    cleanup.query(models.Purchase).filter(models.Purchase.id.in_(purchase_ids)).delete(synchronize_session=False)
+    cleanup.query(models.Product).filter(models.Product.id.in_(product_ids)).delete(synchronize_session=False)
+    rollup_keys = [str(pid) for pid in product_ids] + [str(ids["category"]), str(ids["gender"])]
+    cleanup.query(models.SalesDailyDelta).filter(models.SalesDailyDelta.dimension_key.in_(rollup_keys)).delete(synchronize_session=False)
+    cleanup.query(models.Client).filter(models.Client.id == ids["client"]).delete(synchronize_session=False)
+    cleanup.query(models.Size).filter(models.Size.id == ids["size"]).delete(synchronize_session=False)
+    cleanup.query(models.Category).filter(models.Category.id == ids["category"]).delete(synchronize_session=False)
+    cleanup.query(models.Gender).filter(models.Gender.id == ids["gender"]).delete(synchronize_session=False)
+    cleanup.commit()
+    cleanup.close()
+
+def test_create_purchase_with_size_deleted_by_another_process_returns_not_found(session_factory):
+    ids = _create_concurrency_catalog(session_factory, inventory=5)
+    db = session_factory()
+    try:
+        stale = models.Size(name=f"SzStale-{uuid.uuid4().hex[:6]}")
+        db.add(stale)
+        db.commit()
+        stale_id = stale.id
+        assert reference.sizes.existing_ids(db, {stale_id}) == {stale_id}
+        # Outro processo apaga o tamanho: o cache deste processo só expiraria pelo TTL.
+        db.query(models.Size).filter(models.Size.id == stale_id).delete(synchronize_session=False)
+        db.commit()
+
+        purchase_data = purchase_schemas.PurchaseCreate(
+            client_id=ids["client"],
+            items=[{"product_id": ids["products"][0], "size_id": stale_id, "quantity": 1, "unit_price_at_purchase": "10.00"}]
+        )
+        with pytest.raises(HTTPException) as exc_info:
+            purchase_services.create_purchase(db, purchase_data)
+        assert exc_info.value.status_code == 404
+        assert exc_info.value.detail == f"Tamanho com ID {stale_id} não encontrado."
+        assert db.get(models.Product, ids["products"][0]).inventory == 5
+    finally:
+        db.close()
+        _drop_concurrency_catalog(session_factory, ids)
+
+def _concurrent_checkout(session_factory, ids: dict, reverse: bool) -> str:
+    ordered = list(reversed(ids["products"])) if reverse else ids["products"]
+    purchase_data = purchase_schemas.PurchaseCreate(
+        client_id=ids["client"],
+        items=[{"product_id": pid, "size_id": ids["size"], "quantity": 1, "unit_price_at_purchase": "10.00"} for pid in ordered]
+    )
+    db = session_factory()
+    try:
+        purchase_services.create_purchase(db, purchase_data)
+        return "ok"
+    except HTTPException as exc:
+        db.rollback()
+        return str(exc.status_code)
+    finally:
+        db.close()
+
+def test_concurrent_purchases_never_oversell(session_factory):
+    ids = _create_concurrency_catalog(session_factory, inventory=10)
+    try:
+        with ThreadPoolExecutor(max_workers=12) as pool:
+            outcomes = list(pool.map(lambda i: _concurrent_checkout(session_factory, ids, i % 2 == 0), range(30)))
+
+        assert outcomes.count("ok") == 10
+        assert outcomes.count("400") == 20
+
+        check = session_factory()
+        try:
+            inventories = [check.get(models.Product, pid).inventory for pid in ids["products"]]
+            sold = check.query(models.PurchaseItem).filter(models.PurchaseItem.product_id.in_(ids["products"])).count()
+        finally:
+            check.close()
+        assert inventories == [0, 0]
+        assert sold == 20
+    finally:
+        _drop_concurrency_catalog(session_factory, ids)
+
+def test_concurrent_cancellations_and_checkouts_keep_inventory_consistent(session_factory):
+    ids = _create_concurrency_catalog(session_factory, inventory=10)
+    try:
+        for i in range(10):
+            assert _concurrent_checkout(session_factory, ids, i % 2 == 0) == "ok"
+        setup = session_factory()
+        purchase_ids = [row.id for row in setup.query(models.Purchase.id).filter(models.Purchase.client_id == ids["client"])]
+        setup.close()
+
+        def cancel(purchase_id) -> str:
+            db = session_factory()
+            try:
+                purchase_services.cancel_purchase(db, purchase_id)
+                return "ok"
+            finally:
+                db.close()
+
+        with ThreadPoolExecutor(max_workers=12) as pool:
+            cancels = [pool.submit(cancel, purchase_id) for purchase_id in purchase_ids]
+            checkouts = [pool.submit(_concurrent_checkout, session_factory, ids, i % 2 == 0) for i in range(20)]
+            cancel_outcomes = [future.result() for future in cancels]
+            checkout_outcomes = [future.result() for future in checkouts]
+
+        assert cancel_outcomes == ["ok"] * 10
+        assert set(checkout_outcomes) <= {"ok", "400"}
+
+        check = session_factory()
+        try:
+            for pid in ids["products"]:
+                inventory = check.get(models.Product, pid).inventory
+                reserved = check.query(func.coalesce(func.sum(models.PurchaseItem.quantity), 0)).join(models.Purchase).filter(
+                    models.PurchaseItem.product_id == pid, models.Purchase.status != "cancelled"
+                ).scalar()
+                assert inventory >= 0
+                assert inventory + reserved == 10
+        finally:
+            check.close()
+    finally:
+        _drop_concurrency_catalog(session_factory, ids)
+
+def test_concurrent_purchases_on_sharded_products_never_oversell(session_factory):
+    ids = _create_concurrency_catalog(session_factory, inventory=10, shards=4)
+    try:
+        with ThreadPoolExecutor(max_workers=12) as pool:
+            outcomes = list(pool.map(lambda i: _concurrent_checkout(session_factory, ids, i % 2 == 0), range(30)))
+
+        assert outcomes.count("ok") == 10
+        assert outcomes.count("400") == 20
+
+        check = session_factory()
+        try:
+            inventories = [check.get(models.Product, pid).available_inventory for pid in ids["products"]]
+            negative_shards = check.query(models.ProductInventoryShard).filter(
+                models.ProductInventoryShard.product_id.in_(ids["products"]), models.ProductInventoryShard.inventory < 0
+            ).count()
+        finally:
+            check.close()
+        assert inventories == [0, 0]
+        assert negative_shards == 0
+    finally:
+        _drop_concurrency_catalog(session_factory, ids)
+
+def _intake_purchase(ids: dict, quantity: int) -> purchase_schemas.PurchaseCreate:
+    return purchase_schemas.PurchaseCreate(
+        client_id=ids["client"],
+        items=[{"product_id": ids["products"][0], "size_id": ids["size"], "quantity": quantity, "unit_price_at_purchase": "10.00"}]
+    )
+
+def test_purchase_intake_worker_creates_or_rejects_orders(session_factory):
+    ids = _create_concurrency_catalog(session_factory, inventory=5)
+    try:
+        db = session_factory()
+        intake_ids = [purchase_intake.enqueue_purchase(db, _intake_purchase(ids, 3)).id for _ in range(2)]
+        db.close()
+
+        pool = purchase_intake.IntakeWorkerPool(session_factory, workers=2, poll_interval=0.05)
+        pool.start()
+        try:
+            for _ in range(100):
+                check = session_factory()
+                states = {row.id: row for row in check.query(models.PurchaseIntake).filter(models.PurchaseIntake.id.in_(intake_ids))}
+                check.close()
+                if all(row.status in ("done", "rejected") for row in states.values()):
+                    break
+                pool._stop.wait(0.05)
+        finally:
+            pool.stop()
+
+        # Os dois pedidos disputam o mesmo estoque: apenas um cabe.
+        assert sorted(row.status for row in states.values()) == ["done", "rejected"]
+        accepted = next(row.id for row in states.values() if row.status == "done")
+        rejected = next(row.id for row in states.values() if row.status == "rejected")
+        assert states[accepted].attempts == 1
+        assert states[accepted].processed_at is not None
+        assert states[rejected].status == "rejected"
+        assert "Estoque insuficiente" in states[rejected].last_error
+
+        check = session_factory()
+        try:
+            assert check.get(models.Purchase, accepted) is not None
+            assert check.get(models.Purchase, rejected) is None
+            assert check.get(models.Product, ids["products"][0]).inventory == 2
+            metrics = purchase_intake.get_intake_metrics(check)
+        finally:
+            check.close()
+        assert metrics["depth"]["done"] >= 1
+        assert metrics["latency_ms"]["samples"] >= 1
+    finally:
+        _drop_concurrency_catalog(session_factory, ids)
+
+def test_purchase_intake_retries_then_dead_letters(session_factory, monkeypatch):
+    ids = _create_concurrency_catalog(session_factory, inventory=5)
+    monkeypatch.setattr(get_settings(), "PURCHASE_INTAKE_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(get_settings(), "PURCHASE_INTAKE_RETRY_BACKOFF_SECONDS", 0)
+
+    def failing_create_purchase(*args, **kwargs):
+        raise RuntimeError("banco indisponível")
+    monkeypatch.setattr(purchase_services, "create_purchase", failing_create_purchase)
+
+    try:
+        db = session_factory()
+        intake_id = purchase_intake.enqueue_purchase(db, _intake_purchase(ids, 1)).id
+        db.close()
+
+        assert purchase_intake.process_batch(session_factory) >= 1
+        check = session_factory()
+        entry = check.get(models.PurchaseIntake, intake_id)
+        assert (entry.status, entry.attempts) == ("queued", 1)
+        assert "banco indisponível" in entry.last_error
+        check.close()
+
+        assert purchase_intake.process_batch(session_factory) >= 1
+        check = session_factory()
+        entry = check.get(models.PurchaseIntake, intake_id)
+        assert (entry.status, entry.attempts) == ("dead_letter", 2)
+        assert check.get(models.Product, ids["products"][0]).inventory == 5
+        check.close()
+    finally:
+        _drop_concurrency_catalog(session_factory, ids)
+
+def test_purchase_intake_purges_finished_entries_and_bounds_metrics(session_factory, monkeypatch):
+    monkeypatch.setattr(get_settings(), "PURCHASE_INTAKE_METRICS_WINDOW_SECONDS", 3600)
+    now = models.utcnow()
+    entries = {
+        "old_done": ("done", now - timedelta(days=8)),
+        "old_rejected": ("rejected", now - timedelta(days=8)),
+        "old_dead_letter": ("dead_letter", now - timedelta(days=8)),
+        "recent_done": ("done", now - timedelta(minutes=5)),
+        "yesterday_done": ("done", now - timedelta(days=1)),
+    }
+    ids = {name: uuid.uuid4() for name in entries}
+    db = session_factory()
+    try:
+        before = purchase_intake.get_intake_metrics(db)
+        db.add_all([
+            models.PurchaseIntake(id=ids[name], payload={}, status=state, attempts=2, processed_at=processed_at, created_at=processed_at)
+            for name, (state, processed_at) in entries.items()
+        ])
+        db.commit()
+
+        metrics = purchase_intake.get_intake_metrics(db)
+        # Só a entrada concluída dentro da janela entra nas contagens de finalizadas.
+        assert metrics["depth"]["done"] == before["depth"]["done"] + 1
+        assert metrics["depth"]["rejected"] == before["depth"]["rejected"]
+        assert metrics["depth"]["dead_letter"] == before["depth"]["dead_letter"] + 1
+        assert metrics["retried"] == before["retried"] + 1
+        assert metrics["window_seconds"] == 3600
+
+        assert purchase_intake.purge_finished(db, timedelta(days=7), batch_size=1) >= 2
+        remaining = {row.id for row in db.query(models.PurchaseIntake.id).filter(models.PurchaseIntake.id.in_(ids.values()))}
+        assert remaining == {ids["old_dead_letter"], ids["recent_done"], ids["yesterday_done"]}
+    finally:
+        db.rollback()
+        db.query(models.PurchaseIntake).filter(models.PurchaseIntake.id.in_(ids.values())).delete(synchronize_session=False)
+        db.commit()
+        db.close()
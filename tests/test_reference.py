@@ -0,0 +1,102 @@
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from decimal import Decimal
+import pytest
+import uuid
+
+from app.core import reference
+from app.database import models
+from app.product import services as product_services, schemas as product_schemas
+
+from app.size import services as size_services, schemas as size_schemas
+from app.category import services as category_services, schemas as category_schemas
+from app.gender import services as gender_services, schemas as gender_schemas
+
+
+def test_read_reference_returns_all_reference_data(client: TestClient, db_session: Session):
+    size = size_services.create_size(db_session, size_schemas.SizeCreate(name=f"R-{uuid.uuid4().hex[:6]}", long_name="Referência"))
+    category = category_services.create_category(db_session, category_schemas.CategoryCreate(name=f"RefCat-{uuid.uuid4().hex[:6]}"))
+    gender = gender_services.create_gender(db_session, gender_schemas.GenderCreate(name=f"RG-{uuid.uuid4().hex[:6]}"))
+
+    response = client.get("/reference")
+    assert response.status_code == 200
+    data = response.json()
+    assert {"id": size.id, "name": size.name, "long_name": "Referência"}.items() <= next(item for item in data["sizes"] if item["id"] == size.id).items()
+    assert category.id in {item["id"] for item in data["categories"]}
+    assert gender.id in {item["id"] for item in data["genders"]}
+    assert response.headers["ETag"] == f'"{data["version"]}"'
+    assert "immutable" not in response.headers["Cache-Control"]
+
+    cached = client.get("/reference", headers={"If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    versioned = client.get(f"/reference?v={data['version']}")
+    assert versioned.content == response.content
+    assert "immutable" in versioned.headers["Cache-Control"]
+
+
+def test_read_reference_changes_version_on_writes(client: TestClient, db_session: Session):
+    first = client.get("/reference")
+    etag = first.headers["ETag"]
+    assert client.get("/reference").content == first.content
+
+    size = size_services.create_size(db_session, size_schemas.SizeCreate(name=f"R-{uuid.uuid4().hex[:6]}"))
+    second = client.get("/reference", headers={"If-None-Match": etag})
+    assert second.status_code == 200
+    assert second.json()["version"] != first.json()["version"]
+    assert size.id in {item["id"] for item in second.json()["sizes"]}
+
+    size_services.update_size(db_session, size.id, size_schemas.SizeUpdate(long_name="Alterado"))
+    third = client.get("/reference", headers={"If-None-Match": second.headers["ETag"]})
+    assert third.status_code == 200
+    assert next(item for item in third.json()["sizes"] if item["id"] == size.id)["long_name"] == "Alterado"
+
+
+def _category_deleted_by_another_process(db: Session, name: str) -> int:
+    """Cria uma categoria, carrega-a no cache e a apaga sem invalidar o cache, como faria outro processo."""
+    category = models.Category(name=name)
+    db.add(category)
+    db.commit()
+    category_id = category.id
+    assert reference.categories.existing_ids(db, {category_id}) == {category_id}
+    db.query(models.Category).filter(models.Category.id == category_id).delete(synchronize_session=False)
+    db.commit()
+    assert reference.categories.get(db, category_id) is not None
+    return category_id
+
+
+def test_reference_deleted_by_another_process_returns_not_found(session_factory):
+    marker = uuid.uuid4().hex[:6]
+    db = session_factory()
+    size = models.Size(name=f"SzStale-{marker}")
+    category = models.Category(name=f"CatStale-{marker}")
+    gender = models.Gender(name=f"GenStale-{marker}")
+    db.add_all([size, category, gender])
+    db.commit()
+    ids = {"size": size.id, "category": category.id, "gender": gender.id}
+    product_data = dict(description="Desc", price=Decimal("10.00"), inventory=1, size_id=ids["size"], gender_id=ids["gender"])
+    try:
+        stale_id = _category_deleted_by_another_process(db, f"CatStaleDel-{marker}")
+        with pytest.raises(HTTPException) as exc_info:
+            product_services.create_product(db, product_schemas.ProductCreate(name=f"ProdStale-{marker}", category_id=stale_id, **product_data))
+        assert exc_info.value.status_code == 404
+        assert exc_info.value.detail == f"Categoria com ID {stale_id} não encontrada."
+        assert reference.categories.get(db, stale_id) is None
+
+        stale_id = _category_deleted_by_another_process(db, f"CatStaleBulk-{marker}")
+        result = product_services.bulk_upsert_products(db, [
+            product_schemas.ProductBulkItem(name=f"ProdStaleBulk-{marker}", category_id=stale_id, **product_data),
+            product_schemas.ProductBulkItem(name=f"ProdOkBulk-{marker}", category_id=ids["category"], **product_data),
+        ])
+        assert [item["status"] for item in result["results"]] == ["error", "created"]
+        assert result["results"][0]["detail"] == f"Categoria com ID {stale_id} não encontrada."
+    finally:
+        db.rollback()
+        db.query(models.Product).filter(models.Product.name.like(f"%-{marker}")).delete(synchronize_session=False)
+        db.query(models.Size).filter(models.Size.id == ids["size"]).delete(synchronize_session=False)
+        db.query(models.Category).filter(models.Category.id == ids["category"]).delete(synchronize_session=False)
+        db.query(models.Gender).filter(models.Gender.id == ids["gender"]).delete(synchronize_session=False)
+        db.commit()
+        db.close()
@@ -1,4 +1,5 @@
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 import pytest
 import uuid
@@ -6,6 +7,7 @@ import uuid
 from app.database import models
 from app.auth.services import get_password_hash
 from app.core.dependencies import create_token_response
+from app.core import reference
 
 VALID_TEST_PASSWORD = "testpassword123"
 
@@ -122,6 +124,52 @@ def test_read_one_size_not_found(client: TestClient, db_session: Session):
     assert response.status_code == 404
     assert "Tamanho não encontrado" in response.json()["detail"]
 
+def test_read_sizes_etag_not_modified(client: TestClient, db_session: Session):
+    user_token = get_size_ops_test_token(db_session, is_admin=False, unique_marker="etag_size")
+    headers = {"Authorization": f"Bearer {user_token}"}
+
+    first = client.get("/sizes/read", headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    cached = client.get("/sizes/read", headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+
+    create_resp = client.post("/sizes/create", json={"name": f"E-{uuid.uuid4().hex[:6]}"}, headers=headers)
+    assert create_resp.status_code == 201
+    assert client.get("/sizes/read", headers={**headers, "If-None-Match": etag}).status_code == 200
+
+def test_sizes_are_served_from_reference_cache(client: TestClient, db_session: Session):
+    user_token = get_size_ops_test_token(db_session, is_admin=False, unique_marker="cache_size")
+    headers = {"Authorization": f"Bearer {user_token}"}
+    size_id = client.post("/sizes/create", json={"name": f"C-{uuid.uuid4().hex[:6]}"}, headers=headers).json()["id"]
+    assert size_id in {size["id"] for size in client.get("/sizes/read", headers=headers).json()}
+
+    size_queries = []
+    def count_size_queries(conn, cursor, statement, parameters, context, executemany):
+        if "FROM sizes" in statement:
+            size_queries.append(statement)
+    event.listen(db_session.connection(), "before_cursor_execute", count_size_queries)
+    try:
+        assert client.get("/sizes/read", headers=headers).status_code == 200
+        assert client.get(f"/sizes/read/{size_id}", headers=headers).status_code == 200
+        assert size_queries == []
+
+        # Tamanho criado por outro processo: a listagem só o vê após a expiração do cache,
+        # mas a validação de chaves estrangeiras recarrega a tabela ao encontrar um ID desconhecido.
+        other = models.Size(name=f"O-{uuid.uuid4().hex[:6]}")
+        db_session.add(other)
+        db_session.flush()
+        assert other.id not in {size["id"] for size in client.get("/sizes/read", headers=headers).json()}
+        assert reference.sizes.existing_ids(db_session, {size_id, other.id, 999999999}) == {size_id, other.id}
+        assert len(size_queries) == 1
+    finally:
+        event.remove(db_session.connection(), "before_cursor_execute", count_size_queries)
+
+    update_resp = client.put(f"/sizes/update/{size_id}", json={"long_name": "Atualizado"}, headers=headers)
+    assert update_resp.status_code == 200
+    assert client.get(f"/sizes/read/{size_id}", headers=headers).json()["long_name"] == "Atualizado"
+
 def test_update_size_success(client: TestClient, db_session: Session):
     user_token = get_size_ops_test_token(db_session, is_admin=False, unique_marker="update_size")
     headers = {"Authorization": f"Bearer {user_token}"}
@@ -0,0 +1,103 @@
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.core.config import get_settings
+from app.database import connection
+from app.main import create_app
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Soma do tempo próprio (self) dos módulos `app.*` em `python -X importtime -c "import app.main"`.
+# Hoje fica em torno de 300 ms; o limite deixa folga para máquinas de CI mais lentas e pode ser
+# ajustado com a variável de ambiente STARTUP_IMPORT_BUDGET_MS.
+STARTUP_IMPORT_BUDGET_MS = float(os.environ.get("STARTUP_IMPORT_BUDGET_MS", "1000"))
+
+# Dependências pesadas que só devem ser importadas quando usadas, não na inicialização da API.
+LAZY_MODULES = {"PIL"}
+
+
+def _import_times():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=PROJECT_ROOT, env={**os.environ, "PYTHONPATH": PROJECT_ROOT},
+        capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        times[name] = int(self_us)
+    return times
+
+
+def test_import_time_budget():
+    times = _import_times()
+    assert "app.main" in times
+
+    eager = LAZY_MODULES & times.keys()
+    assert not eager, f"Importados na inicialização: {sorted(eager)}"
+
+    app_ms = sum(value for name, value in times.items() if name == "app" or name.startswith("app.")) / 1000
+    assert app_ms < STARTUP_IMPORT_BUDGET_MS, f"Módulos app.* levaram {app_ms:.0f} ms (limite {STARTUP_IMPORT_BUDGET_MS:.0f} ms)"
+
+
+def test_openapi_schema_is_generated_once(client: TestClient):
+    first = client.get("/openapi.json")
+    assert first.status_code == 200
+    schema = client.app.openapi_schema
+    assert schema is not None
+
+    login = first.json()["paths"]["/auth/login"]["post"]["responses"]["200"]["content"]["application/json"]
+    assert login["schema"] == {"$ref": "#/components/schemas/Token"}
+    assert "example" in login
+
+    assert client.get("/openapi.json").json() == first.json()
+    assert client.app.openapi_schema is schema
+
+
+def test_import_does_not_create_engine():
+    subprocess.run(
+        [sys.executable, "-c", "import app.main; from app.database import connection; assert connection._engine is None"],
+        cwd=PROJECT_ROOT, env={**os.environ, "PYTHONPATH": PROJECT_ROOT}, check=True
+    )
+
+
+def test_create_app_builds_engine_lazily_with_given_settings():
+    settings = get_settings().model_copy(update={"DB_POOL_SIZE": 2, "DB_MAX_OVERFLOW": 0})
+    try:
+        app = create_app(settings)
+        assert app.state.settings is settings
+        assert connection._engine is None
+
+        with connection.SessionLocal() as db:
+            assert db.execute(text("SELECT 1")).scalar() == 1
+        engine = connection.get_engine()
+        assert engine.pool.size() == 2
+        assert engine.pool._max_overflow == 0
+    finally:
+        connection.configure_database(get_settings())
+
+
+def test_forked_child_discards_inherited_pool():
+    engine = connection.get_engine()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    inherited_pool = engine.pool
+    assert inherited_pool.checkedin() >= 1
+
+    pid = os.fork()
+    if pid == 0:
+        ok = connection.get_engine() is engine and engine.pool is not inherited_pool and engine.pool.checkedin() == 0
+        os._exit(0 if ok else 1)
+    _, exit_status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(exit_status) == 0
+
+    # O pai continua usando as conexões do seu próprio pool.
+    assert engine.pool is inherited_pool
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
@@ -0,0 +1,113 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+import json
+import uuid
+
+from app.main import app, create_app
+from app.core import tracing
+from app.core.config import get_settings
+from app.core.dependencies import create_token_response
+from app.database import models
+from app.database.connection import configure_database, get_db
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_SPAN_ID = "00f067aa0ba902b7"
+
+
+def traced_app(monkeypatch, sample_rate: float, **overrides):
+    # O tracing é ligado no lifespan: os testes usam o TestClient como gerenciador de contexto.
+    monkeypatch.setattr(get_settings(), "PURCHASE_INTAKE_WORKERS", 0)
+    monkeypatch.setattr(get_settings(), "SALES_ROLLUP_REFRESH_SECONDS", 0)
+    settings = get_settings().model_copy(update={
+        "TRACING_ENABLED": True, "TRACING_EXPORTER": "memory", "TRACING_SAMPLE_RATE": sample_rate, **overrides
+    })
+    traced = create_app(settings)
+    traced.dependency_overrides[get_db] = app.dependency_overrides[get_db]
+    return traced
+
+
+def admin_headers(db_session: Session) -> dict:
+    user = models.User(
+        name="Tracing Test", email=f"tracing_{uuid.uuid4().hex[:8]}@example.com", cpf=str(uuid.uuid4().int)[:11],
+        hashed_password="x", is_active=True, is_admin=True
+    )
+    db_session.add(user)
+    db_session.commit()
+    return {"Authorization": f"Bearer {create_token_response(user.id, is_admin=True).access_token}"}
+
+
+def test_request_spans_continue_incoming_trace(db_session: Session, monkeypatch):
+    headers = admin_headers(db_session)
+    try:
+        traced = traced_app(monkeypatch, sample_rate=0.0)
+        with TestClient(traced) as client:
+            response = client.get("/products/read", headers={**headers, "traceparent": f"00-{TRACE_ID}-{PARENT_SPAN_ID}-01"})
+            assert response.status_code == 200
+            spans = traced.state.span_exporter.get_finished_spans()
+    finally:
+        configure_database(get_settings())
+
+    server = next(span for span in spans if span.name == "GET /products/read")
+    assert format(server.context.trace_id, "032x") == TRACE_ID
+    assert format(server.parent.span_id, "016x") == PARENT_SPAN_ID
+    assert server.attributes["http.route"] == "/products/read"
+    assert server.attributes["http.response.status_code"] == 200
+
+    by_name = {span.name: span for span in spans}
+    assert by_name["get_current_user"].parent.span_id == server.context.span_id
+    assert by_name["jwt_decode"].parent.span_id == by_name["get_current_user"].context.span_id
+    assert "serialize_response" in by_name
+    statements = [span for span in spans if span.name == "SELECT"]
+    assert statements
+    assert all(span.context.trace_id == server.context.trace_id for span in statements)
+    assert any("FROM users" in span.attributes["db.statement"] for span in statements)
+
+
+def test_sample_rate_zero_records_nothing_without_parent(db_session: Session, monkeypatch):
+    headers = admin_headers(db_session)
+    try:
+        traced = traced_app(monkeypatch, sample_rate=0.0)
+        with TestClient(traced) as client:
+            assert client.get("/products/read", headers=headers).status_code == 200
+            assert traced.state.span_exporter.get_finished_spans() == ()
+    finally:
+        configure_database(get_settings())
+    assert tracing.span("noop").__class__.__name__ == "nullcontext"
+
+
+def test_tracing_survives_lifespan_restart(db_session: Session, monkeypatch):
+    headers = admin_headers(db_session)
+    traceparent = f"00-{TRACE_ID}-{PARENT_SPAN_ID}-01"
+    try:
+        traced = traced_app(monkeypatch, sample_rate=0.0)
+        exporters = []
+        # Dois ciclos de inicialização e encerramento: o segundo precisa voltar a registrar spans.
+        for _ in range(2):
+            with TestClient(traced) as client:
+                assert client.get("/products/read", headers={**headers, "traceparent": traceparent}).status_code == 200
+                exporter = traced.state.span_exporter
+                assert "GET /products/read" in {span.name for span in exporter.get_finished_spans()}
+                exporters.append(exporter)
+            # Encerrado o lifespan, o tracing fica desligado até a próxima inicialização.
+            assert tracing.span("noop").__class__.__name__ == "nullcontext"
+    finally:
+        configure_database(get_settings())
+    assert exporters[0] is not exporters[1]
+
+
+def test_file_exporter_closes_its_file_on_shutdown(db_session: Session, monkeypatch, tmp_path):
+    headers = admin_headers(db_session)
+    path = tmp_path / "traces.jsonl"
+    try:
+        traced = traced_app(monkeypatch, sample_rate=1.0, TRACING_EXPORTER="file", TRACING_FILE_PATH=str(path))
+        for _ in range(2):
+            with TestClient(traced) as client:
+                assert client.get("/products/read", headers=headers).status_code == 200
+                trace_file = traced.state.span_exporter.out
+            # O arquivo só é aberto na primeira escrita, no processo que exporta, e fechado no encerramento.
+            assert trace_file._file is None
+    finally:
+        configure_database(get_settings())
+
+    servers = [line for line in path.read_text().splitlines() if json.loads(line)["name"] == "GET /products/read"]
+    assert len(servers) == 2